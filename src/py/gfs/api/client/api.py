@@ -8,12 +8,28 @@ import requests
 
 import simplejson as json
 
+import os
 import contextlib
-import addict
-from addict import Dict
+import threading
+
+from urllib.parse import quote
+from urllib.parse import urlsplit
+from urllib.parse import parse_qsl
+
+from time import monotonic
 
 from gfs.common.log import GFSLogger
 
+from gfs.api.client.backend import GFSAPIError
+from gfs.api.client.backend import GFSAPIBackend
+from gfs.api.client.pool import GFSAPISessionPool
+from gfs.api.client.flight import GFSAPIFlights
+from gfs.api.client.cache import GFSCache
+from gfs.api.client.store import GFSCacheStore
+from gfs.api.client.record import GFSAPIIdentityMap
+from gfs.api.client.record import gfsfreeze
+from gfs.api.client.record import gfsthaw
+
 # vertices get, post
 # vertices properties get
 # vertices property get
@@ -29,14 +45,7 @@ from gfs.common.log import GFSLogger
 
 
 
-class GFSAPIError(Exception):
-
-    def __init__(self, error):
-        pass
-
-
-
-class GFSAPI():
+class GFSAPI(GFSAPIBackend):
 
     logger = GFSLogger.getLogger("GFSAPI")
 
@@ -58,6 +67,30 @@ class GFSAPI():
         self.api_version = "api/v1.0"
         self.api_namespace = "gfs1"
 
+        self.pool = GFSAPISessionPool(
+            pool_size = kwargs.get("pool_size", 10),
+            pool_idle = kwargs.get("pool_idle", 300)
+        )
+
+        # Assume the sidecar has the batch endpoint until it tells us
+        # otherwise, see batch()
+        self.batching = kwargs.get("batching", True)
+
+        # Same for the path resolution endpoint, see resolvePath()
+        self.resolving = kwargs.get("resolving", True)
+
+        # Sidecars that ignore limit and offset on listings turn this
+        # off, see iterVertices()
+        self.offsets = kwargs.get("offsets", True)
+
+        # Endpoints already probed for, see probe()
+        self.probed = {}
+
+    def warmup(self):
+        return self.pool.warmup(
+            self.apibase()
+        )
+
     def decode(self, data):
 
         if data:
@@ -84,14 +117,12 @@ class GFSAPI():
 
         return json.loads(data)
 
-    def apiid(self, resourceid):
-        if resourceid and type(resourceid) == str:
-            return str(resourceid.replace("#", ""))
-        return str(resourceid)
+    def apibase(self):
+        return "http://" + self.gfs_host + ":" + self.gfs_port + "/"
 
     def apiurl(self, resource, properties = {}):
 
-        apiurl = "http://" + self.gfs_host + ":" + self.gfs_port + "/" + self.api_version + "/" + self.api_namespace + "/" + resource
+        apiurl = self.apibase() + self.api_version + "/" + self.api_namespace + "/" + resource
         # self.logger.debug(apiurl)
 
         if properties:
@@ -110,7 +141,8 @@ class GFSAPI():
             resource, 
             properties
         )
-        resp = requests.get(
+        resp = self.pool.request(
+            "GET",
             url
         )
         if resp.status_code != 200:
@@ -119,19 +151,27 @@ class GFSAPI():
                     "GET",
                     url,
                     resp.status_code
-                )
+                ),
+                status = resp.status_code
             )
         return self.decode(
             resp.text
         )
 
+    def apijson(self, resource, properties = {}):
+        return self.json(self.apiget(
+            resource,
+            properties
+        ))
+
     def apipost(self, resource, data = {}):
         url = self.apiurl(
             resource
         )
         self.logger.debug(' GFSAPI: POSTing to URL: ' + url)
         self.logger.debug(data)
-        resp = requests.post(
+        resp = self.pool.request(
+            "POST",
             url,
             json = data
         )
@@ -142,7 +182,8 @@ class GFSAPI():
                     "POST",
                     url,
                     resp.status_code
-                )
+                ),
+                status = resp.status_code
             )
         return self.decode(
             resp.text
@@ -154,7 +195,8 @@ class GFSAPI():
         )
         self.logger.debug(' GFSAPI: PUTing to URL: ' + url)
         self.logger.debug(data)
-        resp = requests.put(
+        resp = self.pool.request(
+            "PUT",
             url,
             json = data
         )
@@ -165,7 +207,8 @@ class GFSAPI():
                     "PUT",
                     url,
                     resp.status_code
-                )
+                ),
+                status = resp.status_code
             )
         return self.decode(
             resp.text
@@ -175,7 +218,8 @@ class GFSAPI():
         url = self.apiurl(
             resource
         )
-        resp = requests.delete(
+        resp = self.pool.request(
+            "DELETE",
             url
         )
         if resp.status_code != 200:
@@ -184,22 +228,245 @@ class GFSAPI():
                     "PUT",
                     url,
                     resp.status_code
-                )
+                ),
+                status = resp.status_code
             )
         return self.decode(
             resp.text
         )
 
+    #
+    # Batches
+    #
+    # A batch is a list of sub-requests sent to the sidecar in a single
+    # POST to the batch resource, executed in order. Each result is a
+    # {"status": ..., "data": ...} map, data being the decoded JSON
+    # the sub-request would have returned on its own.
+    #
+
+    def batchop(self, method, resource, properties = {}, data = None):
+        op = {
+            "method": method,
+            "resource": resource
+        }
+        if properties:
+            op["properties"] = dict(properties)
+        if data is not None:
+            op["data"] = data
+        return op
+
+    def apibatch(self, operations = []):
+        url = self.apiurl(
+            "batch"
+        )
+        self.logger.debug(' GFSAPI: POSTing batch of %d to URL: %s', len(operations), url)
+        resp = self.pool.request(
+            "POST",
+            url,
+            json = {
+                "@type": "gfs:Batch",
+                "@value": operations
+            }
+        )
+        if resp.status_code != 200:
+            raise GFSAPIError(
+                '{} {} {}'.format(
+                    "POST",
+                    url,
+                    resp.status_code
+                ),
+                status = resp.status_code
+            )
+        return self.json(self.decode(
+            resp.text
+        ))
+
+    def probe(self, method, resource, properties = {}, data = None):
+
+        '''
+        Whether the sidecar has the endpoint for resource, asked once with
+        a request that endpoint answers with 200 whatever is in the graph.
+        A 400 or 404 from the endpoint itself looks the same as one for a
+        route that is not there, this tells the two apart. Not cached.
+        '''
+
+        if resource not in self.probed:
+            url = self.apiurl(
+                resource,
+                properties
+            )
+            self.logger.debug(' GFSAPI: probing for the %s endpoint at URL: %s', resource, url)
+            resp = self.pool.request(
+                method,
+                url,
+                json = data
+            )
+            self.probed[resource] = resp.status_code == 200
+
+        return self.probed[resource]
+
+    def apisingle(self, operation):
+        method = operation.get("method", "GET")
+        resource = operation.get("resource")
+        data = None
+        try:
+            if method == "GET":
+                return {
+                    "status": 200,
+                    "data": self.apijson(resource, operation.get("properties", {}))
+                }
+            elif method == "POST":
+                data = self.apipost(resource, operation.get("data", {}))
+            elif method == "PUT":
+                data = self.apiput(resource, operation.get("data", {}))
+            elif method == "DELETE":
+                data = self.apidelete(resource)
+
+        except GFSAPIError as e:
+            return {
+                "status": e.status,
+                "data": None
+            }
+
+        return {
+            "status": 200,
+            "data": self.json(data)
+        }
+
+    def batch(self, operations = []):
+
+        if not operations:
+            return []
+
+        if self.batching and len(operations) > 1:
+            try:
+                results = self.apibatch(operations)
+                if results and len(results) == len(operations):
+                    return results
+
+                self.logger.warning(' GFSAPI: batch returned %s results for %d sub-requests, retrying one by one', 
+                    len(results or []), len(operations)
+                )
+
+            except GFSAPIError as e:
+                if e.status in (405, 501) or ( e.status in (400, 404) and not self.probe(
+                    "POST",
+                    "batch",
+                    data = {
+                        "@type": "gfs:Batch",
+                        "@value": []
+                    }
+                ) ):
+                    # No batch endpoint on this sidecar, do not ask again
+                    self.logger.info(' GFSAPI: batch endpoint not supported (%s), falling back to single requests', e.status)
+                    self.batching = False
+                elif e.status in (400, 404):
+                    # The endpoint is there and refused this batch, send
+                    # it one by one but keep batching
+                    self.logger.info(' GFSAPI: batch refused (%s), sending it as single requests', e.status)
+                else:
+                    raise e
+
+        return [self.apisingle(operation) for operation in operations]
+
+    def batchdata(self, results, write = False):
+
+        '''
+        The data of each sub-request. A lookup that found nothing gives
+        None, any other failed sub-request raises GFSAPIError as it would
+        have on its own. For writes any failure raises.
+        '''
+
+        ret = []
+        for result in results:
+            status = ( result or {} ).get("status", 0)
+            if status == 200:
+                ret.append(result.get("data"))
+            elif status == 404 and not write:
+                ret.append(None)
+            else:
+                raise GFSAPIError(
+                    '{} {} {}'.format(
+                        "batch",
+                        "write" if write else "read",
+                        status
+                    ),
+                    status = status
+                )
+        return ret
+
+    def verticesById(self, vids = []):
+        self.logger.debug(' GFSAPI: verticesById ')
+        return self.batchdata(self.batch([
+            self.batchop(
+                "GET",
+                "vertex/" + self.apiid(vid)
+            ) for vid in vids
+        ]))
+
+    def verticesByUUID(self, uuids = [], vlabel = None):
+        self.logger.debug(' GFSAPI: verticesByUUID ')
+        operations = []
+        for uuid in uuids:
+            properties = {
+                "uuid": uuid
+            }
+            if vlabel:
+                properties["label"] = vlabel
+            operations.append(self.batchop(
+                "GET",
+                "vertex",
+                properties
+            ))
+        return self.batchdata(self.batch(
+            operations
+        ))
+
+    def createEdges(self, edges = []):
+        self.logger.debug(' GFSAPI: createEdges ')
+        return self.batchdata(self.batch([
+            self.batchop(
+                "POST",
+                "edge",
+                data = self.edgebody(*edge)
+            ) for edge in edges
+        ]), True)
+
+    def moveVertex(self, vid, parentid, elabel = "in"):
+        self.logger.debug(' GFSAPI: moveVertex ')
+        # Unlink and relink in one round trip
+        unlinked, linked = self.batch([
+            self.batchop(
+                "DELETE",
+                "vertex/" + self.apiid(vid) + "/outedge/" + elabel
+            ),
+            self.batchop(
+                "POST",
+                "edge",
+                data = self.edgebody(
+                    vid,
+                    parentid,
+                    elabel, {
+                        'name': elabel
+                    }
+                )
+            )
+        ])
+        # Nothing to unlink is fine, a vertex not linked yet has no edge
+        if ( unlinked or {} ).get("status", 0) not in (200, 404):
+            self.batchdata([unlinked], True)
+        return self.batchdata([linked], True)[0]
+
     #
     #
     #
 
     def query(self, resource, match = {}, fields = []):
         self.logger.debug(' GFSAPI: query ')
-        properties = match
+        properties = self.paging(match, fields = fields)
         if resource:
             properties["label"] = resource
-        data = self.apiget(
+        data = self.apijson(
             "vertex",
             properties
         )
@@ -213,14 +480,14 @@ class GFSAPI():
 
     def get(self, resource, resourceid, property = None, fields = []):
         if property:
-            data = self.apiget(
+            data = self.apijson(
                 "vertex/" + self.apiid(resourceid) + "/property/" + property
             )
 
             return data.get("@value", {}).get("value").replace("\"", "")
 
         else:
-            data = self.apiget(
+            data = self.apijson(
                 "vertex/" + self.apiid(resourceid)
             )
 
@@ -268,9 +535,21 @@ class GFSAPI():
     #
     #
 
-    def vertices(self, vlabel = None, vproperties = {}):
+    def paging(self, properties = {}, limit = None, offset = None, fields = None):
+        # Query parameters for one page of a listing, projected to fields,
+        # on a copy, callers often pass in a shared default
+        properties = dict(properties or {})
+        if limit is not None:
+            properties["limit"] = str(limit)
+        if offset:
+            properties["offset"] = str(offset)
+        if fields:
+            properties["fields"] = ",".join(fields)
+        return properties
+
+    def vertices(self, vlabel = None, vproperties = {}, limit = None, offset = None, fields = None):
         self.logger.debug(' GFSAPI: vertices ')
-        properties = vproperties
+        properties = self.paging(vproperties, limit, offset, fields)
         if vlabel:
             properties["label"] = vlabel
 
@@ -278,19 +557,19 @@ class GFSAPI():
 
         # 404 throws exception above
         try:
-            data = self.json(self.apiget(
+            data = self.apijson(
                 "vertex",
                 properties
-            ))
+            )
 
         except Exception as e:
             return []
 
         return data
 
-    def verticesWithEdge(self, elabel, elvalue = None):
+    def verticesWithEdge(self, elabel, elvalue = None, limit = None, offset = None, fields = None):
         self.logger.debug(' GFSAPI: verticesWithEdge ')
-        properties = {} # vproperties
+        properties = self.paging({}, limit, offset, fields) # vproperties
         # if elabel:
         #     properties["label"] = elabel
 
@@ -298,20 +577,20 @@ class GFSAPI():
 
         # 404 throws exception above
         try:
-            data = self.json(self.apiget(
+            data = self.apijson(
                 # "vertex/" + self.apiid(elvalue) + "/outedge/" + elabel + "/invertex",
                 "vertex/" + self.apiid(elvalue) + "/inedge/" + elabel + "/outvertex",
                 properties
-            ))
+            )
 
         except Exception as e:
             return []
 
         return data
 
-    def verticesWithoutEdge(self, elabel):
+    def verticesWithoutEdge(self, elabel, limit = None, offset = None, fields = None):
         self.logger.debug(' GFSAPI: verticesWithoutEdge ')
-        properties = {} # vproperties
+        properties = self.paging({}, limit, offset, fields) # vproperties
         # if elabel:
         #     properties["label"] = elabel
 
@@ -319,10 +598,10 @@ class GFSAPI():
 
         # 404 throws exception above
         try:
-            data = self.json(self.apiget(
+            data = self.apijson(
                 "vertex",
                 properties
-            ))
+            )
 
         except Exception as e:
             return []
@@ -331,9 +610,9 @@ class GFSAPI():
 
     def vertex(self, vid = None):
         self.logger.debug(' GFSAPI: vertex ')
-        data = self.json(self.apiget(
+        data = self.apijson(
             "vertex/" + self.apiid(vid)
-        ))
+        )
 
         return data
 
@@ -387,26 +666,25 @@ class GFSAPI():
 
     def edges(self, elabel = None, eproperties = {}):
         self.logger.debug(' GFSAPI: edges ')
-        properties = eproperties
+        properties = dict(eproperties or {})
         if elabel:
             properties["label"] = elabel
-        data = self.json(self.apiget(
+        data = self.apijson(
             "edge",
             properties
-        ))
+        )
 
         return data
 
     def edge(self, vid = None):
         self.logger.debug(' GFSAPI: edge ')
-        data = self.json(self.apiget(
+        data = self.apijson(
             "edge/" + self.apiid(vid)
-        ))
+        )
 
         return data
 
-    def createEdge(self, svid, tvid, elabel = None, eproperties = {}):
-        self.logger.debug(' GFSAPI: createEdge ')
+    def edgebody(self, svid, tvid, elabel = None, eproperties = {}):
         properties = {
             "inVLabel": None,
             "outVLabel": None,
@@ -416,11 +694,16 @@ class GFSAPI():
         }
         if elabel:
             properties["label"] = elabel
+        return {
+            "@type": "g:Edge",
+            "@value": properties
+        }
+
+    def createEdge(self, svid, tvid, elabel = None, eproperties = {}):
+        self.logger.debug(' GFSAPI: createEdge ')
         data = self.json(self.apipost(
-            "edge", {
-                "@type": "g:Edge",
-                "@value": properties
-            }
+            "edge", 
+            self.edgebody(svid, tvid, elabel, eproperties)
         ))
 
         return data
@@ -480,9 +763,9 @@ class GFSAPI():
 
         # 404 throws exception above
         try:
-            data = self.json(self.apiget(
+            data = self.apijson(
                 "vertex/" + self.apiid(vid) + "/inedge/" + elabel
-            ))
+            )
 
         except Exception as e:
             return []
@@ -499,9 +782,9 @@ class GFSAPI():
 
         # 404 throws exception above
         try:
-            data = self.json(self.apiget(
+            data = self.apijson(
                 "vertex/" + self.apiid(vid) + "/outedge/" + elabel
-            ))
+            )
 
         except Exception as e:
             return []
@@ -533,25 +816,26 @@ class GFSAPI():
 
         # 404 throws exception above
         try:
-            data = self.json(self.apiget(
+            data = self.apijson(
                 "vertex/" + self.apiid(vid) + "/inedge/" + elabel + "/invertex"
-            ))
+            )
 
         except Exception as e:
             return []
 
         return data
 
-    def inEdgesOutVertices(self, vid, elabel = None, eproperties = {}, vlabel = None, vproperties = {}):
+    def inEdgesOutVertices(self, vid, elabel = None, eproperties = {}, vlabel = None, vproperties = {}, limit = None, offset = None, fields = None):
         self.logger.debug(' GFSAPI: inEdgeOutVertices ')
 
         data = None
 
         # 404 throws exception above
         try:
-            data = self.json(self.apiget(
-                "vertex/" + self.apiid(vid) + "/inedge/" + elabel + "/outvertex"
-            ))
+            data = self.apijson(
+                "vertex/" + self.apiid(vid) + "/inedge/" + elabel + "/outvertex",
+                self.paging({}, limit, offset, fields)
+            )
 
         except Exception as e:
             return []
@@ -565,9 +849,9 @@ class GFSAPI():
 
         # 404 throws exception above
         try:
-            data = self.json(self.apiget(
+            data = self.apijson(
                 "vertex/" + self.apiid(vid) + "/outedge/" + elabel + "/invertex"
-            ))
+            )
 
         except Exception as e:
             return []
@@ -581,9 +865,9 @@ class GFSAPI():
 
         # 404 throws exception above
         try:
-            data = self.json(self.apiget(
+            data = self.apijson(
                 "vertex/" + self.apiid(vid) + "/outedge/" + elabel + "/outvertex"
-            ))
+            )
 
         except Exception as e:
             return []
@@ -598,9 +882,9 @@ class GFSAPI():
 
         # 404 throws exception above
         try:
-            data = self.json(self.apiget(
+            data = self.apijson(
                 "vertex/" + self.apiid(vid) + "/edge/" + elabel + "/invertex"
-            ))
+            )
 
         except Exception as e:
             return []
@@ -614,9 +898,9 @@ class GFSAPI():
 
         # 404 throws exception above
         try:
-            data = self.json(self.apiget(
+            data = self.apijson(
                 "vertex/" + self.apiid(vid) + "/edge/" + elabel + "/outvertex"
-            ))
+            )
 
         except Exception as e:
             return []
@@ -632,18 +916,29 @@ class GFSAPI():
 
     def setVertexProperties(self, vid, vproperties = {}):
         self.logger.debug(' GFSAPI: setVertexProperties ')
+        return self.batchdata(self.batch([
+            self.batchop(
+                "PUT",
+                "vertex/" + self.apiid(vid) + "/property/" + name,
+                data = self.propertybody(name, value)
+            ) for name, value in vproperties.items()
+        ]), True)
+
+    def propertybody(self, name, value):
+        return {
+            "@type": "g:VertexProperty",
+            "@value": {
+                # "id": vid + "_" + name,
+                "label": name,
+                "value": value
+            }
+        }
 
     def setVertexProperty(self, vid, name, value):
         self.logger.debug(' GFSAPI: setVertexProperty ')
         data = self.json(self.apiput(
-            "vertex/" + self.apiid(vid) + "/property/" + name, {
-                "@type": "g:VertexProperty",
-                "@value": {
-                    # "id": vid + "_" + name,
-                    "label": name,
-                    "value": value
-                }
-            }
+            "vertex/" + self.apiid(vid) + "/property/" + name, 
+            self.propertybody(name, value)
         ))
 
         return data
@@ -659,9 +954,9 @@ class GFSAPI():
 
     def context(self, vid):
         self.logger.debug(' GFSAPI: context ')
-        return self.json(self.apiget(
+        return self.apijson(
             "context/" + self.apiid(vid)
-        ))
+        )
 
     def render(self, vid):
         self.logger.debug(' GFSAPI: render ')
@@ -669,6 +964,57 @@ class GFSAPI():
             "render/" + self.apiid(vid)
         )
 
+    def resolvePath(self, path = [], root = None, elabel = "in", fields = None):
+
+        '''
+        Resolve a whole path in one request. The sidecar follows elabel
+        edges down from root (or from the vertices without one) matching
+        each path component by name, and returns the vertices it matched,
+        in path order. A chain shorter than the path means the next
+        component was not found.
+
+        Returns None if the sidecar has no path endpoint, in which case it
+        is not asked again: a 405 or 501, or a 404 when probing for the
+        endpoint with the empty path does not get a 200 either. Otherwise
+        a 404 is a path that does not resolve from its first component
+        and gives [], like a 400 for a name the endpoint does not take.
+        '''
+
+        self.logger.debug(' GFSAPI: resolvePath ')
+
+        if not self.resolving:
+            return None
+
+        properties = self.paging({
+            "path": quote("/" + "/".join(path), safe = ""),
+            "edge": elabel
+        }, fields = fields)
+        if root is not None:
+            properties["root"] = self.apiid(root)
+
+        try:
+            return self.apijson(
+                "path",
+                properties
+            ) or []
+
+        except GFSAPIError as e:
+            if e.status in (405, 501) or ( e.status == 404 and not self.probe(
+                "GET",
+                "path", {
+                    "path": quote("/", safe = ""),
+                    "edge": elabel
+                }
+            ) ):
+                self.logger.info(' GFSAPI: path endpoint not supported (%s), resolving paths level by level', e.status)
+                self.resolving = False
+                return None
+            if e.status in (400, 404):
+                # Nothing on that path, or a name the endpoint would not
+                # take, the caller walks it
+                return []
+            raise e
+
 
 
 class GFSCachingAPI(GFSAPI):
@@ -696,71 +1042,127 @@ class GFSCachingAPI(GFSAPI):
         )
 
         self.caching = True # False
-        self.cache = Dict() # {}
+        self.cache = GFSCache(
+            max_entries = kwargs.get("cache_entries", 10000),
+            max_bytes = kwargs.get("cache_bytes", 64 * 1024 * 1024),
+            purge_interval = kwargs.get("cache_purge", 30)
+        )
+        self.cache_expire = kwargs.get("cache_expire", 60)
+
+        # 404s are cached too, but only briefly: shells and editors
+        # probe for lots of files that do not exist
+        self.cache_negative_expire = kwargs.get("cache_negative_expire", 5)
+
+        # Concurrent misses on the same URL share one request. The
+        # generation is bumped on every cache clear, so a GET that was
+        # in flight across a write is neither cached nor joined by
+        # callers that arrive after the write. The lock makes checking
+        # the generation and storing a response one step, as it does
+        # invalidating and bumping the generation.
+        self.flights = GFSAPIFlights()
+        self.generation = 0
+        self.lock = threading.RLock()
+
+        # One shared record per vertex across all cached responses,
+        # writes patch it in place instead of dropping every listing
+        # the vertex appears in
+        self.identity = GFSAPIIdentityMap(
+            expire = self.cache_expire
+        )
+
+        # Optional on disk copy of the JSON entries, reloaded here so a
+        # remount serves reads right away. Reloaded entries only live for
+        # cache_reload_expire seconds, after which they are refetched on
+        # their next use.
+        self.store = None
+        self.cache_reload_expire = kwargs.get("cache_reload_expire", 30)
+        self.cache_persist_expire = kwargs.get("cache_persist_expire", 24 * 60 * 60)
+        if kwargs.get("cache_dir"):
+            self.openStore(kwargs.get("cache_dir"))
+
+    def openStore(self, cache_dir):
+
+        path = os.path.join(
+            cache_dir,
+            "gfs-cache-" + str(self.gfs_host) + "-" + str(self.gfs_port) + ".db"
+        )
+
+        try:
+            self.store = GFSCacheStore(path)
+            self.loadStore()
+
+        except Exception as e:
+            self.logger.warning("Client call not fatal error: open cache store error: %s: exception: %s" % ( path, str(e) ))
+            self.logger.warning(e)
+            self.store = None
+
+        return self.store
+
+    def loadStore(self):
+
+        # Identity records from disk count as just as old as their
+        # entries, so they are not handed out for longer either
+        stamp = monotonic() - max(0, ( self.cache_expire or 0 ) - ( self.cache_reload_expire or 0 ))
+
+        count = 0
+        for path, oper, text, tags in self.store.load(self.cache_persist_expire, self.cache.max_entries):
+            try:
+                data = self.identity.intern(gfsfreeze(
+                    self.json(text),
+                    self.projection(dict(parse_qsl(urlsplit(path).query)))
+                ), stamp)
+            except Exception as e:
+                self.store.discard(path)
+                continue
+            self.cache.finalize(path, oper, {
+                "status": 200,
+                "data": data
+            }, len(text), tags, self.cache_reload_expire)
+            count += 1
+
+        self.logger.debug("CACHE: loaded %d entries from %s", count, self.store.path)
+
+        return count
+
+    def close(self):
+        if self.store:
+            self.store.close()
+            self.store = None
+        self.pool.close()
 
     # 
 
     def lookupCache(self, path, oper):
 
-        from datetime import datetime
         self.logger.debug("CACHE: lookup: path: %s, oper: %s", path, oper)
 
-        pick = False
-        cachehit = self.cache[path][oper]
-        if cachehit:
-            if cachehit['expire']:
-                if cachehit['expire'] > datetime.now():
-                    self.logger.debug("CACHE: lookup: cachehit: found entry with expire, not expired")
-                    pick = cachehit
-                else:
-                    self.logger.debug("CACHE: lookup: cachehit: found entry with expire, is expired")
-            else:
-                pick = cachehit
-
-        if pick:
-            cachehit = pick
-            exp = ""
-            if cachehit['expire']:
-                exp = str(cachehit['expire'])
+        cachehit = self.cache.lookup(path, oper)
+        if cachehit and not cachehit["flags"]:
             self.logger.debug("CACHE: lookup: cachehit: PATH: %s, OPER: %s, CREATED: %s, EXPIRE: %s", 
-                cachehit.path, cachehit.oper, str(cachehit.created), exp
+                cachehit["path"], cachehit["oper"], str(cachehit["created"]), str(cachehit["expire"] or "")
             )
-            return cachehit.data
+            return cachehit["data"]
 
         else:
             return False
 
     def prepareCache(self, path, oper, expire_seconds = None):
 
-        from datetime import datetime, timedelta
         self.logger.debug("CACHE: prepare: path: %s, oper: %s", path, oper)
 
-        expire = None
-        if expire_seconds:
-            time = datetime.now()
-            expire = time + timedelta(0, expire_seconds) # days, seconds, then other fields.
-
-        self.cache[path][oper]['path'] = path
-        self.cache[path][oper]['oper'] = oper
-        self.cache[path][oper]['flags'] = 1 # Indicate not yet active cache entry
-        if expire:
-            self.cache[path][oper]['expire'] = expire
+        return self.cache.prepare(path, oper, expire_seconds)
 
-        return self.cache[path][oper]
-
-    def finalizeCache(self, path, oper, data):
+    def finalizeCache(self, path, oper, data, size = None, tags = None, expire_seconds = None):
 
         self.logger.debug("CACHE: finalize: path: %s, oper: %s", path, oper)
-        self.cache[path][oper]['data'] = data
-        self.cache[path][oper]['flags'] = 0 # Indicate active cache entry
 
-        return self.cache[path][oper]
+        return self.cache.finalize(path, oper, data, size, tags, expire_seconds)
 
     def readCache(self, path, oper):
 
         cachepath = path
         cacheoper = oper
-        expire = 60
+        expire = self.cache_expire
 
         if cachepath and self.caching:
             try:
@@ -779,7 +1181,7 @@ class GFSCachingAPI(GFSAPI):
                 self.logger.warning("Client call not fatal error: prepare cache error: exception: %s" % ( str(e) ))
                 self.logger.warning(e)
 
-    def updateCache(self, path, oper, data):
+    def updateCache(self, path, oper, data, tags = None, expire_seconds = None, size = None):
 
         cachepath = path
         cacheoper = oper
@@ -787,7 +1189,7 @@ class GFSCachingAPI(GFSAPI):
         if data:
             if cachepath and self.caching:
                 try:
-                    self.finalizeCache(cachepath, cacheoper, data)
+                    self.finalizeCache(cachepath, cacheoper, data, size = size, tags = tags, expire_seconds = expire_seconds)
                 except Exception as e:
                     self.logger.warning("Client call not fatal error: finalize cache error: exception: %s" % ( str(e) ))
                     self.logger.warning(e)
@@ -798,17 +1200,321 @@ class GFSCachingAPI(GFSAPI):
 
         cachepath = path
 
-        if cachepath:
-            self.logger.debug("CACHE: clear: path: %s", cachepath)
-            del self.cache[path]
+        with self.lock:
 
-        else:
-            self.logger.debug("CACHE: clear full")
-            self.cache = Dict() # {}
+            if cachepath:
+                self.logger.debug("CACHE: clear: path: %s", cachepath)
+                self.cache.discard(path)
+
+            else:
+                self.logger.debug("CACHE: clear full")
+                self.cache.clear()
+
+            self.generation += 1
 
+        if self.store:
+            try:
+                if cachepath:
+                    self.store.discard(cachepath)
+                else:
+                    self.store.clear()
+            except Exception as e:
+                self.logger.warning("Client call not fatal error: clear cache store error: exception: %s" % ( str(e) ))
+                self.logger.warning(e)
+
+    # 
+    # Cache entries are tagged with the graph elements they depend on:
+    # 
+    # - v:<vertex id>, e:<edge id> for the element a resource URL is about
+    #   and for every vertex and edge (and edge endpoint) in the response
+    # - q:vertex, q:edge for label/property queries on the collections,
+    #   plus q:vertex:<property> for each property the query filters on
+    # - d:<vertex id> for views derived from a vertex' properties, which
+    #   are not covered by patching its canonical record (render,
+    #   context, vertex/<id>/property/<name>)
+    # 
+    # so that a write only has to drop the entries tagged with what
+    # it touched, see invalidateCache.
     # 
 
-    def apiget(self, resource, properties = {}):
+    def apivalue(self, value):
+        if value and isinstance(value, dict) and "@value" in value:
+            return value["@value"]
+        return value
+
+    def projection(self, properties = {}):
+        # The fields a listing was projected to, None for whole vertices
+        fields = ( properties or {} ).get("fields")
+        if not fields:
+            return None
+        return tuple(fields.split(","))
+
+    def resourceTags(self, resource, properties = {}):
+
+        tags = set()
+
+        parts = resource.split("/")
+        if len(parts) > 1 and parts[0] in ("vertex", "context", "render"):
+            tags.add("v:" + parts[1])
+            if parts[0] != "vertex" or ( len(parts) > 2 and parts[2] == "property" ):
+                tags.add("d:" + parts[1])
+
+        elif len(parts) > 1 and parts[0] == "edge":
+            tags.add("e:" + parts[1])
+
+        elif parts[0] in ("vertex", "edge"):
+            tags.add("q:" + parts[0])
+            for name in properties or {}:
+                tags.add("q:" + parts[0] + ":" + name)
+
+        elif parts[0] == "path":
+            # The vertices on the path come with the response, a new child
+            # under the last of them is a new edge to it. With no root,
+            # the first component is any vertex without an edge.
+            if ( properties or {} ).get("root"):
+                tags.add("v:" + properties.get("root"))
+            else:
+                tags.add("q:vertex")
+                tags.add("q:edge")
+
+        return tags
+
+    def responseTags(self, data, tags = None):
+
+        if tags is None:
+            tags = set()
+
+        items = data
+        if isinstance(data, dict):
+            items = [data]
+
+        if not isinstance(items, (list, tuple)):
+            return tags
+
+        for item in items:
+            if not item or not isinstance(item, dict):
+                continue
+
+            value = item.get("@value", {})
+            if not value or not isinstance(value, dict):
+                continue
+
+            if item.get("@type") == "g:Vertex":
+                tags.add("v:" + self.apiid(self.apivalue(value.get("id"))))
+
+            elif item.get("@type") == "g:Edge":
+                tags.add("e:" + self.apiid(self.apivalue(value.get("id"))))
+                if value.get("inV") is not None:
+                    tags.add("v:" + self.apiid(self.apivalue(value.get("inV"))))
+                if value.get("outV") is not None:
+                    tags.add("v:" + self.apiid(self.apivalue(value.get("outV"))))
+
+        return tags
+
+    def patchCache(self, method, resource, data = None, response = None):
+
+        '''
+        Apply a successful vertex write to the canonical record in place,
+        from the server response where there is one. Returns True if the
+        record was patched, False if there was nothing to patch.
+        '''
+
+        parts = resource.split("/")
+        if parts[0] != "vertex" or len(parts) < 2:
+            return False
+
+        with self.lock:
+
+            # Reads in flight from before this write must not merge their
+            # response over the patched record
+            self.generation += 1
+
+            record = self.identity.record(parts[1])
+            if record is None:
+                return False
+
+            if isinstance(response, str):
+                try:
+                    response = self.json(response)
+                except Exception as e:
+                    response = None
+
+            try:
+
+                if len(parts) == 2 and method == "PUT":
+                    # Vertex update, the response is the updated vertex. Do not
+                    # let a partial response replace a complete record.
+                    if not isinstance(response, dict) or response.get("@type") != "g:Vertex":
+                        return False
+                    update = gfsfreeze(response)
+                    if not update.vals or not set(record.vals or {}).issubset(update.vals):
+                        return False
+                    return self.identity.intern(update) is record
+
+                if len(parts) == 4 and parts[2] == "property":
+                    name = parts[3]
+                    if method == "DELETE":
+                        return self.identity.unset(parts[1], name)
+                    if method == "PUT":
+                        value = None
+                        if isinstance(response, dict) and isinstance(response.get("@value"), dict) and \
+                            "value" in response["@value"]:
+                            value = response["@value"]["value"]
+                        elif isinstance(data, dict) and isinstance(data.get("@value"), dict):
+                            value = data["@value"].get("value")
+                        else:
+                            return False
+                        return self.identity.patch(parts[1], name, value)
+
+            except Exception as e:
+                self.logger.warning("Client call not fatal error: patch cache error: exception: %s" % ( str(e) ))
+                self.logger.warning(e)
+                self.identity.forget(parts[1])
+
+            return False
+
+    def invalidateCache(self, method, resource, data = None, patched = False):
+
+        tags = set()
+
+        parts = resource.split("/")
+
+        if parts[0] == "vertex" and len(parts) == 1:
+            # New vertex, may show up in any vertex query
+            tags.add("q:vertex")
+
+        elif parts[0] == "vertex" and patched:
+            # The canonical record, and with it every cached response
+            # holding it, is up to date already
+            tags.add("d:" + parts[1])
+            if len(parts) > 3 and parts[2] == "property":
+                tags.add("q:vertex:" + parts[3])
+            elif isinstance(data, dict):
+                for name in ( data.get("@value", {}).get("properties") or {} ):
+                    tags.add("q:vertex:" + name)
+
+        elif parts[0] == "vertex":
+            if len(parts) == 2 and method == "DELETE":
+                self.identity.forget(parts[1])
+            tags.add("v:" + parts[1])
+            if len(parts) == 2:
+                # Vertex update or delete
+                tags.add("q:vertex")
+                tags.add("q:edge")
+            elif len(parts) > 3 and parts[2] == "property":
+                tags.add("q:vertex:" + parts[3])
+            elif len(parts) > 2 and parts[2] in ("edge", "inedge", "outedge"):
+                tags.add("q:edge")
+
+        elif parts[0] == "edge" and len(parts) == 1 and data:
+            # New edge, invalidate both ends
+            value = data.get("@value", {})
+            for end in ("inV", "outV"):
+                if value.get(end) is not None:
+                    tags.add("v:" + self.apiid(self.apivalue(value.get(end))))
+            tags.add("q:edge")
+
+        elif parts[0] == "edge" and len(parts) > 1:
+            # Edge update or delete, find its ends from the cached
+            # entries it appears in
+            entries = self.cache.tagged("e:" + parts[1])
+            if not entries:
+                tags = None
+            else:
+                tags.add("e:" + parts[1])
+                tags.add("q:edge")
+                for entry in entries:
+                    tags.update([tag for tag in entry.get("tags", []) if tag.startswith("v:")])
+
+        else:
+            tags = None
+
+        if tags is None:
+            # Can not tell what this touches
+            self.clearCache()
+            return
+
+        count = 0
+        with self.lock:
+            for tag in tags:
+                count += self.cache.invalidate(tag)
+            self.generation += 1
+
+        if self.store:
+            # The patched record is only up to date in memory
+            if patched:
+                tags.add("v:" + parts[1])
+            try:
+                for tag in tags:
+                    self.store.invalidate(tag)
+            except Exception as e:
+                self.logger.warning("Client call not fatal error: invalidate cache store error: exception: %s" % ( str(e) ))
+                self.logger.warning(e)
+
+        self.logger.debug("CACHE: invalidate: %s %s: %s, %d entries", method, resource, ", ".join(sorted(tags)), count)
+
+    def fetchCache(self, path, oper, url, resource, properties = {}):
+
+        generation = self.generation
+
+        resp = self.pool.request(
+            "GET",
+            url
+        )
+        text = self.decode(resp.text)
+        data = {
+            "status": resp.status_code,
+            "data": text
+        }
+
+        tags = self.resourceTags(resource, properties)
+
+        # JSON entries hold the decoded, read-only response so that
+        # hits skip parsing altogether
+        if oper == 'JSON' and resp.status_code == 200:
+            data["data"] = gfsfreeze(
+                self.json(text),
+                self.projection(properties)
+            )
+
+        with self.lock:
+            # A response that crossed a write is handed back, but neither
+            # kept nor merged into the records the write patched
+            if generation == self.generation:
+                if oper == 'JSON' and resp.status_code == 200:
+                    data["data"] = self.identity.intern(data["data"])
+                    self.responseTags(data["data"], tags)
+                self.storeCache(path, oper, data, tags, len(text or ""))
+
+        return data
+
+    def storeCache(self, path, oper, data, tags = None, size = None):
+
+        status = data.get("status", 0)
+
+        if status == 200:
+            self.updateCache(path, oper, data, tags, size = size)
+            if self.store and oper == 'JSON':
+                try:
+                    self.store.put(path, oper, data.get("data"), tags)
+                except Exception as e:
+                    self.logger.warning("Client call not fatal error: cache store error: exception: %s" % ( str(e) ))
+                    self.logger.warning(e)
+
+        elif status == 404:
+            # Negative entry, dropped by the same tags as a positive one,
+            # so creating a child under the parent or any new vertex
+            # for a query clears it before it expires
+            self.logger.debug("CACHE: negative: path: %s, oper: %s", path, oper)
+            self.updateCache(path, oper, data, tags, self.cache_negative_expire, size = 0)
+
+        else:
+            # Do not cache server errors
+            self.cache.discard(path)
+
+        return data
+
+    def cached(self, resource, properties = {}, oper = 'GET'):
 
         url = self.apiurl(
             resource, 
@@ -816,7 +1522,7 @@ class GFSCachingAPI(GFSAPI):
         )
 
         cachepath = url
-        cacheoper = 'GET'
+        cacheoper = oper
 
         # resp = None
         data = None
@@ -827,14 +1533,15 @@ class GFSCachingAPI(GFSAPI):
             data = cachedata
 
         else:
-            resp = requests.get(
-                url
+            data = self.flights.do(
+                (cachepath, cacheoper, self.generation),
+                self.fetchCache,
+                cachepath,
+                cacheoper,
+                url,
+                resource,
+                properties
             )
-            data = {
-                "status": resp.status_code,
-                "data": self.decode(resp.text)
-            }
-            self.updateCache(cachepath, cacheoper, data)
 
         # if resp.status_code != 200:
         if data.get("status", 0) != 200:
@@ -843,25 +1550,144 @@ class GFSCachingAPI(GFSAPI):
                     "GET",
                     url,
                     data.get("status", 0)
-                )
+                ),
+                status = data.get("status", 0)
             )
 
         return data.get("data", None)
 
+    def apiget(self, resource, properties = {}):
+        return self.cached(
+            resource,
+            properties,
+            'GET'
+        )
+
+    def apijson(self, resource, properties = {}):
+        return gfsthaw(self.cached(
+            resource,
+            properties,
+            'JSON'
+        ))
+
+    def batch(self, operations = []):
+
+        if not operations:
+            return []
+
+        writes = [operation for operation in operations if operation.get("method", "GET") != "GET"]
+        if writes:
+            results = []
+            try:
+                results = super().batch(operations)
+                return results
+            finally:
+                for i, operation in enumerate(operations):
+                    if operation.get("method", "GET") == "GET":
+                        continue
+                    patched = False
+                    if i < len(results) and results[i] and results[i].get("status") == 200:
+                        patched = self.patchCache(
+                            operation.get("method"),
+                            operation.get("resource"),
+                            operation.get("data"),
+                            results[i].get("data")
+                        )
+                    self.invalidateCache(
+                        operation.get("method"),
+                        operation.get("resource"),
+                        operation.get("data"),
+                        patched
+                    )
+
+        # Read only batch, serve what we can from cache and only
+        # send the misses
+        results = [None] * len(operations)
+        misses = []
+        for i, operation in enumerate(operations):
+            url = self.apiurl(
+                operation.get("resource"),
+                operation.get("properties", {})
+            )
+            cachedata = self.readCache(url, 'JSON')
+            if cachedata:
+                results[i] = {
+                    "status": cachedata.get("status", 0),
+                    "data": gfsthaw(cachedata.get("data", None))
+                }
+            else:
+                misses.append((i, url, operation))
+
+        if misses:
+            # Like fetchCache, a response that crossed a write is handed
+            # back but not kept
+            generation = self.generation
+            fetched = super().batch([operation for i, url, operation in misses])
+            for (i, url, operation), result in zip(misses, fetched):
+                results[i] = result
+                if result and result.get("status") in (200, 404):
+                    data = gfsfreeze(
+                        result.get("data"),
+                        self.projection(operation.get("properties", {}))
+                    )
+                    tags = self.resourceTags(
+                        operation.get("resource"),
+                        operation.get("properties", {})
+                    )
+                    with self.lock:
+                        if generation == self.generation:
+                            data = self.identity.intern(data)
+                            self.storeCache(url, 'JSON', {
+                                "status": result.get("status"),
+                                "data": data
+                            }, self.responseTags(data, tags))
+                    results[i] = {
+                        "status": result.get("status"),
+                        "data": gfsthaw(data)
+                    }
+
+        return results
+
     def apipost(self, resource, data = {}):
-        ret = super().apipost(resource, data)
-        # Clear full cache for now
-        self.clearCache()
-        return ret
+        try:
+            return super().apipost(resource, data)
+        finally:
+            self.invalidateCache("POST", resource, data)
 
     def apiput(self, resource, data = {}):
-        ret = super().apiput(resource, data)
-        # Clear full cache for now
-        self.clearCache()
-        return ret
+        patched = False
+        try:
+            ret = super().apiput(resource, data)
+            patched = self.patchCache("PUT", resource, data, ret)
+            return ret
+        finally:
+            self.invalidateCache("PUT", resource, data, patched)
 
     def apidelete(self, resource):
-        ret = super().apidelete(resource)
-        # Clear full cache for now
-        self.clearCache()
-        return ret
+        patched = False
+        try:
+            ret = super().apidelete(resource)
+            patched = self.patchCache("DELETE", resource, None, ret)
+            return ret
+        finally:
+            self.invalidateCache("DELETE", resource, None, patched)
+
+    # 
+    # Vertex lookups by id or uuid are answered from the identity map
+    # while the record is fresh, whichever response it came from
+    # 
+
+    def vertex(self, vid = None):
+        record = self.identity.lookup(vid = self.apiid(vid))
+        if record is not None:
+            self.logger.debug(' GFSCachingAPI: vertex: identity hit: %s', vid)
+            return record
+        return super().vertex(vid)
+
+    def vertices(self, vlabel = None, vproperties = {}, limit = None, offset = None, fields = None):
+        if vproperties and list(vproperties.keys()) == ["uuid"] and not offset:
+            record = self.identity.lookup(uuid = vproperties.get("uuid"))
+            if record is not None and ( not vlabel or record.vals.get("label") == vlabel ):
+                self.logger.debug(' GFSCachingAPI: vertices: identity hit: %s', vproperties.get("uuid"))
+                return [record]
+        return super().vertices(vlabel, vproperties, limit, offset, fields)
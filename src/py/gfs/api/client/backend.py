@@ -0,0 +1,286 @@
+# 
+# Copyright (c) 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import base64
+import itertools
+
+from gfs.common.log import GFSLogger
+
+
+
+class GFSAPIError(Exception):
+
+    def __init__(self, error, status = None):
+        super().__init__(error)
+        self.status = status
+
+
+
+class GFSAPIBackend():
+
+    '''
+    What the filesystem layer needs from a graph backend, GFSAPI's method
+    surface. GFSAPI talks to the REST sidecar, other backends keep the
+    graph elsewhere but answer the same calls with the same GraphSON
+    shaped data:
+
+    - vertices as {"@type": "g:Vertex", "@value": {"id", "label",
+      "properties": {name: value}}}
+    - edges as {"@type": "g:Edge", "@value": {"id", "label", "inV",
+      "outV", "properties"}}
+    - listings as lists of those, [] when nothing matches; the vertex
+      listings (vertices, verticesWithEdge, verticesWithoutEdge,
+      inEdgesOutVertices) take limit and offset for one page of them,
+      and fields, the only properties the caller needs of the vertices
+      (id and label always come along; a backend may send more), in
+      the same order on every call so pages line up; a backend that
+      cannot page sets offsets False and its listings are fetched whole
+    - single element lookups of an element that does not exist raise
+      GFSAPIError with status 404
+
+    The batched calls (verticesById, setVertexProperties, moveVertex, ...)
+    fall back to one call per element here, backends that can do better
+    override them.
+    '''
+
+    logger = GFSLogger.getLogger("GFSAPIBackend")
+
+    # Listings honor limit and offset, see iterVertices()
+    offsets = True
+
+    def warmup(self):
+        return None
+
+    def close(self):
+        return None
+
+    def apiid(self, resourceid):
+        if resourceid and type(resourceid) == str:
+            return str(resourceid.replace("#", ""))
+        return str(resourceid)
+
+    def graphid(self, resourceid):
+        # Numeric ids come back from paths and records as strings
+        resourceid = self.apiid(resourceid)
+        if resourceid.isdigit():
+            return int(resourceid)
+        return resourceid
+
+    def vertexid(self, vertex):
+        return self.apiid(( vertex or {} ).get("@value", {}).get("id"))
+
+    def page(self, items, limit = None, offset = None):
+        # One page of an iterable listing, all of it without a limit
+        offset = offset or 0
+        return list(itertools.islice(
+            items,
+            offset,
+            offset + limit if limit is not None else None
+        ))
+
+    def storedData(self, vid, data):
+
+        '''
+        Content of a file as stored in its data property, for backends
+        that do not render. Nothing to render is a 404, like the sidecar.
+        '''
+
+        if data and isinstance(data, str) and data.startswith("base64:"):
+            data = base64.b64decode(data[7:]).decode("utf-8", errors = "replace")
+
+        if not data:
+            raise GFSAPIError(
+                '{} {} {}'.format(
+                    "render",
+                    vid,
+                    404
+                ),
+                status = 404
+            )
+
+        return data
+
+    #
+    # Batched calls
+    #
+
+    def verticesById(self, vids = []):
+        ret = []
+        for vid in vids:
+            try:
+                ret.append(self.vertex(vid))
+            except Exception as e:
+                ret.append(None)
+        return ret
+
+    def verticesByUUID(self, uuids = [], vlabel = None):
+        return [
+            self.vertices(vlabel, {
+                "uuid": uuid
+            }) or None for uuid in uuids
+        ]
+
+    def createEdges(self, edges = []):
+        return [self.createEdge(*edge) for edge in edges]
+
+    def setVertexProperties(self, vid, vproperties = {}):
+        return [
+            self.setVertexProperty(vid, name, value) for name, value in vproperties.items()
+        ]
+
+    def moveVertex(self, vid, parentid, elabel = "in"):
+
+        '''
+        Re-parent vid: drop its elabel out edges, add one to parentid.
+        '''
+
+        self.deleteOutEdges(vid, elabel)
+        return self.createEdge(vid, parentid, elabel, {
+            "name": elabel
+        })
+
+    def resolvePath(self, path = [], root = None, elabel = "in", fields = None):
+        # No whole path resolution, the caller walks the path level by level
+        return None
+
+    def iterVertices(self, listing, *args, pagesize = 1000, **kwargs):
+
+        '''
+        The vertices of a listing call, fetched pagesize at a time and
+        yielded as they come in, so a listing never holds more than a
+        page. Backends without offsets answer the whole listing in one
+        call.
+        '''
+
+        if not self.offsets:
+            for vertex in listing(*args, **kwargs) or []:
+                yield vertex
+            return
+
+        offset = 0
+
+        while True:
+            page = listing(*args, limit = pagesize, offset = offset, **kwargs) or []
+            if not page:
+                return
+
+            for vertex in page:
+                yield vertex
+
+            if len(page) != pagesize:
+                return
+
+            offset += pagesize
+
+    #
+    # Vertices
+    #
+
+    def vertices(self, vlabel = None, vproperties = {}, limit = None, offset = None, fields = None):
+        raise NotImplementedError()
+
+    def verticesWithEdge(self, elabel, elvalue = None, limit = None, offset = None, fields = None):
+        raise NotImplementedError()
+
+    def verticesWithoutEdge(self, elabel, limit = None, offset = None, fields = None):
+        raise NotImplementedError()
+
+    def vertex(self, vid = None):
+        raise NotImplementedError()
+
+    def createVertex(self, vlabel = None, vproperties = {}):
+        raise NotImplementedError()
+
+    def updateVertex(self, vid, vproperties = {}):
+        raise NotImplementedError()
+
+    def deleteVertex(self, vid):
+        raise NotImplementedError()
+
+    def setVertexProperty(self, vid, name, value):
+        raise NotImplementedError()
+
+    def unsetVertexProperty(self, vid, name):
+        raise NotImplementedError()
+
+    def vertexProperties(self, vid, vproperties = {}):
+        pass
+
+    def vertexProperty(self, vid, vproperties = {}):
+        pass
+
+    #
+    # Edges
+    #
+
+    def edges(self, elabel = None, eproperties = {}):
+        raise NotImplementedError()
+
+    def edge(self, vid = None):
+        raise NotImplementedError()
+
+    def createEdge(self, svid, tvid, elabel = None, eproperties = {}):
+        raise NotImplementedError()
+
+    def updateEdge(self, eid, eproperties = {}):
+        raise NotImplementedError()
+
+    def deleteEdge(self, eid):
+        raise NotImplementedError()
+
+    def deleteVertexInEdge(self, vid, elabel, eproperties = {}):
+        pass
+
+    def deleteVertexOutEdge(self, vid, elabel, eproperties = {}):
+        pass
+
+    def inEdges(self, vid, elabel = None, eproperties = {}):
+        raise NotImplementedError()
+
+    def outEdges(self, vid, elabel = None, eproperties = {}):
+        raise NotImplementedError()
+
+    def deleteInEdges(self, vid, elabel = None):
+        raise NotImplementedError()
+
+    def deleteOutEdges(self, vid, elabel = None):
+        raise NotImplementedError()
+
+    def inEdgesInVertices(self, vid, elabel = None, eproperties = {}, vlabel = None, vproperties = {}):
+        raise NotImplementedError()
+
+    def inEdgesOutVertices(self, vid, elabel = None, eproperties = {}, vlabel = None, vproperties = {}, limit = None, offset = None, fields = None):
+        raise NotImplementedError()
+
+    def outEdgesInVertices(self, vid, elabel = None, eproperties = {}, vlabel = None, vproperties = {}):
+        raise NotImplementedError()
+
+    def outEdgesOutVertices(self, vid, elabel = None, eproperties = {}, vlabel = None, vproperties = {}):
+        raise NotImplementedError()
+
+    def inVertices(self, vid, elabel = None, eproperties = {}):
+        raise NotImplementedError()
+
+    def outVertices(self, vid, elabel = None, eproperties = {}):
+        raise NotImplementedError()
+
+    #
+    # Content
+    #
+
+    def context(self, vid):
+        raise NotImplementedError()
+
+    def render(self, vid):
+        raise NotImplementedError()
+
+
+
+__all__ = [
+    'GFSAPIError',
+    'GFSAPIBackend'
+]
+
+__default__ = 'GFSAPIBackend'
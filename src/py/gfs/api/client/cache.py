@@ -0,0 +1,272 @@
+# 
+# Copyright (c) 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import sys
+import heapq
+import threading
+
+from collections import OrderedDict
+from time import monotonic
+
+from gfs.common.log import GFSLogger
+
+
+
+class GFSCache():
+
+    '''
+    Bounded LRU cache keyed by (path, oper).
+
+    Entries are evicted least recently used first once either max_entries
+    or max_bytes is exceeded. Entries with an expiry are dropped on lookup
+    once expired, and are also actively purged every purge_interval seconds
+    so that entries nobody asks for again do not linger. All times come from
+    the monotonic clock.
+
+    Entries can carry tags, invalidate(tag) drops every entry with that tag.
+
+    All methods are safe to call from several threads, each holds the
+    cache lock only for its dict work.
+    '''
+
+    logger = GFSLogger.getLogger("GFSCache")
+
+    def __init__(
+        self,
+
+        max_entries = 10000,
+        max_bytes = 64 * 1024 * 1024,
+        purge_interval = 30,
+
+        **kwargs):
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.purge_interval = purge_interval
+
+        self.lock = threading.RLock()
+        self.entries = OrderedDict() # (path, oper) -> entry
+        self.paths = {} # path -> set of opers
+        self.tags = {} # tag -> set of (path, oper)
+        self.expiry = [] # heap of (expire, seq, key)
+        self.seq = 0
+        self.bytes = 0
+        self.purged = monotonic()
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    def sizeof(self, data):
+
+        if data is None:
+            return 0
+
+        if type(data) in (str, bytes):
+            return len(data)
+
+        if type(data) == dict:
+            return sum([self.sizeof(value) for value in data.values()])
+
+        if type(data) in (list, tuple):
+            return sum([self.sizeof(value) for value in data])
+
+        return sys.getsizeof(data)
+
+    def lookup(self, path, oper):
+
+        with self.lock:
+            key = (path, oper)
+
+            entry = self.entries.get(key)
+            if not entry:
+                return None
+
+            if entry["expire"] and entry["expire"] <= monotonic():
+                self.logger.debug("CACHE: lookup: found entry with expire, is expired")
+                self.remove(key)
+                return None
+
+            self.entries.move_to_end(key)
+            return entry
+
+    def prepare(self, path, oper, expire_seconds = None):
+
+        with self.lock:
+            key = (path, oper)
+
+            now = monotonic()
+
+            expire = None
+            if expire_seconds:
+                expire = now + expire_seconds
+
+            entry = self.entries.get(key)
+            if entry:
+                self.bytes -= entry["size"]
+                self.untag(key, entry)
+                self.entries.move_to_end(key)
+            else:
+                entry = {}
+                self.entries[key] = entry
+                self.paths.setdefault(path, set()).add(oper)
+
+            entry.update({
+                "path": path,
+                "oper": oper,
+                "flags": 1, # Indicate not yet active cache entry
+                "created": now,
+                "expire": expire,
+                "data": None,
+                "size": 0,
+                "tags": set()
+            })
+
+            if expire:
+                self.seq += 1
+                heapq.heappush(self.expiry, (expire, self.seq, key))
+
+            self.maintain()
+
+            return entry
+
+    def finalize(self, path, oper, data, size = None, tags = None, expire_seconds = None):
+
+        with self.lock:
+            key = (path, oper)
+
+            entry = self.entries.get(key)
+            if not entry:
+                entry = self.prepare(path, oper)
+
+            if expire_seconds:
+                # Override the expiry given at prepare time
+                entry["expire"] = monotonic() + expire_seconds
+                self.seq += 1
+                heapq.heappush(self.expiry, (entry["expire"], self.seq, key))
+
+            if size is None:
+                size = self.sizeof(data)
+
+            self.bytes -= entry["size"]
+
+            entry["data"] = data
+            entry["size"] = size
+            entry["flags"] = 0 # Indicate active cache entry
+
+            self.bytes += size
+
+            if tags:
+                self.untag(key, entry)
+                entry["tags"] = set(tags)
+                for tag in entry["tags"]:
+                    self.tags.setdefault(tag, set()).add(key)
+
+            self.maintain()
+
+            return entry
+
+    def remove(self, key):
+
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if not entry:
+                return None
+
+            self.bytes -= entry["size"]
+            self.untag(key, entry)
+
+            path, oper = key
+            opers = self.paths.get(path)
+            if opers:
+                opers.discard(oper)
+                if not opers:
+                    del self.paths[path]
+
+            return entry
+
+    def untag(self, key, entry):
+        for tag in entry.get("tags", []):
+            keys = self.tags.get(tag)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self.tags[tag]
+
+    def discard(self, path):
+        with self.lock:
+            for oper in list(self.paths.get(path, [])):
+                self.remove((path, oper))
+
+    def tagged(self, tag):
+        with self.lock:
+            return [self.entries[key] for key in self.tags.get(tag, []) if key in self.entries]
+
+    def invalidate(self, tag):
+        with self.lock:
+            keys = list(self.tags.get(tag, []))
+            for key in keys:
+                self.remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries = OrderedDict()
+            self.paths = {}
+            self.tags = {}
+            self.expiry = []
+            self.bytes = 0
+
+    def maintain(self):
+
+        with self.lock:
+            if monotonic() - self.purged > self.purge_interval:
+                self.purge()
+
+            evicted = 0
+
+            while self.entries and \
+                ( ( self.max_entries and len(self.entries) > self.max_entries ) or \
+                  ( self.max_bytes and self.bytes > self.max_bytes ) ):
+                key = next(iter(self.entries))
+                self.remove(key)
+                evicted += 1
+
+            if evicted:
+                self.logger.debug("CACHE: evicted %d entries, %d entries, %d bytes left", evicted, len(self.entries), self.bytes)
+
+    def purge(self):
+
+        with self.lock:
+            now = monotonic()
+            self.purged = now
+
+            purged = 0
+
+            while self.expiry and self.expiry[0][0] <= now:
+                expire, seq, key = heapq.heappop(self.expiry)
+                entry = self.entries.get(key)
+                # Entry may have been re-prepared with a later expiry since
+                if entry and entry["expire"] and entry["expire"] <= now:
+                    self.remove(key)
+                    purged += 1
+
+            # Drop heap items left behind by removed or re-prepared entries
+            if len(self.expiry) > 2 * len(self.entries) + 64:
+                self.expiry = [item for item in self.expiry if item[2] in self.entries]
+                heapq.heapify(self.expiry)
+
+            if purged:
+                self.logger.debug("CACHE: purged %d expired entries", purged)
+
+            return purged
+
+
+
+__all__ = [
+    'GFSCache'
+]
+
+__default__ = 'GFSCache'
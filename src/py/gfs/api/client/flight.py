@@ -0,0 +1,75 @@
+# 
+# Copyright (c) 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import threading
+
+from gfs.common.log import GFSLogger
+
+
+
+class GFSAPIFlights():
+
+    '''
+    Single-flight call coalescing. The first caller for a key runs the call,
+    callers arriving for the same key while it is still running wait for it
+    and get the same result (or exception) instead of issuing their own.
+    '''
+
+    logger = GFSLogger.getLogger("GFSAPIFlights")
+
+    def __init__(self, **kwargs):
+        self.lock = threading.Lock()
+        self.flights = {}
+
+    def do(self, key, fn, *args, **kwargs):
+
+        with self.lock:
+            flight = self.flights.get(key)
+            leader = not flight
+            if leader:
+                flight = {
+                    "event": threading.Event(),
+                    "result": None,
+                    "error": None,
+                    "waiters": 0
+                }
+                self.flights[key] = flight
+            else:
+                flight["waiters"] += 1
+
+        if not leader:
+            self.logger.debug(' GFSAPIFlights: waiting on in-flight call for key: %s', key)
+            flight["event"].wait()
+            if flight["error"]:
+                raise flight["error"]
+            return flight["result"]
+
+        try:
+            flight["result"] = fn(*args, **kwargs)
+
+        except Exception as e:
+            flight["error"] = e
+            raise e
+
+        finally:
+            with self.lock:
+                del self.flights[key]
+            flight["event"].set()
+            if flight["waiters"]:
+                self.logger.debug(' GFSAPIFlights: shared call for key: %s with %d waiters', key, flight["waiters"])
+
+        return flight["result"]
+
+    def inflight(self, key):
+        with self.lock:
+            return key in self.flights
+
+
+
+__all__ = [
+    'GFSAPIFlights'
+]
+
+__default__ = 'GFSAPIFlights'
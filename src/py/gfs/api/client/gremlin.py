@@ -0,0 +1,481 @@
+# 
+# Copyright (c) 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import threading
+
+from gremlin_python.process.graph_traversal import __
+from gremlin_python.process.traversal import T
+from gremlin_python.process.traversal import P
+from gremlin_python.process.traversal import Cardinality
+from gremlin_python.process.traversal import Bindings
+
+from gfs.common.log import GFSLogger
+
+from gfs.api.client.backend import GFSAPIError
+from gfs.api.client.backend import GFSAPIBackend
+
+
+
+class GFSGremlinAPI(GFSAPIBackend):
+
+    '''
+    Talks to Gremlin Server directly, without the REST sidecar. Every call
+    is one bytecode traversal, with ids, labels and property values sent as
+    bindings so the server sees the same traversal shape for every call
+    of a kind. Results are turned into the same GraphSON shaped dicts the
+    sidecar returns.
+
+    The traversal source can be passed in as g, any gremlinpython style
+    traversal source will do, otherwise one is opened on url. There is no
+    template rendering here, content is served as stored.
+    '''
+
+    logger = GFSLogger.getLogger("GFSGremlinAPI")
+
+    def __init__(
+        self,
+
+        url = None,
+        traversal_source = "g",
+        g = None,
+        name_property = "name",
+
+        **kwargs):
+
+        self.url = url
+        self.traversal_source = traversal_source
+        self.name_property = name_property
+        self.connection = None
+        self.lock = threading.Lock()
+
+        self.g = g
+
+    def source(self):
+
+        if self.g is None:
+            with self.lock:
+                if self.g is None:
+                    # Cannot include at top, only needed without
+                    # a traversal source given
+                    from gremlin_python.structure.graph import Graph
+                    from gremlin_python.driver.driver_remote_connection import DriverRemoteConnection
+
+                    self.logger.debug(' GFSGremlinAPI: connecting to %s', self.url)
+                    self.connection = DriverRemoteConnection(
+                        self.url,
+                        self.traversal_source
+                    )
+                    self.g = Graph().traversal().withRemote(
+                        self.connection
+                    )
+
+        return self.g
+
+    def warmup(self):
+        return self.source()
+
+    def close(self):
+        if self.connection:
+            self.connection.close()
+            self.connection = None
+            self.g = None
+
+    def bind(self, name, value):
+        # Bindings only go in as step arguments, not inside predicates
+        return Bindings().of(name, value)
+
+    #
+    # Results, as the sidecar would return them
+    #
+
+    def value(self, value):
+        # valueMap() holds vertex properties as lists
+        if isinstance(value, list):
+            if not value:
+                return None
+            return value[0]
+        return value
+
+    def vjson(self, valuemap):
+        properties = {}
+        vid = None
+        label = None
+        for key, value in valuemap.items():
+            if key in (T.id, "id"):
+                vid = value
+            elif key in (T.label, "label"):
+                label = value
+            else:
+                properties[str(key)] = self.value(value)
+        return {
+            "@type": "g:Vertex",
+            "@value": {
+                "id": vid,
+                "label": label,
+                "properties": properties
+            }
+        }
+
+    def ejson(self, projection):
+        return {
+            "@type": "g:Edge",
+            "@value": {
+                "id": projection.get("id"),
+                "label": projection.get("label"),
+                "inV": projection.get("inV"),
+                "outV": projection.get("outV"),
+                "properties": dict(projection.get("properties") or {})
+            }
+        }
+
+    def valueMap(self, traversal, fields = None):
+        # Only the fields asked for, id and label come along anyway
+        return traversal.valueMap(True, *( fields or [] ))
+
+    def vertexList(self, traversal, fields = None):
+        return [
+            self.vjson(valuemap) for valuemap in self.valueMap(traversal, fields).toList()
+        ]
+
+    def edgeList(self, traversal):
+        return [
+            self.ejson(projection) for projection in traversal.project(
+                "id", "label", "outV", "inV", "properties"
+            ).by(
+                T.id
+            ).by(
+                T.label
+            ).by(
+                __.outV().id()
+            ).by(
+                __.inV().id()
+            ).by(
+                __.valueMap()
+            ).toList()
+        ]
+
+    def one(self, items, what, resourceid):
+        if not items:
+            raise GFSAPIError(
+                '{} {} {}'.format(
+                    what,
+                    resourceid,
+                    404
+                ),
+                status = 404
+            )
+        return items[0]
+
+    def V(self, vid):
+        return self.source().V(
+            self.bind("vid", self.graphid(vid))
+        )
+
+    def E(self, eid):
+        return self.source().E(
+            self.bind("eid", self.graphid(eid))
+        )
+
+    def paged(self, traversal, limit = None, offset = None):
+        if limit is None:
+            return traversal
+        offset = offset or 0
+        # Servers do not keep an order between calls, pages need one
+        return traversal.order().by(
+            T.id
+        ).range(
+            self.bind("low", offset),
+            self.bind("high", offset + limit)
+        )
+
+    def filtered(self, traversal, label = None, properties = {}):
+        if label:
+            traversal = traversal.hasLabel(
+                self.bind("label", label)
+            )
+        for i, ( name, value ) in enumerate(( properties or {} ).items()):
+            if name == "label":
+                continue
+            traversal = traversal.has(
+                name,
+                self.bind("value" + str(i), value)
+            )
+        return traversal
+
+    #
+    # FS patterns, one traversal each
+    #
+
+    def resolvePath(self, path = [], root = None, elabel = "in", fields = None):
+
+        '''
+        The whole chain for path in one traversal, following elabel edges
+        down from root (or from the vertices without one). A component
+        matches on the name property, with or without its label suffix,
+        the caller checks the chain against the real short names. Returns
+        [] if the path does not resolve all the way, the caller then walks
+        it level by level.
+        '''
+
+        self.logger.debug(' GFSGremlinAPI: resolvePath ')
+
+        if not path:
+            return []
+
+        if root is not None:
+            traversal = self.V(root)
+        else:
+            traversal = self.source().V()
+
+        for i, elem in enumerate(path):
+            names = [elem]
+            if "." in elem:
+                names.append(elem.rsplit(".", 1)[0])
+            if root is None and i == 0:
+                traversal = traversal.not_(
+                    __.outE(elabel)
+                ).has(
+                    self.name_property, P.within(*names)
+                )
+            else:
+                traversal = traversal.in_(
+                    elabel
+                ).has(
+                    self.name_property, P.within(*names)
+                )
+
+        paths = traversal.path().by(
+            self.valueMap(__, fields)
+        ).limit(1).toList()
+        if not paths:
+            return []
+
+        chain = [self.vjson(valuemap) for valuemap in paths[0].objects]
+        if root is not None:
+            # The path starts at root
+            chain = chain[1:]
+
+        return chain
+
+    def moveVertex(self, vid, parentid, elabel = "in"):
+        self.logger.debug(' GFSGremlinAPI: moveVertex ')
+        return self.one(self.edgeList(
+            self.V(vid).sideEffect(
+                __.outE(elabel).drop()
+            ).addE(
+                self.bind("elabel", elabel)
+            ).to(
+                __.V(self.bind("parentid", self.graphid(parentid)))
+            ).property(
+                "name", elabel
+            )
+        ), "vertex", vid)
+
+    def setVertexProperties(self, vid, vproperties = {}):
+        self.logger.debug(' GFSGremlinAPI: setVertexProperties ')
+        traversal = self.V(vid)
+        for i, ( name, value ) in enumerate(vproperties.items()):
+            traversal = traversal.property(
+                Cardinality.single,
+                name,
+                self.bind("value" + str(i), value)
+            )
+        traversal.iterate()
+        return [self.propertybody(name, value) for name, value in vproperties.items()]
+
+    def verticesById(self, vids = []):
+        self.logger.debug(' GFSGremlinAPI: verticesById ')
+        found = {}
+        for vertex in self.vertexList(self.source().V(
+            *[self.graphid(vid) for vid in vids]
+        )):
+            found[self.apiid(vertex["@value"]["id"])] = vertex
+        return [found.get(self.apiid(vid)) for vid in vids]
+
+    #
+    # Vertices
+    #
+
+    def vertices(self, vlabel = None, vproperties = {}, limit = None, offset = None, fields = None):
+        self.logger.debug(' GFSGremlinAPI: vertices ')
+        return self.vertexList(self.paged(self.filtered(
+            self.source().V(), vlabel, vproperties
+        ), limit, offset), fields)
+
+    def verticesWithEdge(self, elabel, elvalue = None, limit = None, offset = None, fields = None):
+        self.logger.debug(' GFSGremlinAPI: verticesWithEdge ')
+        return self.vertexList(self.paged(
+            self.V(elvalue).in_(elabel), limit, offset
+        ), fields)
+
+    def verticesWithoutEdge(self, elabel, limit = None, offset = None, fields = None):
+        self.logger.debug(' GFSGremlinAPI: verticesWithoutEdge ')
+        return self.vertexList(self.paged(
+            self.source().V().not_(__.outE(elabel)), limit, offset
+        ), fields)
+
+    def vertex(self, vid = None):
+        self.logger.debug(' GFSGremlinAPI: vertex ')
+        return self.one(self.vertexList(
+            self.V(vid)
+        ), "vertex", vid)
+
+    def createVertex(self, vlabel = None, vproperties = {}):
+        self.logger.debug(' GFSGremlinAPI: createVertex ')
+        traversal = self.source().addV(
+            self.bind("label", vlabel or "vertex")
+        )
+        for i, ( name, value ) in enumerate(( vproperties or {} ).items()):
+            traversal = traversal.property(
+                name,
+                self.bind("value" + str(i), value)
+            )
+        return self.one(self.vertexList(traversal), "vertex", None)
+
+    def updateVertex(self, vid, vproperties = {}):
+        self.logger.debug(' GFSGremlinAPI: updateVertex ')
+        self.setVertexProperties(vid, vproperties or {})
+        return self.vertex(vid)
+
+    def deleteVertex(self, vid):
+        self.logger.debug(' GFSGremlinAPI: deleteVertex ')
+        self.V(vid).drop().iterate()
+        return None
+
+    def propertybody(self, name, value):
+        return {
+            "@type": "g:VertexProperty",
+            "@value": {
+                "label": name,
+                "value": value
+            }
+        }
+
+    def setVertexProperty(self, vid, name, value):
+        self.logger.debug(' GFSGremlinAPI: setVertexProperty ')
+        self.V(vid).property(
+            Cardinality.single,
+            name,
+            self.bind("value", value)
+        ).iterate()
+        return self.propertybody(name, value)
+
+    def unsetVertexProperty(self, vid, name):
+        self.logger.debug(' GFSGremlinAPI: unsetVertexProperty ')
+        self.V(vid).properties(name).drop().iterate()
+        return None
+
+    #
+    # Edges
+    #
+
+    def edges(self, elabel = None, eproperties = {}):
+        self.logger.debug(' GFSGremlinAPI: edges ')
+        return self.edgeList(self.filtered(
+            self.source().E(), elabel, eproperties
+        ))
+
+    def edge(self, vid = None):
+        self.logger.debug(' GFSGremlinAPI: edge ')
+        return self.one(self.edgeList(
+            self.E(vid)
+        ), "edge", vid)
+
+    def createEdge(self, svid, tvid, elabel = None, eproperties = {}):
+        self.logger.debug(' GFSGremlinAPI: createEdge ')
+        traversal = self.V(svid).addE(
+            self.bind("elabel", elabel or "edge")
+        ).to(
+            __.V(self.bind("tvid", self.graphid(tvid)))
+        )
+        for i, ( name, value ) in enumerate(( eproperties or {} ).items()):
+            traversal = traversal.property(
+                name,
+                self.bind("value" + str(i), value)
+            )
+        return self.one(self.edgeList(traversal), "vertex", svid)
+
+    def updateEdge(self, eid, eproperties = {}):
+        self.logger.debug(' GFSGremlinAPI: updateEdge ')
+        traversal = self.E(eid)
+        for i, ( name, value ) in enumerate(( eproperties or {} ).items()):
+            traversal = traversal.property(
+                name,
+                self.bind("value" + str(i), value)
+            )
+        return self.one(self.edgeList(traversal), "edge", eid)
+
+    def deleteEdge(self, eid):
+        self.logger.debug(' GFSGremlinAPI: deleteEdge ')
+        self.E(eid).drop().iterate()
+        return None
+
+    def inEdges(self, vid, elabel = None, eproperties = {}):
+        self.logger.debug(' GFSGremlinAPI: inEdges ')
+        return self.edgeList(self.V(vid).inE(*[elabel] if elabel else []))
+
+    def outEdges(self, vid, elabel = None, eproperties = {}):
+        self.logger.debug(' GFSGremlinAPI: outEdges ')
+        return self.edgeList(self.V(vid).outE(*[elabel] if elabel else []))
+
+    def deleteInEdges(self, vid, elabel = None):
+        self.logger.debug(' GFSGremlinAPI: deleteInEdges ')
+        self.V(vid).inE(*[elabel] if elabel else []).drop().iterate()
+        return None
+
+    def deleteOutEdges(self, vid, elabel = None):
+        self.logger.debug(' GFSGremlinAPI: deleteOutEdges ')
+        self.V(vid).outE(*[elabel] if elabel else []).drop().iterate()
+        return None
+
+    def inEdgesInVertices(self, vid, elabel = None, eproperties = {}, vlabel = None, vproperties = {}):
+        self.logger.debug(' GFSGremlinAPI: inEdgeInVertices ')
+        return self.vertexList(self.V(vid).inE(*[elabel] if elabel else []).inV())
+
+    def inEdgesOutVertices(self, vid, elabel = None, eproperties = {}, vlabel = None, vproperties = {}, limit = None, offset = None, fields = None):
+        self.logger.debug(' GFSGremlinAPI: inEdgeOutVertices ')
+        return self.vertexList(self.paged(
+            self.V(vid).inE(*[elabel] if elabel else []).outV(), limit, offset
+        ), fields)
+
+    def outEdgesInVertices(self, vid, elabel = None, eproperties = {}, vlabel = None, vproperties = {}):
+        self.logger.debug(' GFSGremlinAPI: outEdgeInVertices ')
+        return self.vertexList(self.V(vid).outE(*[elabel] if elabel else []).inV())
+
+    def outEdgesOutVertices(self, vid, elabel = None, eproperties = {}, vlabel = None, vproperties = {}):
+        self.logger.debug(' GFSGremlinAPI: outEdgeOutVertices ')
+        return self.vertexList(self.V(vid).outE(*[elabel] if elabel else []).outV())
+
+    def inVertices(self, vid, elabel = None, eproperties = {}):
+        self.logger.debug(' GFSGremlinAPI: inVertices ')
+        return self.vertexList(self.V(vid).bothE(*[elabel] if elabel else []).inV())
+
+    def outVertices(self, vid, elabel = None, eproperties = {}):
+        self.logger.debug(' GFSGremlinAPI: outVertices ')
+        return self.vertexList(self.V(vid).bothE(*[elabel] if elabel else []).outV())
+
+    #
+    # Content
+    #
+
+    def context(self, vid):
+        self.logger.debug(' GFSGremlinAPI: context ')
+        return self.vertex(vid)
+
+    def render(self, vid):
+        self.logger.debug(' GFSGremlinAPI: render ')
+        vertex = self.vertex(vid)
+        return self.storedData(
+            vid,
+            vertex["@value"]["properties"].get("data")
+        )
+
+
+
+__all__ = [
+    'GFSGremlinAPI'
+]
+
+__default__ = 'GFSGremlinAPI'
@@ -0,0 +1,365 @@
+# 
+# Copyright (c) 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import itertools
+import threading
+
+from gfs.common.log import GFSLogger
+
+from gfs.api.client.backend import GFSAPIError
+from gfs.api.client.backend import GFSAPIBackend
+
+
+
+class GFSMemoryAPI(GFSAPIBackend):
+
+    '''
+    Graph kept in process, in plain dicts: vertices and edges by id,
+    adjacency by vertex and edge label in both directions, and indexes
+    on uuid and label. Answers the GFSAPI calls with the same GraphSON
+    shaped data the sidecar returns, without any I/O.
+
+    Meant as a baseline for measuring the filesystem layer on its own and
+    for single host mounts that do not need to share the graph. The graph
+    lives and dies with the process. Content is served as stored, there
+    is no template rendering here.
+    '''
+
+    logger = GFSLogger.getLogger("GFSMemoryAPI")
+
+    def __init__(self, **kwargs):
+
+        self.lock = threading.RLock()
+        self.ids = itertools.count(1)
+
+        self.vertexes = {} # id -> {id, label, properties}
+        self.edgesById = {} # id -> {id, label, outV, inV, properties}
+        self.outs = {} # vertex id -> edge label -> set of edge ids
+        self.ins = {} # vertex id -> edge label -> set of edge ids
+        self.uuids = {} # uuid -> vertex id
+        self.labels = {} # vertex label -> set of vertex ids
+
+    def notfound(self, what, resourceid):
+        return GFSAPIError(
+            '{} {} {}'.format(
+                what,
+                resourceid,
+                404
+            ),
+            status = 404
+        )
+
+    #
+    # GraphSON shaped copies of the stored elements
+    #
+
+    def vjson(self, vertex, fields = None):
+        properties = vertex["properties"]
+        if fields:
+            properties = {
+                name: properties[name] for name in fields if name in properties
+            }
+        return {
+            "@type": "g:Vertex",
+            "@value": {
+                "id": vertex["id"],
+                "label": vertex["label"],
+                "properties": dict(properties)
+            }
+        }
+
+    def ejson(self, edge):
+        return {
+            "@type": "g:Edge",
+            "@value": {
+                "id": edge["id"],
+                "label": edge["label"],
+                "inVLabel": self.vertexes[edge["inV"]]["label"],
+                "outVLabel": self.vertexes[edge["outV"]]["label"],
+                "inV": edge["inV"],
+                "outV": edge["outV"],
+                "properties": dict(edge["properties"])
+            }
+        }
+
+    def matches(self, element, label = None, properties = {}):
+        if label and element["label"] != label:
+            return False
+        for name, value in ( properties or {} ).items():
+            if name == "label":
+                continue
+            if str(element["properties"].get(name)) != str(value):
+                return False
+        return True
+
+    #
+    # Indexes
+    #
+
+    def index(self, vertex, add = True):
+        uuid = vertex["properties"].get("uuid")
+        if add:
+            self.labels.setdefault(vertex["label"], set()).add(vertex["id"])
+            if uuid:
+                self.uuids[uuid] = vertex["id"]
+        else:
+            self.labels.get(vertex["label"], set()).discard(vertex["id"])
+            if uuid and self.uuids.get(uuid) == vertex["id"]:
+                del self.uuids[uuid]
+
+    def adjacent(self, vid, elabel = None, out = True):
+        # By id, sets have no order pages could rely on
+        adjacency = ( self.outs if out else self.ins ).get(vid, {})
+        if elabel:
+            return sorted(adjacency.get(elabel, ()))
+        return sorted(eid for eids in adjacency.values() for eid in eids)
+
+    def getVertex(self, vid):
+        vertex = self.vertexes.get(self.graphid(vid))
+        if not vertex:
+            raise self.notfound("vertex", vid)
+        return vertex
+
+    def getEdge(self, eid):
+        edge = self.edgesById.get(self.graphid(eid))
+        if not edge:
+            raise self.notfound("edge", eid)
+        return edge
+
+    def dropEdge(self, eid):
+        edge = self.edgesById.pop(eid, None)
+        if not edge:
+            return None
+        self.outs.get(edge["outV"], {}).get(edge["label"], set()).discard(eid)
+        self.ins.get(edge["inV"], {}).get(edge["label"], set()).discard(eid)
+        return edge
+
+    #
+    # Vertices
+    #
+
+    def vertices(self, vlabel = None, vproperties = {}, limit = None, offset = None, fields = None):
+        self.logger.debug(' GFSMemoryAPI: vertices ')
+        with self.lock:
+            vproperties = dict(vproperties or {})
+            vlabel = vlabel or vproperties.get("label")
+            if vproperties.get("uuid"):
+                vid = self.uuids.get(vproperties.get("uuid"))
+                candidates = [vid] if vid is not None else []
+            elif vlabel:
+                candidates = sorted(self.labels.get(vlabel, ()))
+            else:
+                candidates = self.vertexes.keys()
+            return self.page((
+                self.vjson(self.vertexes[vid], fields) for vid in candidates if \
+                    self.matches(self.vertexes[vid], vlabel, vproperties)
+            ), limit, offset)
+
+    def verticesWithEdge(self, elabel, elvalue = None, limit = None, offset = None, fields = None):
+        self.logger.debug(' GFSMemoryAPI: verticesWithEdge ')
+        return self.inEdgesOutVertices(elvalue, elabel, limit = limit, offset = offset, fields = fields)
+
+    def verticesWithoutEdge(self, elabel, limit = None, offset = None, fields = None):
+        self.logger.debug(' GFSMemoryAPI: verticesWithoutEdge ')
+        with self.lock:
+            return self.page((
+                self.vjson(vertex, fields) for vid, vertex in self.vertexes.items() if \
+                    not self.adjacent(vid, elabel, True)
+            ), limit, offset)
+
+    def vertex(self, vid = None):
+        self.logger.debug(' GFSMemoryAPI: vertex ')
+        with self.lock:
+            return self.vjson(self.getVertex(vid))
+
+    def createVertex(self, vlabel = None, vproperties = {}):
+        self.logger.debug(' GFSMemoryAPI: createVertex ')
+        with self.lock:
+            vertex = {
+                "id": next(self.ids),
+                "label": vlabel or "vertex",
+                "properties": dict(vproperties or {})
+            }
+            self.vertexes[vertex["id"]] = vertex
+            self.index(vertex)
+            return self.vjson(vertex)
+
+    def updateVertex(self, vid, vproperties = {}):
+        self.logger.debug(' GFSMemoryAPI: updateVertex ')
+        with self.lock:
+            vertex = self.getVertex(vid)
+            self.index(vertex, False)
+            vertex["properties"].update(vproperties or {})
+            self.index(vertex)
+            return self.vjson(vertex)
+
+    def deleteVertex(self, vid):
+        self.logger.debug(' GFSMemoryAPI: deleteVertex ')
+        with self.lock:
+            vertex = self.getVertex(vid)
+            for eid in self.adjacent(vertex["id"], None, True) + self.adjacent(vertex["id"], None, False):
+                self.dropEdge(eid)
+            self.outs.pop(vertex["id"], None)
+            self.ins.pop(vertex["id"], None)
+            self.index(vertex, False)
+            del self.vertexes[vertex["id"]]
+            return None
+
+    def setVertexProperty(self, vid, name, value):
+        self.logger.debug(' GFSMemoryAPI: setVertexProperty ')
+        with self.lock:
+            vertex = self.getVertex(vid)
+            self.index(vertex, False)
+            vertex["properties"][name] = value
+            self.index(vertex)
+            return {
+                "@type": "g:VertexProperty",
+                "@value": {
+                    "label": name,
+                    "value": value
+                }
+            }
+
+    def unsetVertexProperty(self, vid, name):
+        self.logger.debug(' GFSMemoryAPI: unsetVertexProperty ')
+        with self.lock:
+            vertex = self.getVertex(vid)
+            self.index(vertex, False)
+            vertex["properties"].pop(name, None)
+            self.index(vertex)
+            return None
+
+    #
+    # Edges
+    #
+
+    def edges(self, elabel = None, eproperties = {}):
+        self.logger.debug(' GFSMemoryAPI: edges ')
+        with self.lock:
+            return [
+                self.ejson(edge) for edge in self.edgesById.values() if \
+                    self.matches(edge, elabel, eproperties)
+            ]
+
+    def edge(self, vid = None):
+        self.logger.debug(' GFSMemoryAPI: edge ')
+        with self.lock:
+            return self.ejson(self.getEdge(vid))
+
+    def createEdge(self, svid, tvid, elabel = None, eproperties = {}):
+        self.logger.debug(' GFSMemoryAPI: createEdge ')
+        with self.lock:
+            source = self.getVertex(svid)
+            target = self.getVertex(tvid)
+            edge = {
+                "id": next(self.ids),
+                "label": elabel or "edge",
+                "outV": source["id"],
+                "inV": target["id"],
+                "properties": dict(eproperties or {})
+            }
+            self.edgesById[edge["id"]] = edge
+            self.outs.setdefault(source["id"], {}).setdefault(edge["label"], set()).add(edge["id"])
+            self.ins.setdefault(target["id"], {}).setdefault(edge["label"], set()).add(edge["id"])
+            return self.ejson(edge)
+
+    def updateEdge(self, eid, eproperties = {}):
+        self.logger.debug(' GFSMemoryAPI: updateEdge ')
+        with self.lock:
+            edge = self.getEdge(eid)
+            edge["properties"].update(eproperties or {})
+            return self.ejson(edge)
+
+    def deleteEdge(self, eid):
+        self.logger.debug(' GFSMemoryAPI: deleteEdge ')
+        with self.lock:
+            self.dropEdge(self.getEdge(eid)["id"])
+            return None
+
+    def inEdges(self, vid, elabel = None, eproperties = {}):
+        self.logger.debug(' GFSMemoryAPI: inEdges ')
+        with self.lock:
+            return [
+                self.ejson(self.edgesById[eid]) for eid in self.adjacent(self.graphid(vid), elabel, False)
+            ]
+
+    def outEdges(self, vid, elabel = None, eproperties = {}):
+        self.logger.debug(' GFSMemoryAPI: outEdges ')
+        with self.lock:
+            return [
+                self.ejson(self.edgesById[eid]) for eid in self.adjacent(self.graphid(vid), elabel, True)
+            ]
+
+    def deleteInEdges(self, vid, elabel = None):
+        self.logger.debug(' GFSMemoryAPI: deleteInEdges ')
+        with self.lock:
+            for eid in self.adjacent(self.graphid(vid), elabel, False):
+                self.dropEdge(eid)
+            return None
+
+    def deleteOutEdges(self, vid, elabel = None):
+        self.logger.debug(' GFSMemoryAPI: deleteOutEdges ')
+        with self.lock:
+            for eid in self.adjacent(self.graphid(vid), elabel, True):
+                self.dropEdge(eid)
+            return None
+
+    def moveVertex(self, vid, parentid, elabel = "in"):
+        self.logger.debug(' GFSMemoryAPI: moveVertex ')
+        with self.lock:
+            return super().moveVertex(vid, parentid, elabel)
+
+    def ends(self, vid, elabel, out, end, limit = None, offset = None, fields = None):
+        # Vertices at the end of the edges of vid, out or in ones
+        with self.lock:
+            return self.page((
+                self.vjson(self.vertexes[self.edgesById[eid][end]], fields) for eid in self.adjacent(self.graphid(vid), elabel, out)
+            ), limit, offset)
+
+    def inEdgesInVertices(self, vid, elabel = None, eproperties = {}, vlabel = None, vproperties = {}):
+        self.logger.debug(' GFSMemoryAPI: inEdgeInVertices ')
+        return self.ends(vid, elabel, False, "inV")
+
+    def inEdgesOutVertices(self, vid, elabel = None, eproperties = {}, vlabel = None, vproperties = {}, limit = None, offset = None, fields = None):
+        self.logger.debug(' GFSMemoryAPI: inEdgeOutVertices ')
+        return self.ends(vid, elabel, False, "outV", limit, offset, fields)
+
+    def outEdgesInVertices(self, vid, elabel = None, eproperties = {}, vlabel = None, vproperties = {}):
+        self.logger.debug(' GFSMemoryAPI: outEdgeInVertices ')
+        return self.ends(vid, elabel, True, "inV")
+
+    def outEdgesOutVertices(self, vid, elabel = None, eproperties = {}, vlabel = None, vproperties = {}):
+        self.logger.debug(' GFSMemoryAPI: outEdgeOutVertices ')
+        return self.ends(vid, elabel, True, "outV")
+
+    def inVertices(self, vid, elabel = None, eproperties = {}):
+        self.logger.debug(' GFSMemoryAPI: inVertices ')
+        return self.ends(vid, elabel, True, "inV") + self.ends(vid, elabel, False, "inV")
+
+    def outVertices(self, vid, elabel = None, eproperties = {}):
+        self.logger.debug(' GFSMemoryAPI: outVertices ')
+        return self.ends(vid, elabel, True, "outV") + self.ends(vid, elabel, False, "outV")
+
+    #
+    # Content
+    #
+
+    def context(self, vid):
+        self.logger.debug(' GFSMemoryAPI: context ')
+        return self.vertex(vid)
+
+    def render(self, vid):
+        self.logger.debug(' GFSMemoryAPI: render ')
+        with self.lock:
+            data = self.getVertex(vid)["properties"].get("data")
+        return self.storedData(vid, data)
+
+
+
+__all__ = [
+    'GFSMemoryAPI'
+]
+
+__default__ = 'GFSMemoryAPI'
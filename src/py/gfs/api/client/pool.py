@@ -0,0 +1,164 @@
+# 
+# Copyright (c) 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import threading
+
+from time import monotonic
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from gfs.common.log import GFSLogger
+
+
+
+class GFSAPISessionPool():
+
+    '''
+    Keep-alive HTTP sessions for the API client, one per calling thread.
+
+    requests.Session is not safe to share between threads, so every thread
+    gets its own session (and with it its own urllib3 connection pool of
+    pool_size connections). Sessions that have not been used for pool_idle
+    seconds, or whose thread has gone away, are closed by reap().
+    '''
+
+    logger = GFSLogger.getLogger("GFSAPISessionPool")
+
+    def __init__(
+        self,
+
+        pool_size = 10,
+        pool_idle = 300,
+
+        **kwargs):
+
+        self.pool_size = int(pool_size or 1)
+        self.pool_idle = pool_idle
+
+        self.lock = threading.Lock()
+        self.sessions = {} # thread ident -> entry
+        self.reaped = monotonic()
+
+    def create(self):
+
+        session = requests.Session()
+
+        adapter = HTTPAdapter(
+            pool_connections = 1,
+            pool_maxsize = self.pool_size
+        )
+
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        return session
+
+    def acquire(self):
+
+        ident = threading.get_ident()
+
+        with self.lock:
+            entry = self.sessions.get(ident)
+            if not entry:
+                self.logger.debug(' GFSAPISessionPool: new session for thread: %s', ident)
+                entry = {
+                    "session": self.create(),
+                    "used": monotonic(),
+                    "busy": 0
+                }
+                self.sessions[ident] = entry
+
+            entry["busy"] += 1
+
+        return entry
+
+    def release(self, entry):
+
+        with self.lock:
+            entry["busy"] -= 1
+            entry["used"] = monotonic()
+
+        if self.pool_idle and monotonic() - self.reaped > self.pool_idle:
+            self.reap()
+
+    def request(self, method, url, **kwargs):
+
+        entry = self.acquire()
+
+        try:
+            return entry["session"].request(
+                method,
+                url,
+                **kwargs
+            )
+
+        finally:
+            self.release(entry)
+
+    def warmup(self, url, timeout = 5):
+
+        # Any response, even an error status, leaves an open
+        # keep-alive connection behind in this thread's session
+        try:
+            self.request(
+                "HEAD",
+                url,
+                timeout = timeout
+            )
+            return True
+
+        except Exception as e:
+            self.logger.warning(' GFSAPISessionPool: warmup failed for URL: %s: %s', url, str(e))
+
+        return False
+
+    def reap(self):
+
+        now = monotonic()
+        alive = set([thread.ident for thread in threading.enumerate()])
+
+        reaped = []
+
+        with self.lock:
+            self.reaped = now
+            for ident, entry in list(self.sessions.items()):
+                if entry["busy"]:
+                    continue
+                if ident not in alive or \
+                    ( self.pool_idle and now - entry["used"] > self.pool_idle ):
+                    reaped.append(entry)
+                    del self.sessions[ident]
+
+        for entry in reaped:
+            try:
+                entry["session"].close()
+            except Exception as e:
+                pass
+
+        if reaped:
+            self.logger.debug(' GFSAPISessionPool: reaped %d idle sessions', len(reaped))
+
+        return len(reaped)
+
+    def close(self):
+
+        with self.lock:
+            entries = list(self.sessions.values())
+            self.sessions = {}
+
+        for entry in entries:
+            try:
+                entry["session"].close()
+            except Exception as e:
+                pass
+
+
+
+__all__ = [
+    'GFSAPISessionPool'
+]
+
+__default__ = 'GFSAPISessionPool'
@@ -0,0 +1,260 @@
+# 
+# Copyright (c) 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import weakref
+import threading
+
+from time import monotonic
+
+from gfs.common.log import GFSLogger
+
+
+
+class GFSAPIRecord(dict):
+
+    '''
+    Read-only decoded API object, as held by the API cache and shared by
+    every caller that gets a cache hit. Vertex and edge records also carry
+    vals, the unwrapped id/label/properties map GFSNode builds nodes from,
+    so that is only computed once per fetch. Records from a projected
+    response carry the property names asked for in fields, None for a
+    whole vertex.
+    '''
+
+    __slots__ = ("vals", "stamp", "fields", "__weakref__")
+
+    def readonly(self, *args, **kwargs):
+        raise TypeError("GFSAPIRecord is read-only")
+
+    __setitem__ = readonly
+    __delitem__ = readonly
+    __ior__ = readonly
+    clear = readonly
+    pop = readonly
+    popitem = readonly
+    setdefault = readonly
+    update = readonly
+
+    # In place changes, for GFSAPIIdentityMap only
+
+    def refresh(self, other):
+        dict.clear(self)
+        dict.update(self, other)
+        self.vals = other.vals
+        self.fields = getattr(other, "fields", None)
+
+    def merge(self, other):
+        # The projected properties of other, the rest stays as it was
+        properties = self.get("@value", {}).get("properties")
+        if properties is None or not other.vals:
+            return False
+        others = other.get("@value", {}).get("properties") or {}
+        for name in other.fields or ():
+            if name in others:
+                dict.__setitem__(properties, name, others[name])
+                self.vals[name] = other.vals.get(name)
+            elif name in properties:
+                dict.__delitem__(properties, name)
+                self.vals.pop(name, None)
+        return True
+
+    def patch(self, name, value):
+        properties = self.get("@value", {}).get("properties")
+        if properties is None:
+            return False
+        dict.__setitem__(properties, name, gfsfreeze(value))
+        self.vals[name] = gfsvalue( value )
+        return True
+
+    def unset(self, name):
+        properties = self.get("@value", {}).get("properties")
+        if properties is None:
+            return False
+        if name in properties:
+            dict.__delitem__(properties, name)
+        self.vals.pop(name, None)
+        return True
+
+
+
+class GFSAPIIdentityMap():
+
+    '''
+    One canonical record per vertex, by id and by uuid.
+
+    intern() swaps every vertex in a decoded response for the canonical
+    record of that vertex, refreshing it with the newer data, so the same
+    vertex cached under vertex/<id>, vertex?uuid=... and any number of
+    adjacency listings is one object. patch() then updates all of those
+    at once. Records are only weakly held here, the cache entries that
+    contain them keep them alive, and are not handed out by lookup() once
+    older than expire seconds.
+
+    A partial record, from a response projected to some fields, is merged
+    into a complete one rather than replacing it, and keeps its age. A
+    record that is partial is only handed out by lookup() if asked for.
+    '''
+
+    logger = GFSLogger.getLogger("GFSAPIIdentityMap")
+
+    def __init__(self, expire = 60, **kwargs):
+        self.expire = expire
+        self.lock = threading.RLock()
+        self.ids = weakref.WeakValueDictionary()
+        self.uuids = weakref.WeakValueDictionary()
+
+    def key(self, vid):
+        if vid is None:
+            return None
+        return str(vid).replace("#", "")
+
+    def record(self, vid):
+        with self.lock:
+            return self.ids.get(self.key(vid))
+
+    def lookup(self, vid = None, uuid = None, partial = False):
+
+        with self.lock:
+            record = None
+            if vid is not None:
+                record = self.ids.get(self.key(vid))
+            elif uuid:
+                record = self.uuids.get(uuid)
+
+            if record is not None and self.expire and \
+                getattr(record, "stamp", 0) + self.expire <= monotonic():
+                return None
+
+            if record is not None and not partial and \
+                getattr(record, "fields", None):
+                return None
+
+            return record
+
+    def intern(self, data, stamp = None):
+
+        with self.lock:
+            if isinstance(data, tuple):
+                return tuple(self.intern(item, stamp) for item in data)
+
+            if not isinstance(data, GFSAPIRecord) or \
+                data.get("@type") != "g:Vertex" or \
+                not getattr(data, "vals", None):
+                return data
+
+            key = self.key(data.vals.get("id"))
+            if key is None:
+                return data
+
+            record = self.ids.get(key)
+            if record is None:
+                record = data
+                record.stamp = stamp or monotonic()
+            elif record is data:
+                record.stamp = stamp or monotonic()
+            elif getattr(data, "fields", None) and not getattr(record, "fields", None):
+                # Only the projected properties are newer
+                record.merge(data)
+            else:
+                record.refresh(data)
+                record.stamp = stamp or monotonic()
+
+            self.ids[key] = record
+            uuid = record.vals.get("uuid")
+            if uuid:
+                self.uuids[uuid] = record
+
+            return record
+
+    def patch(self, vid, name, value):
+        with self.lock:
+            record = self.record(vid)
+            if record is None:
+                return False
+            self.logger.debug(' GFSAPIIdentityMap: patch: %s: %s', vid, name)
+            return record.patch(name, value)
+
+    def unset(self, vid, name):
+        with self.lock:
+            record = self.record(vid)
+            if record is None:
+                return False
+            self.logger.debug(' GFSAPIIdentityMap: unset: %s: %s', vid, name)
+            return record.unset(name)
+
+    def forget(self, vid):
+        with self.lock:
+            record = self.ids.pop(self.key(vid), None)
+            if record is not None and record.vals:
+                uuid = record.vals.get("uuid")
+                if uuid and self.uuids.get(uuid) is record:
+                    del self.uuids[uuid]
+            return record
+
+
+
+def gfsvalue(value):
+
+    if value and isinstance(value, dict) and "@value" in value:
+        return value["@value"]
+
+    elif type(value) in (tuple, list):
+        return value[0]
+
+    return value
+
+
+
+def gfsvals(record):
+
+    value = record.get("@value")
+    if not value or not isinstance(value, dict) or not "properties" in value:
+        return None
+
+    vals = {}
+    vals["id"] = gfsvalue( value.get("id") )
+    vals["label"] = gfsvalue( value.get("label") )
+    for key, val in (value.get("properties") or {}).items():
+        vals[key] = gfsvalue( val )
+
+    return vals
+
+
+
+def gfsfreeze(data, fields = None):
+
+    if isinstance(data, dict):
+        record = GFSAPIRecord(
+            (key, gfsfreeze(value)) for key, value in data.items()
+        )
+        record.vals = gfsvals(record)
+        record.fields = tuple(fields) if fields and record.vals else None
+        return record
+
+    elif isinstance(data, list):
+        return tuple(gfsfreeze(value, fields) for value in data)
+
+    return data
+
+
+
+def gfsthaw(data):
+
+    # Fresh list for list results, callers expect to own those
+    if isinstance(data, tuple):
+        return list(data)
+
+    return data
+
+
+
+__all__ = [
+    'GFSAPIRecord',
+    'GFSAPIIdentityMap',
+    'gfsfreeze',
+    'gfsthaw'
+]
+
+__default__ = 'GFSAPIRecord'
@@ -0,0 +1,213 @@
+# 
+# Copyright (c) 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import os
+import threading
+import sqlite3
+
+from time import time
+from time import monotonic
+
+import simplejson as json
+
+from gfs.common.log import GFSLogger
+
+
+
+class GFSCacheStore():
+
+    '''
+    On disk copy of the API cache, so that a remount starts warm.
+
+    Only decoded JSON responses are kept (vertex records, adjacency
+    listings and queries, which between them also hold every path
+    component name to vertex id mapping), together with their cache
+    tags. Rows are written in batches, every flush_interval seconds or
+    flush_entries rows, and are dropped by tag just like the in memory
+    entries. Times here are wall clock times, they have to survive a
+    restart.
+    '''
+
+    logger = GFSLogger.getLogger("GFSCacheStore")
+
+    def __init__(
+        self,
+
+        path,
+
+        flush_interval = 5,
+        flush_entries = 100,
+
+        **kwargs):
+
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_entries = flush_entries
+
+        directory = os.path.dirname(self.path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory, exist_ok = True)
+
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(
+            self.path,
+            check_same_thread = False,
+            isolation_level = None
+        )
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (" +
+            "  path TEXT NOT NULL, " +
+            "  oper TEXT NOT NULL, " +
+            "  stored REAL NOT NULL, " +
+            "  data TEXT, " +
+            "  PRIMARY KEY (path, oper)" +
+            ")"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS tags (" +
+            "  tag TEXT NOT NULL, " +
+            "  path TEXT NOT NULL, " +
+            "  oper TEXT NOT NULL" +
+            ")"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS tags_tag ON tags (tag)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS tags_path ON tags (path, oper)")
+
+        self.pending = {} # (path, oper) -> (stored, text, tags)
+        self.flushed = monotonic()
+
+    def load(self, max_age = None, max_entries = None):
+
+        '''
+        Yields (path, oper, text, tags) of the stored entries, oldest first,
+        skipping entries older than max_age seconds.
+        '''
+
+        query = "SELECT path, oper, data FROM entries"
+        args = []
+        if max_age:
+            query += " WHERE stored > ?"
+            args.append(time() - max_age)
+        query += " ORDER BY stored DESC"
+        if max_entries:
+            query += " LIMIT ?"
+            args.append(int(max_entries))
+
+        with self.lock:
+            rows = self.db.execute(query, args).fetchall()
+            tags = {}
+            for tag, path, oper in self.db.execute("SELECT tag, path, oper FROM tags"):
+                tags.setdefault((path, oper), set()).add(tag)
+
+        for path, oper, text in reversed(rows):
+            yield path, oper, text, tags.get((path, oper), set())
+
+    def put(self, path, oper, data, tags = None):
+
+        try:
+            text = json.dumps(data)
+        except Exception as e:
+            self.logger.debug(' GFSCacheStore: not storing %s: %s', path, str(e))
+            return
+
+        with self.lock:
+            self.pending[(path, oper)] = (time(), text, set(tags or []))
+
+        if len(self.pending) >= self.flush_entries or \
+            monotonic() - self.flushed > self.flush_interval:
+            self.flush()
+
+    def flush(self):
+
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+            self.flushed = monotonic()
+
+            if not pending:
+                return 0
+
+            try:
+                self.db.execute("BEGIN")
+                for (path, oper), (stored, text, tags) in pending.items():
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO entries (path, oper, stored, data) VALUES (?, ?, ?, ?)",
+                        (path, oper, stored, text)
+                    )
+                    self.db.execute(
+                        "DELETE FROM tags WHERE path = ? AND oper = ?",
+                        (path, oper)
+                    )
+                    self.db.executemany(
+                        "INSERT INTO tags (tag, path, oper) VALUES (?, ?, ?)",
+                        [(tag, path, oper) for tag in tags]
+                    )
+                self.db.execute("COMMIT")
+
+            except Exception as e:
+                self.db.execute("ROLLBACK")
+                raise e
+
+        self.logger.debug(' GFSCacheStore: flushed %d entries', len(pending))
+
+        return len(pending)
+
+    def remove(self, keys):
+
+        with self.lock:
+            self.db.execute("BEGIN")
+            for key in keys:
+                self.db.execute("DELETE FROM entries WHERE path = ? AND oper = ?", key)
+                self.db.execute("DELETE FROM tags WHERE path = ? AND oper = ?", key)
+            self.db.execute("COMMIT")
+
+    def invalidate(self, tag):
+
+        with self.lock:
+
+            for key in [key for key, item in self.pending.items() if tag in item[2]]:
+                del self.pending[key]
+
+            keys = self.db.execute(
+                "SELECT path, oper FROM tags WHERE tag = ?",
+                (tag, )
+            ).fetchall()
+            if keys:
+                self.remove(keys)
+
+        return len(keys)
+
+    def discard(self, path):
+
+        with self.lock:
+            for key in [key for key in self.pending if key[0] == path]:
+                del self.pending[key]
+            self.db.execute("DELETE FROM entries WHERE path = ?", (path, ))
+            self.db.execute("DELETE FROM tags WHERE path = ?", (path, ))
+
+    def clear(self):
+
+        with self.lock:
+            self.pending = {}
+            self.db.execute("DELETE FROM entries")
+            self.db.execute("DELETE FROM tags")
+
+    def close(self):
+
+        with self.lock:
+            try:
+                self.flush()
+            finally:
+                self.db.close()
+
+
+
+__all__ = [
+    'GFSCacheStore'
+]
+
+__default__ = 'GFSCacheStore'
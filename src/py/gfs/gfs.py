@@ -17,11 +17,13 @@ import stat
 import uuid
 import re
 import string
+import threading
 
 import contextlib
 
 # 
 from time import time
+from time import monotonic
 
 try:
     from StringIO import StringIO
@@ -56,11 +58,13 @@ class GremlinFS():
     logger = GFSLogger.getLogger("GremlinFS")
 
     __instance = None
+    __lock = threading.Lock()
 
     @classmethod
     def instance(clazz, instance = None):
         if instance:
-            GremlinFS.__instance = instance
+            with GremlinFS.__lock:
+                GremlinFS.__instance = instance
         return GremlinFS.__instance
 
     @classmethod
@@ -74,6 +78,15 @@ class GremlinFS():
 
 
         self._config = None
+        self._dentries = None
+        self._router = None
+        self._matches = None
+        self._sizes = None
+        self._inodes = None
+
+        self._root = None
+        self._rooted = 0
+        self._rootlock = threading.RLock()
 
     # def __init__(
     def configure(
@@ -97,17 +110,25 @@ class GremlinFS():
         self.gfs_username = gfs_username
         self.gfs_password = gfs_password
 
-        self.gfs_url = "http://" + self.gfs_host + ":" + self.gfs_port
+        # No sidecar with the in process backend
+        self.gfs_url = None
+        if self.gfs_host:
+            self.gfs_url = "http://" + self.gfs_host + ":" + str(self.gfs_port)
 
-        self.logger.debug(' GremlinFS gfs host: ' + self.gfs_host)
-        self.logger.debug(' GremlinFS gfs port: ' + self.gfs_port)
+        self.logger.debug(' GremlinFS gfs host: ' + str(self.gfs_host))
+        self.logger.debug(' GremlinFS gfs port: ' + str(self.gfs_port))
         # self.logger.debug(' GremlinFS gfs username: ' + self.gfs_username)
         # self.logger.debug(' GremlinFS gfs password: ' + self.gfs_password)
-        self.logger.debug(' GremlinFS gfs URL: ' + self.gfs_url)
+        self.logger.debug(' GremlinFS gfs URL: ' + str(self.gfs_url))
 
         # Cannot include at top
         from gfs.lib.util import GremlinFSUtils
         from gfs.lib.config import GremlinFSConfig
+        from gfs.lib.dentry import GremlinFSDentryCache
+        from gfs.lib.router import GremlinFSRouter
+        from gfs.lib.match import GremlinFSMatchCache
+        from gfs.lib.size import GremlinFSSizeCache
+        from gfs.lib.inode import GremlinFSInodes
 
         self._config = GremlinFSConfig(
 
@@ -118,18 +139,49 @@ class GremlinFS():
             gfs_username = gfs_username,
             gfs_password = gfs_password,
 
+            **kwargs
         )
 
-        # self._api = GFSAPI(
-        self._api = GFSCachingAPI(
-            gfs_host = gfs_host,
-            gfs_port = gfs_port,
-            gfs_username = gfs_username,
-            gfs_password = gfs_password,
+        self._api = self.backend(
+            self.config("api_backend")
         )
 
+        # Open the first keep-alive connection before the mount
+        # starts taking requests
+        if self.config("api_pool_warmup"):
+            self._api.warmup()
+
         self._utils = GremlinFSUtils()
 
+        self._dentries = GremlinFSDentryCache(
+            max_folders = self.config("dentry_folders"),
+            expire = self.config("dentry_expire")
+        )
+
+        self._router = GremlinFSRouter(
+            vertex_folder = self.config("vertex_folder", ".V"),
+            in_edge_folder = self.config("in_edge_folder", "EI"),
+            out_edge_folder = self.config("out_edge_folder", "EO")
+        )
+
+        self._matches = GremlinFSMatchCache(
+            max_entries = self.config("match_entries"),
+            expire = self.config("match_expire")
+        )
+
+        self._sizes = GremlinFSSizeCache(
+            max_entries = self.config("size_entries"),
+            expire = self.config("size_expire")
+        )
+
+        inode_table = self.config("inode_table")
+        if not inode_table and self.config("api_cache_dir"):
+            inode_table = os.path.join(self.config("api_cache_dir"), "inodes.db")
+
+        self._inodes = GremlinFSInodes(
+            path = inode_table
+        )
+
         # register
         self.register()
 
@@ -137,9 +189,116 @@ class GremlinFS():
 
     # 
 
+    def backend(self, name = None):
+
+        '''
+        The graph backend named by api_backend: the REST sidecar behind
+        the response cache, Gremlin Server, or the in process graph.
+        '''
+
+        if name == "memory":
+            # Cannot include at top
+            from gfs.api.client.memory import GFSMemoryAPI
+            return GFSMemoryAPI()
+
+        if name == "gremlin":
+            # Cannot include at top, needs gremlinpython
+            from gfs.api.client.gremlin import GFSGremlinAPI
+            return GFSGremlinAPI(
+                url = self.config("gremlin_url") or \
+                    "ws://" + str(self.gfs_host) + ":8182/gremlin",
+                traversal_source = self.config("gremlin_source"),
+                name_property = self.config("name_property")
+            )
+
+        return GFSCachingAPI(
+            gfs_host = self.gfs_host,
+            gfs_port = self.gfs_port,
+            gfs_username = self.gfs_username,
+            gfs_password = self.gfs_password,
+
+            pool_size = self.config("api_pool_size"),
+            pool_idle = self.config("api_pool_idle"),
+
+            offsets = self.config("api_offsets"),
+
+            cache_entries = self.config("api_cache_entries"),
+            cache_bytes = self.config("api_cache_bytes"),
+            cache_expire = self.config("api_cache_expire"),
+            cache_negative_expire = self.config("api_cache_negative_expire"),
+            cache_purge = self.config("api_cache_purge"),
+
+            cache_dir = self.config("api_cache_dir"),
+            cache_reload_expire = self.config("api_cache_reload_expire"),
+            cache_persist_expire = self.config("api_cache_persist_expire"),
+        )
+
     def api(self):
         return self._api
 
+    def dentries(self):
+        return self._dentries
+
+    def router(self):
+        return self._router
+
+    def matches(self):
+        return self._matches
+
+    def sizes(self):
+        return self._sizes
+
+    def inodes(self):
+        return self._inodes
+
+    def root(self):
+
+        '''
+        The fs_root vertex. Resolved once, then only checked by id every
+        root_revalidate seconds, and resolved from fs_root again if that
+        check fails.
+        '''
+
+        with self._rootlock:
+            fsroot = self.config("fs_root")
+            if not fsroot:
+                return None
+
+            now = monotonic()
+            if self._root and now - self._rooted < self.config("root_revalidate", 60):
+                return self._root
+
+            # Cannot include at top
+            from gfs.model.vertex import GFSVertex
+
+            root = None
+
+            if self._root:
+                try:
+                    root = GFSVertex.fromV(
+                        self.api().vertex(
+                            self._root.get("id")
+                        )
+                    )
+                except Exception as e:
+                    self.logger.warning(' GremlinFS: pinned root vertex is gone, resolving fs_root again: %s', str(e))
+                    root = None
+
+            if not root:
+                root = GFSVertex.load(
+                    fsroot
+                )
+
+            self._root = root
+            self._rooted = now
+
+            return self._root
+
+    def unpin(self):
+        with self._rootlock:
+            self._root = None
+            self._rooted = 0
+
     def query(self, query, node = None, default = None):
         return self.utils().query(query, node, default)
 
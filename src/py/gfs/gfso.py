@@ -17,6 +17,7 @@ import stat
 import uuid
 import re
 import string
+import threading
 
 import contextlib
 import addict
@@ -24,6 +25,7 @@ from addict import Dict
 
 # 
 from time import time
+from types import GeneratorType
 
 try:
     from StringIO import StringIO
@@ -38,6 +40,8 @@ from fuse import FuseOSError
 # 
 from gfs.common.log import GFSLogger
 
+from gfs.error.error import GFSNotExistsError
+
 from gfs.model.vertex import GFSVertex
 from gfs.model.edge import GFSEdge
 
@@ -45,9 +49,11 @@ from gfs.lib.path import GremlinFSPath
 from gfs.lib.util import GremlinFSUtils
 from gfs.lib.event import GremlinFSEvent
 from gfs.lib.config import GremlinFSConfig
+from gfs.lib.handle import GremlinFSHandles
 
 # from gfs.api.client.api import GFSAPI
 from gfs.api.client.api import GFSCachingAPI
+from gfs.api.client.cache import GFSCache
 
 
 
@@ -69,6 +75,8 @@ class GremlinFSOperations(Operations):
         **kwargs):
 
         self._gfs = None
+        self._handles = GremlinFSHandles()
+        self._workers = None
 
         # self._config = None
 
@@ -105,6 +113,12 @@ class GremlinFSOperations(Operations):
 
         self._gfs = gfs
 
+        # Ops running at once in multithreaded mode, the rest wait
+        if self.config("fuse_threads") and self.config("fuse_workers"):
+            self._workers = threading.BoundedSemaphore(
+                self.config("fuse_workers")
+            )
+
         # self._config = GremlinFSConfig(
 
         #     mount_point = mount_point,
@@ -142,11 +156,92 @@ class GremlinFSOperations(Operations):
         return self._gfs.utils().eval(command, node, _default_)
 
     def config(self, key=None, _default_=None):
-        return self._gfs.config().get(key, _default_)
+        return self._gfs.config(key, _default_)
 
     def utils(self):
         return GremlinFSUtils.utils()
 
+    def match(self, path):
+        matches = self._gfs.matches()
+        match = matches.lookup(path)
+        if match is None:
+            # Read before resolving, a mutation meanwhile bumps it
+            generation = matches.generation
+            match = matches.store(path, GremlinFSPath.match(path), generation)
+        return match
+
+    def mutated(self):
+        self._gfs.matches().bump()
+
+    def handles(self):
+        return self._handles
+
+    def handlematch(self, path, fh):
+        handle = self._handles.get(fh)
+        if not handle:
+            return self.match(path)
+        if not handle["match"]:
+            handle["match"] = self.match(path)
+        return handle["match"]
+
+    def handlebuffer(self, handle):
+        with handle["lock"]:
+            if handle["buffer"] is None:
+                if handle["data"] is not None and handle["match"] is None:
+                    # New file, nothing stored yet
+                    handle["buffer"] = bytearray(handle["data"])
+                else:
+                    match = self.handlematch(handle["path"], handle["fh"])
+                    handle["buffer"] = bytearray(match.readFileData() or b"")
+            return handle["buffer"]
+
+    def flushhandle(self, handle):
+
+        if not handle:
+            return False
+
+        with handle["lock"]:
+
+            if not handle["dirty"] or handle["buffer"] is None:
+                return False
+
+            match = self.handlematch(handle["path"], handle["fh"])
+            match.replaceFile(bytes(handle["buffer"]))
+
+            handle["dirty"] = 0
+            handle["data"] = None
+
+        # The handle's own buffer is what was just stored
+        self._handles.invalidate(handle["path"], handle)
+        self.mutated()
+
+        return True
+
+    def matchtimes(self, match, now):
+
+        '''
+        st_atime/st_mtime/st_ctime from the node's accessed, modified and
+        created properties, so that unchanged files look unchanged.
+        '''
+
+        def seconds(value, default):
+            if value is None or value == "":
+                return default
+            try:
+                return float(value)
+            except Exception as e:
+                return default
+
+        created = seconds(match.getProperty("created", None), now)
+        modified = seconds(match.getProperty("modified", None), created)
+        accessed = seconds(match.getProperty("accessed", None), modified)
+
+        return {
+            "st_atime": accessed,
+            "st_mtime": modified,
+            "st_ctime": created
+        }
+
     # 
 
     def enter(self, functioname, *args, **kwargs):
@@ -156,10 +251,40 @@ class GremlinFSOperations(Operations):
 
     # 
 
+    # Ops that change what a path resolves to, or the node it resolves to
+    # Content writes through a handle are buffered, the upload on
+    # flush/release invalidates matches itself.
+    mutating = set([
+        "chmod", "chown", "create", "link", "mkdir", "mknod", "rename",
+        "rmdir", "symlink", "unlink", "utimens"
+    ])
+
     def __call__(self, op, *args):
         if not hasattr(self, op):
             raise FuseOSError(errno.EFAULT)
-        return getattr(self, op)(*args)
+        workers = self._workers
+        if workers:
+            workers.acquire()
+        streamed = False
+        try:
+            ret = getattr(self, op)(*args)
+            if workers and isinstance(ret, GeneratorType):
+                # Listings run as fuse reads them, keep the worker until
+                # they are done
+                streamed = True
+                return self.streamed(ret, workers)
+            return ret
+        finally:
+            if op in self.mutating:
+                self.mutated()
+            if workers and not streamed:
+                workers.release()
+
+    def streamed(self, entries, workers):
+        try:
+            yield from entries
+        finally:
+            workers.release()
 
     def access(self, path, amode):
         return 0
@@ -170,7 +295,7 @@ class GremlinFSOperations(Operations):
         self.notReadOnly()
         try:
 
-            match = GremlinFSPath.match(path)
+            match = self.match(path)
             match.enter("chmod", path, mode)
             if match:
                 if match.isFound():
@@ -182,13 +307,14 @@ class GremlinFSOperations(Operations):
                 else:
                     raise FuseOSError(errno.ENOENT)
 
-        except FuseOSError:
+        except ( FuseOSError, GFSNotExistsError ):
             # Don't log here
             raise FuseOSError(errno.ENOENT)
 
         except Exception as e:
+            # Found but could not be written
             self.logger.exception(' GremlinFS: chmod exception ', e)
-            raise FuseOSError(errno.ENOENT)
+            raise FuseOSError(errno.EIO)
 
         return 0
 
@@ -197,29 +323,26 @@ class GremlinFSOperations(Operations):
 
         try:
 
-            match = GremlinFSPath.match(path)
+            match = self.match(path)
             match.enter("chown", path, uid, gid)
             if match:
                 if match.isFound():
-                    match.setProperty(
-                        "owner", 
-                        uid
-                    )
-                    match.setProperty(
-                        "group", 
-                        gid
-                    )
+                    match.setProperties({
+                        "owner": uid,
+                        "group": gid
+                    })
 
                 else:
                     raise FuseOSError(errno.ENOENT)
 
-        except FuseOSError:
+        except ( FuseOSError, GFSNotExistsError ):
             # Don't log here
             raise FuseOSError(errno.ENOENT)
 
         except Exception as e:
+            # Found but could not be written
             self.logger.exception(' GremlinFS: chown exception ', e)
-            raise FuseOSError(errno.ENOENT)
+            raise FuseOSError(errno.EIO)
 
         return 0
 
@@ -230,7 +353,7 @@ class GremlinFSOperations(Operations):
 
         try:
 
-            match = GremlinFSPath.match(path)
+            match = self.match(path)
             match.enter("create", path, mode)
             if match:
                 if not match.isFound():
@@ -249,17 +372,34 @@ class GremlinFSOperations(Operations):
             raise FuseOSError(errno.ENOENT)
 
         if created:
-            return 0
+            # The match above is from before the file existed, the
+            # handle resolves the path again on first use
+            self.mutated()
+            return self._handles.allocate(path, None, b"")
 
         return 0
 
-    # def destroy(self, path):
-    #     pass
+    def destroy(self, path):
+        # Unmount, write out the on disk cache
+        api = self.api()
+        if hasattr(api, "close"):
+            api.close()
+        self._gfs.inodes().close()
 
     def flush(self, path, fh):
+        try:
+            self.flushhandle(self._handles.get(fh))
+        except Exception as e:
+            self.logger.exception(' GremlinFS: flush exception ', e)
+            raise FuseOSError(errno.EIO)
         return 0
 
     def fsync(self, path, datasync, fh):
+        try:
+            self.flushhandle(self._handles.get(fh))
+        except Exception as e:
+            self.logger.exception(' GremlinFS: fsync exception ', e)
+            raise FuseOSError(errno.EIO)
         return 0
 
     # def fsyncdir(self, path, datasync, fh):
@@ -287,7 +427,7 @@ class GremlinFSOperations(Operations):
 
         try:
 
-            match = GremlinFSPath.match(path)
+            match = self.match(path)
             match.enter("getattr", path)
             if match:
                 if match.isFolder() and match.isFound():
@@ -296,31 +436,29 @@ class GremlinFSOperations(Operations):
                         "st_nlink": int( match.getProperty("links", 1) ),
                         "st_uid": int( match.getProperty("owner", owner) ),
                         "st_gid": int( match.getProperty("group", group) ),
-                        "st_size": 1024,
-                        # "st_atime": match.getProperty("", now),
-                        # "st_mtime": match.getProperty("modified", now),
-                        # "st_ctime": match.getProperty("created", now)
+                        "st_size": 1024
                     })
 
                 elif match.isFile() and match.isFound():
                     match_file_length = 0
                     try:
-                        # This one can throw errors via API as render returns 
-                        # 404 for empty file
-                        match_file_length = match.readFileLength()
+                        # Stored size, computed files are rendered once 
+                        # and their size cached
+                        match_file_length = match.readFileSize()
                     except Exception as e:
                         # Don't log here and don't throw exception, just set 
                         # file length to 0
                         pass
+                    buffered = self._handles.buffered(path)
+                    if buffered is not None:
+                        # Not uploaded yet
+                        match_file_length = len(buffered)
                     attrs.update({
                         "st_mode": (stat.S_IFREG | int( match.getProperty("mode", 0o777) ) ),
                         "st_nlink": int( match.getProperty("links", 1) ),
                         "st_uid": int( match.getProperty("owner", owner) ),
                         "st_gid": int( match.getProperty("group", group) ),
-                        "st_size": match_file_length, # match.readFileLength(),
-                        # "st_atime": match.getProperty("", now),
-                        # "st_mtime": match.getProperty("modified", now),
-                        # "st_ctime": match.getProperty("created", now)
+                        "st_size": match_file_length
                     })
 
                 elif match.isLink() and match.isFound():
@@ -329,10 +467,7 @@ class GremlinFSOperations(Operations):
                         "st_nlink": int( match.getProperty("links", 1) ),
                         "st_uid": int( match.getProperty("owner", owner) ),
                         "st_gid": int( match.getProperty("group", group) ),
-                        "st_size": 0,
-                        # "st_atime": match.getProperty("", now),
-                        # "st_mtime": match.getProperty("modified", now),
-                        # "st_ctime": match.getProperty("created", now)
+                        "st_size": 0
                     })
 
                 else:
@@ -342,6 +477,9 @@ class GremlinFSOperations(Operations):
                     # unless file/node is actually found
                     raise FuseOSError(errno.ENOENT)
 
+                attrs.update(self.matchtimes(match, now))
+                attrs["st_ino"] = match.inode()
+
         except FuseOSError:
             # Don't log here
             raise FuseOSError(errno.ENOENT)
@@ -368,8 +506,8 @@ class GremlinFSOperations(Operations):
 
         try:
 
-            targetmatch = GremlinFSPath.match(target)
-            sourcematch = GremlinFSPath.match(source)
+            targetmatch = self.match(target)
+            sourcematch = self.match(source)
 
             targetmatch.enter("link", target, source)
             if targetmatch and sourcematch:
@@ -403,7 +541,7 @@ class GremlinFSOperations(Operations):
 
         try:
 
-            match = GremlinFSPath.match(path)
+            match = self.match(path)
             match.enter("mkdir", path, mode)
 
             if match:
@@ -436,7 +574,7 @@ class GremlinFSOperations(Operations):
 
         try:
 
-            match = GremlinFSPath.match(path)
+            match = self.match(path)
             match.enter("open", path, flags)
             if match:
                 if match.isFile() and match.isFound():
@@ -453,7 +591,7 @@ class GremlinFSOperations(Operations):
             raise FuseOSError(errno.ENOENT)
 
         if found:
-            return 0
+            return self._handles.allocate(path, match)
 
         return 0
 
@@ -466,10 +604,19 @@ class GremlinFSOperations(Operations):
 
         try:
 
-            match = GremlinFSPath.match(path)
+            handle = self._handles.get(fh)
+            match = self.handlematch(path, fh)
             match.enter("read", path, size, offset)
             if match:
-                if match.isFile() and match.isFound():
+                if match.isFile() and match.isFound() and handle:
+                    with handle["lock"]:
+                        if handle["buffer"] is not None:
+                            data = bytes(handle["buffer"][offset:offset + size])
+                        else:
+                            if handle["data"] is None:
+                                handle["data"] = match.readFile() or b""
+                            data = handle["data"][offset:offset + size]
+                elif match.isFile() and match.isFound():
                     data = match.readFile(size, offset)
                 else:
                     raise FuseOSError(errno.ENOENT)
@@ -489,20 +636,21 @@ class GremlinFSOperations(Operations):
 
     def readdir(self, path, fh):
 
-        entries = [
-            '.',
-            '..'
-        ]
+        # Entries are produced as the folder is listed, a page of
+        # vertices at a time, which bounds what is held here. fusepy
+        # 3.0.1 fills them in with offset 0 and does not pass readdir an
+        # offset to resume from, so libfuse still gathers the whole
+        # listing before it replies to the kernel.
 
         try:
 
-            match = GremlinFSPath.match(path)
+            match = self.match(path)
             match.enter("readdir", path)
             if match:
                 if match.isFolder() and match.isFound():
-                    entries.extend(
-                        match.readFolder()
-                    )
+                    yield '.'
+                    yield '..'
+                    yield from match.readFolder()
                 else:
                     raise FuseOSError(errno.ENOENT)
 
@@ -514,15 +662,13 @@ class GremlinFSOperations(Operations):
             self.logger.exception(' GremlinFS: readdir exception ', e)
             raise FuseOSError(errno.ENOENT)
 
-        return entries
-
     def readlink(self, path):
 
         newpath = None
 
         try:
 
-            match = GremlinFSPath.match(path)
+            match = self.match(path)
             match.enter("readlink", path)
             if match:
                 if match.isLink() and match.isFound():
@@ -544,6 +690,14 @@ class GremlinFSOperations(Operations):
         return None
 
     def release(self, path, fh):
+        handle = self._handles.get(fh)
+        try:
+            self.flushhandle(handle)
+        except Exception as e:
+            self.logger.exception(' GremlinFS: release exception ', e)
+            raise FuseOSError(errno.EIO)
+        finally:
+            self._handles.release(fh)
         return 0
 
     # def releasedir(self, path, fh):
@@ -559,8 +713,8 @@ class GremlinFSOperations(Operations):
 
         try:
 
-            oldmatch = GremlinFSPath.match(old)
-            newmatch = GremlinFSPath.match(new)
+            oldmatch = self.match(old)
+            newmatch = self.match(new)
             oldmatch.enter("rename", old, new)
             if oldmatch and newmatch:
 
@@ -596,6 +750,7 @@ class GremlinFSOperations(Operations):
             raise FuseOSError(errno.ENOENT)
 
         if renamed:
+            self._handles.rename(old, new)
             return 0
 
         return 0
@@ -605,7 +760,7 @@ class GremlinFSOperations(Operations):
 
         try:
 
-            match = GremlinFSPath.match(path)
+            match = self.match(path)
             match.enter("rmdir", path)
             if match:
                 if match.isFolder() and match.isFound():
@@ -636,8 +791,8 @@ class GremlinFSOperations(Operations):
 
         try:
 
-            targetmatch = GremlinFSPath.match(target)
-            sourcematch = GremlinFSPath.match(source)
+            targetmatch = self.match(target)
+            sourcematch = self.match(source)
 
             targetmatch.enter("symlink", target, source)
             if targetmatch and sourcematch:
@@ -664,11 +819,27 @@ class GremlinFSOperations(Operations):
 
         try:
 
-            match = GremlinFSPath.match(path)
+            match = self.handlematch(path, fh)
             match.enter("truncate", path)
             if match:
                 if match.isFile() and match.isFound():
-                    match.clearFile()
+                    handle = self._handles.get(fh)
+                    if handle:
+                        # ftruncate, a write on the handle, uploaded with
+                        # the rest of its writes
+                        with handle["lock"]:
+                            self._handles.resize(self.handlebuffer(handle), length)
+                            handle["dirty"] += 1
+                            handle["data"] = None
+                    else:
+                        if length:
+                            match.replaceFile(
+                                ( match.readFileData() + b"\0" * length )[0:length]
+                            )
+                        else:
+                            match.clearFile()
+                        self._handles.truncate(path, length)
+                        self.mutated()
                 else:
                     raise FuseOSError(errno.ENOENT)
 
@@ -688,7 +859,7 @@ class GremlinFSOperations(Operations):
 
         try:
 
-            match = GremlinFSPath.match(path)
+            match = self.match(path)
             match.enter("unlink", path)
             if match:
                 if match.isFile() and match.isFound():
@@ -709,7 +880,35 @@ class GremlinFSOperations(Operations):
         return 0
 
     def utimens(self, path, times=None):
-        self.enter("utimens", path)
+        self.notReadOnly()
+
+        try:
+
+            match = self.match(path)
+            match.enter("utimens", path, times)
+            if match:
+                if match.isFound():
+                    if times:
+                        atime, mtime = times
+                    else:
+                        atime = mtime = time()
+                    match.setProperties({
+                        "accessed": atime,
+                        "modified": mtime
+                    })
+
+                else:
+                    raise FuseOSError(errno.ENOENT)
+
+        except ( FuseOSError, GFSNotExistsError ):
+            # Don't log here
+            raise FuseOSError(errno.ENOENT)
+
+        except Exception as e:
+            # Found but could not be written
+            self.logger.exception(' GremlinFS: utimens exception ', e)
+            raise FuseOSError(errno.EIO)
+
         return 0
 
     def write(self, path, data, offset, fh):
@@ -720,11 +919,28 @@ class GremlinFSOperations(Operations):
 
         try:
 
-            match = GremlinFSPath.match(path)
+            handle = self._handles.get(fh)
+            match = self.handlematch(path, fh)
             match.enter("write", path, data, offset)
             if match:
-                if match.isFile() and match.isFound():
+                if match.isFile() and match.isFound() and handle:
+                    with handle["lock"]:
+                        buffer = self.handlebuffer(handle)
+                        if offset > len(buffer):
+                            buffer.extend(b"\0" * (offset - len(buffer)))
+                        buffer[offset:offset + len(data)] = self.utils().tobytes(data) if isinstance(data, str) else data
+                        handle["dirty"] += len(data)
+                        handle["data"] = None
+                        full = self.config("write_dirty_limit") and \
+                            handle["dirty"] >= self.config("write_dirty_limit")
+                    if full:
+                        # Not under the handle lock, the upload takes the
+                        # locks of the other handles on the path
+                        self.flushhandle(handle)
+                elif match.isFile() and match.isFound():
                     data = match.writeFile(data, offset)
+                    self._handles.invalidate(path)
+                    self.mutated()
                 else:
                     raise FuseOSError(errno.ENOENT)
 
@@ -764,65 +980,39 @@ class GremlinFSCachingOperations(GremlinFSOperations):
         super().__init__(**kwargs)
 
         self.caching = True # False
-        self.cache = Dict() # {}
+        self.cache = GFSCache(
+            max_entries = 10000,
+            max_bytes = None
+        )
+        self.cache_listing = 10000
 
     # 
 
     def lookupCache(self, path, oper):
 
-        from datetime import datetime
         self.logger.debug("CACHE: lookup: path: %s, oper: %s", path, oper)
 
-        pick = False
-        cachehit = self.cache[path][oper]
-        if cachehit:
-            if cachehit['expire']:
-                if cachehit['expire'] > datetime.now():
-                    self.logger.debug("CACHE: lookup: cachehit: found entry with expire, not expired")
-                    pick = cachehit
-                else:
-                    self.logger.debug("CACHE: lookup: cachehit: found entry with expire, is expired")
-            else:
-                pick = cachehit
-
-        if pick:
-            cachehit = pick
-            exp = ""
-            if cachehit['expire']:
-                exp = str(cachehit['expire'])
+        cachehit = self.cache.lookup(path, oper)
+        if cachehit and not cachehit["flags"]:
             self.logger.debug("CACHE: lookup: cachehit: PATH: %s, OPER: %s, CREATED: %s, EXPIRE: %s", 
-                cachehit.path, cachehit.oper, str(cachehit.created), exp
+                cachehit["path"], cachehit["oper"], str(cachehit["created"]), str(cachehit["expire"] or "")
             )
-            return cachehit.data
+            return cachehit["data"]
 
         else:
             return False
 
     def prepareCache(self, path, oper, expire_seconds = None):
 
-        from datetime import datetime, timedelta
         self.logger.debug("CACHE: prepare: path: %s, oper: %s", path, oper)
 
-        expire = None
-        if expire_seconds:
-            time = datetime.now()
-            expire = time + timedelta(0, expire_seconds) # days, seconds, then other fields.
-
-        self.cache[path][oper]['path'] = path
-        self.cache[path][oper]['oper'] = oper
-        self.cache[path][oper]['flags'] = 1 # Indicate not yet active cache entry
-        if expire:
-            self.cache[path][oper]['expire'] = expire
-
-        return self.cache[path][oper]
+        return self.cache.prepare(path, oper, expire_seconds)
 
     def finalizeCache(self, path, oper, data):
 
         self.logger.debug("CACHE: finalize: path: %s, oper: %s", path, oper)
-        self.cache[path][oper]['data'] = data
-        self.cache[path][oper]['flags'] = 0 # Indicate active cache entry
 
-        return self.cache[path][oper]
+        return self.cache.finalize(path, oper, data, size = 0)
 
     def readCache(self, path, oper):
 
@@ -867,7 +1057,11 @@ class GremlinFSCachingOperations(GremlinFSOperations):
         cachepath = path
 
         self.logger.debug("CACHE: clear: path: %s", path)
-        del self.cache[path]
+        self.cache.discard(path)
+
+        # And the listing of the folder it is in
+        if path and path != "/":
+            self.cache.discard(os.path.dirname(path.rstrip("/")) or "/")
 
     # 
 
@@ -964,12 +1158,20 @@ class GremlinFSCachingOperations(GremlinFSOperations):
 
         cachedata = self.readCache(cachepath, cacheoper)
         if cachedata:
-            return cachedata
+            yield from cachedata
+            return
 
-        ret = super().readdir(path, fh)
-        self.updateCache(cachepath, cacheoper, ret)
+        # Kept once listed to the end, unless too long to keep
+        entries = []
+        for entry in super().readdir(path, fh):
+            if entries is not None:
+                entries.append(entry)
+                if len(entries) > self.cache_listing:
+                    entries = None
+            yield entry
 
-        return ret
+        if entries is not None:
+            self.updateCache(cachepath, cacheoper, entries)
 
     def readlink(self, path):
         ret = super().readlink(path)
@@ -1021,6 +1223,7 @@ class GremlinFSCachingOperations(GremlinFSOperations):
 
     def utimens(self, path, times=None):
         ret = super().utimens(path, times)
+        self.clearCache(path)
         return ret
 
     def write(self, path, data, offset, fh):
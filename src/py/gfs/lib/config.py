@@ -57,6 +57,81 @@ class GremlinFSConfig(GFSBase):
             "default_gid": 1001,
             "default_mode": 0o777,
 
+            # Graph backend, "rest" for the sidecar, "gremlin" for
+            # Gremlin Server itself, "memory" for a graph kept in process
+            "api_backend": "rest",
+
+            # Gremlin Server for the gremlin backend, none for
+            # ws://<gfs_host>:8182/gremlin
+            "gremlin_url": None,
+            "gremlin_source": "g",
+
+            "api_pool_size": 10,
+            "api_pool_idle": 300,
+            "api_pool_warmup": True,
+
+            # Vertices per request when listing a folder
+            "api_page_size": 1000,
+
+            # The sidecar pages listings with limit and offset, off
+            # to fetch them whole
+            "api_offsets": True,
+
+            # Properties listings and path lookups fetch besides name,
+            # uuid and template, none for whole vertices
+            "api_listing_fields": [
+                "size", "mode", "links", "owner", "group",
+                "created", "modified", "accessed"
+            ],
+
+            "api_cache_entries": 10000,
+            "api_cache_bytes": 64 * 1024 * 1024,
+            "api_cache_expire": 60,
+            "api_cache_negative_expire": 5,
+            "api_cache_purge": 30,
+
+            # Directory for the on disk cache, none to not keep one
+            "api_cache_dir": None,
+            "api_cache_reload_expire": 30,
+            "api_cache_persist_expire": 24 * 60 * 60,
+
+            # Seconds between checks that the pinned fs_root vertex
+            # is still there
+            "root_revalidate": 60,
+
+            # Matches are shared between ops on the same path for
+            # this many seconds, 0 to not share them
+            "match_entries": 256,
+            "match_expire": 1,
+
+            # Written bytes held per open file before they are
+            # uploaded ahead of flush/release
+            "write_dirty_limit": 8 * 1024 * 1024,
+
+            # Seconds rendered sizes of computed files are kept
+            "size_entries": 4096,
+            "size_expire": 30,
+
+            "dentry_folders": 1024,
+            "dentry_expire": 60,
+
+            # Serve FUSE requests from several threads, at most
+            # fuse_workers at once
+            "fuse_threads": False,
+            "fuse_workers": 16,
+
+            # Kernel side caching, timeouts in seconds
+            "fuse_attr_timeout": 1.0,
+            "fuse_entry_timeout": 1.0,
+            "fuse_negative_timeout": 0,
+            "fuse_use_ino": True,
+            "fuse_kernel_cache": False,
+            "fuse_auto_cache": True,
+
+            # File for the inode table, defaults to one in api_cache_dir,
+            # kept in memory only if neither is set
+            "inode_table": None,
+
             "labels": []
         }
 
@@ -0,0 +1,180 @@
+# 
+# Copyright (c) 2019, 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import itertools
+import threading
+
+from collections import OrderedDict
+from time import monotonic
+
+from gfs.common.log import GFSLogger
+
+
+
+class GremlinFSDentryCache():
+
+    '''
+    Per folder index of child short names (toid(True)) to vertex ids.
+
+    A folder is keyed by its vertex id, None for the top level. Folders
+    filled from a full listing are complete: a name missing from a
+    complete folder does not exist. Folders are kept in LRU order, at most
+    max_folders of them, and are dropped expire seconds after they were
+    last filled.
+
+    Every change to a folder (add, remove, forget) moves its version on.
+    A listing takes the version before it starts and only completes the
+    folder if it has not moved since, so a listing that raced a create
+    does not put back a name set without the new name.
+    '''
+
+    logger = GFSLogger.getLogger("GremlinFSDentryCache")
+
+    def __init__(
+        self,
+
+        max_folders = 1024,
+        expire = 60,
+
+        **kwargs):
+
+        self.max_folders = max_folders
+        self.expire = expire
+
+        self.lock = threading.RLock()
+        self.folders = OrderedDict() # folder id -> folder
+
+        self.counter = itertools.count(1)
+        self.versions = {} # folder id -> version
+        self.floor = 0 # version of folders no longer in versions
+
+    def key(self, folderid):
+        if folderid is None:
+            return None
+        return str(folderid).replace("#", "")
+
+    def version(self, folderid):
+        with self.lock:
+            return self.versions.get(self.key(folderid), self.floor)
+
+    def bump(self, folderid):
+        with self.lock:
+            self.versions[self.key(folderid)] = next(self.counter)
+            if self.max_folders and len(self.versions) > 4 * self.max_folders:
+                # Forgotten folders all move on to a newer version than
+                # any they had
+                self.versions = {}
+                self.floor = next(self.counter)
+
+    def folder(self, folderid, create = False):
+
+        with self.lock:
+            key = self.key(folderid)
+
+            folder = self.folders.get(key)
+            if folder and self.expire and folder["created"] + self.expire <= monotonic():
+                del self.folders[key]
+                folder = None
+
+            if folder:
+                self.folders.move_to_end(key)
+
+            elif create:
+                folder = {
+                    "names": {},
+                    "complete": False,
+                    "created": monotonic()
+                }
+                self.folders[key] = folder
+                while self.max_folders and len(self.folders) > self.max_folders:
+                    self.folders.popitem(last = False)
+
+            return folder
+
+    def lookup(self, folderid, name):
+
+        '''
+        Returns (True, vertex id) if name is known in the folder, (True, None)
+        if the folder is complete and name is not in it, (False, None) if
+        the folder has to be listed to tell.
+        '''
+
+        with self.lock:
+            folder = self.folder(folderid)
+            if not folder:
+                return False, None
+
+            if name in folder["names"]:
+                return True, folder["names"][name]
+
+            if folder["complete"]:
+                return True, None
+
+            return False, None
+
+    def fill(self, folderid, nodes = [], version = None):
+
+        names = {}
+        for node in nodes or []:
+            name = node.toid(True)
+            if name:
+                names[name] = node.get("id")
+
+        return self.complete(folderid, names, version)
+
+    def complete(self, folderid, names = {}, version = None):
+
+        with self.lock:
+            if version is not None and version != self.version(folderid):
+                # Changed while it was being listed
+                return None
+
+            folder = self.folder(folderid, True)
+
+            folder["names"] = dict(names)
+            folder["complete"] = True
+            folder["created"] = monotonic()
+
+            return folder
+
+    def add(self, folderid, name, nodeid):
+        with self.lock:
+            self.bump(folderid)
+            # Only extend folders already known, a partial folder would
+            # not answer negative lookups anyway
+            folder = self.folder(folderid)
+            if folder and name:
+                folder["names"][name] = nodeid
+
+    def remove(self, folderid, name):
+        with self.lock:
+            self.bump(folderid)
+            folder = self.folder(folderid)
+            if folder:
+                folder["names"].pop(name, None)
+
+    def move(self, oldfolderid, oldname, newfolderid, newname, nodeid):
+        with self.lock:
+            self.remove(oldfolderid, oldname)
+            self.add(newfolderid, newname, nodeid)
+
+    def forget(self, folderid):
+        with self.lock:
+            self.bump(folderid)
+            self.folders.pop(self.key(folderid), None)
+
+    def clear(self):
+        with self.lock:
+            self.folders = OrderedDict()
+            self.versions = {}
+            self.floor = next(self.counter)
+
+
+
+__all__ = [
+    'GremlinFSDentryCache'
+]
+
+__default__ = 'GremlinFSDentryCache'
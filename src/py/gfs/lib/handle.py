@@ -0,0 +1,116 @@
+# 
+# Copyright (c) 2019, 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import threading
+
+from gfs.common.log import GFSLogger
+
+
+
+class GremlinFSHandles():
+
+    '''
+    Open file handles. A handle keeps what open() resolved, the path
+    match and with it the node, and the file content once it was read,
+    so that reads on the handle are sliced from memory instead of
+    rendering the file again for every chunk.
+
+    Writes go to the handle's buffer, the whole stored content of the
+    file, and are uploaded in one go when the handle is flushed. dirty
+    counts the bytes written since the last upload. When the stored
+    content changes otherwise, handles without unflushed writes drop
+    their copy and read it again.
+    '''
+
+    logger = GFSLogger.getLogger("GremlinFSHandles")
+
+    def __init__(self, **kwargs):
+        self.lock = threading.RLock()
+        self.handles = {} # fh -> handle
+        self.last = 0
+
+    def allocate(self, path, match = None, data = None):
+
+        with self.lock:
+            self.last += 1
+            fh = self.last
+
+            self.handles[fh] = {
+                "fh": fh,
+                "path": path,
+                "match": match,
+                "data": data, # None until read
+                "buffer": None, # None until written
+                "dirty": 0,
+                # Held while the buffer is read, written or uploaded
+                "lock": threading.RLock()
+            }
+
+            return fh
+
+    def get(self, fh):
+        with self.lock:
+            if not fh:
+                return None
+            return self.handles.get(fh)
+
+    def release(self, fh):
+        with self.lock:
+            return self.handles.pop(fh, None)
+
+    def paths(self, path):
+        with self.lock:
+            return [handle for handle in self.handles.values() if handle["path"] == path]
+
+    def invalidate(self, path, keep = None):
+        # Content changed under the handles open on path, those without
+        # writes of their own read it again. Each handle is locked on its
+        # own, callers hold no handle lock.
+        for handle in self.paths(path):
+            if handle is not keep:
+                with handle["lock"]:
+                    handle["data"] = None
+                    if not handle["dirty"]:
+                        handle["buffer"] = None
+
+    def truncate(self, path, length, keep = None):
+        # Stored content was truncated under the handles open on path,
+        # unflushed writes are cut to length as well
+        for handle in self.paths(path):
+            if handle is not keep:
+                with handle["lock"]:
+                    handle["data"] = None
+                    if not handle["dirty"]:
+                        handle["buffer"] = None
+                    elif handle["buffer"] is not None:
+                        self.resize(handle["buffer"], length)
+
+    def resize(self, buffer, length):
+        if length < len(buffer):
+            del buffer[length:]
+        else:
+            buffer.extend(b"\0" * (length - len(buffer)))
+        return buffer
+
+    def buffered(self, path):
+        with self.lock:
+            # Newest unflushed content of path, if any handle has one
+            for handle in self.paths(path):
+                if handle["dirty"] and handle["buffer"] is not None:
+                    return handle["buffer"]
+            return None
+
+    def rename(self, old, new):
+        with self.lock:
+            for handle in self.paths(old):
+                handle["path"] = new
+
+
+
+__all__ = [
+    'GremlinFSHandles'
+]
+
+__default__ = 'GremlinFSHandles'
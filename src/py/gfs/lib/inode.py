@@ -0,0 +1,121 @@
+# 
+# Copyright (c) 2019, 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import os
+import threading
+import sqlite3
+
+from gfs.common.log import GFSLogger
+
+
+
+class GremlinFSInodes():
+
+    '''
+    Stable inode numbers, so that the kernel (use_ino) and tools that key
+    on st_ino see the same file across lookups and remounts.
+
+    The root is inode 1. Vertices with numeric ids get an even inode
+    derived from the id. Anything else, vertices with non numeric ids and
+    paths that are not a vertex, gets an odd inode from a table, kept on
+    disk when path is given.
+    '''
+
+    logger = GFSLogger.getLogger("GremlinFSInodes")
+
+    ROOT = 1
+
+    def __init__(
+        self,
+
+        path = None,
+
+        **kwargs):
+
+        self.path = path
+
+        self.lock = threading.RLock()
+        self.inodes = {} # key -> ino
+        self.seq = 0
+        self.db = None
+
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory, exist_ok = True)
+
+            self.db = sqlite3.connect(
+                self.path,
+                check_same_thread = False,
+                isolation_level = None
+            )
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS inodes (" +
+                "  key TEXT PRIMARY KEY, " +
+                "  seq INTEGER NOT NULL" +
+                ")"
+            )
+            row = self.db.execute("SELECT MAX(seq) FROM inodes").fetchone()
+            self.seq = row[0] or 0
+
+    def vertex(self, nodeid):
+
+        if nodeid is None:
+            return None
+
+        if isinstance(nodeid, int) and nodeid >= 0:
+            return 2 * nodeid + 2
+
+        if isinstance(nodeid, str) and nodeid.isdigit():
+            return 2 * int(nodeid) + 2
+
+        return self.key("v:" + str(nodeid))
+
+    def key(self, key):
+
+        with self.lock:
+
+            ino = self.inodes.get(key)
+            if ino:
+                return ino
+
+            seq = None
+            if self.db:
+                row = self.db.execute(
+                    "SELECT seq FROM inodes WHERE key = ?",
+                    (key, )
+                ).fetchone()
+                if row:
+                    seq = row[0]
+
+            if seq is None:
+                self.seq += 1
+                seq = self.seq
+                if self.db:
+                    self.db.execute(
+                        "INSERT INTO inodes (key, seq) VALUES (?, ?)",
+                        (key, seq)
+                    )
+
+            ino = 2 * seq + 1
+            self.inodes[key] = ino
+
+            return ino
+
+    def close(self):
+
+        with self.lock:
+            if self.db:
+                self.db.close()
+                self.db = None
+
+
+
+__all__ = [
+    'GremlinFSInodes'
+]
+
+__default__ = 'GremlinFSInodes'
@@ -0,0 +1,96 @@
+# 
+# Copyright (c) 2019, 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import threading
+
+from collections import OrderedDict
+from time import monotonic
+
+from gfs.common.log import GFSLogger
+
+
+
+class GremlinFSMatchCache():
+
+    '''
+    Short lived cache of GremlinFSPath matches by path, so that the
+    getattr, open, read, ..., release calls for one file share the
+    resolved path and its vertex.
+
+    Any mutation bumps the generation, which drops every match: a write
+    anywhere may change what any path resolves to. Matches are otherwise
+    dropped expire seconds after they were made, which bounds how long
+    changes made by other clients go unnoticed.
+
+    A match is stored against the generation read before it was resolved,
+    and dropped if a mutation bumped it in between, so a resolve that
+    raced a write does not outlive it.
+    '''
+
+    logger = GFSLogger.getLogger("GremlinFSMatchCache")
+
+    def __init__(
+        self,
+
+        max_entries = 256,
+        expire = 1,
+
+        **kwargs):
+
+        self.max_entries = max_entries
+        self.expire = expire
+
+        self.lock = threading.RLock()
+        self.generation = 0
+        self.entries = OrderedDict() # path -> (generation, created, match)
+
+    def lookup(self, path):
+
+        with self.lock:
+            entry = self.entries.get(path)
+            if not entry:
+                return None
+
+            generation, created, match = entry
+            if generation != self.generation or \
+                ( self.expire and created + self.expire <= monotonic() ):
+                self.entries.pop(path, None)
+                return None
+
+            self.entries.move_to_end(path)
+            return match
+
+    def store(self, path, match, generation = None):
+
+        with self.lock:
+            if not self.expire:
+                return match
+
+            if generation is None:
+                generation = self.generation
+            elif generation != self.generation:
+                # Resolved before a mutation, may be stale already
+                return match
+
+            self.entries[path] = (generation, monotonic(), match)
+            self.entries.move_to_end(path)
+            while self.max_entries and len(self.entries) > self.max_entries:
+                self.entries.popitem(last = False)
+
+            return match
+
+    def bump(self):
+        with self.lock:
+            self.generation += 1
+            self.entries = OrderedDict()
+            return self.generation
+
+
+
+__all__ = [
+    'GremlinFSMatchCache'
+]
+
+__default__ = 'GremlinFSMatchCache'
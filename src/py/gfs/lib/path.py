@@ -4,6 +4,8 @@
 # All rights reserved.
 # 
 
+from time import time
+
 from gfs.common.log import GFSLogger
 from gfs.common.base import GFSBase
 
@@ -109,12 +111,7 @@ class GremlinFSPath(GFSBase):
     def atpath(clazz, path, node = None):
 
         if not node:
-            root = None
-            if GremlinFS.operations().config("fs_root", None):
-                root = GFSVertex.load(
-                    GremlinFS.operations().config("fs_root", None)
-                )
-            node = root
+            node = GremlinFS.operations().root()
 
         if not path:
             return node
@@ -125,28 +122,165 @@ class GremlinFSPath(GFSBase):
         elif path and len(path) == 1 and path[0] == "":
             return node
 
+        # Resolve as much of the path as the backend can in one
+        # request, walk the rest
+        node, path = GremlinFSPath.resolve(path, node)
+
+        return GremlinFSPath.walk(path, node)
+
+    @classmethod
+    def fields(clazz):
+
+        '''
+        The properties a listing or path lookup fetches of each vertex,
+        enough to name it and stat it but not its data. None for whole
+        vertices.
+        '''
+
+        fields = GremlinFS.operations().config("api_listing_fields")
+        if fields is None:
+            return None
+
+        return [
+            GremlinFS.operations().config("name_property"),
+            GremlinFS.operations().config("uuid_property"),
+            GremlinFS.operations().config("template_property")
+        ] + list(fields)
+
+    @classmethod
+    def resolve(clazz, path, node = None):
+
+        resolved = None
+        try:
+            resolved = GremlinFS.operations().api().resolvePath(
+                path,
+                node.get("id") if node else None,
+                "in",
+                fields = GremlinFSPath.fields()
+            )
+
+        except Exception as e:
+            clazz.logger.warning(' GremlinFSPath: resolve failed for path: %s: %s', path, str(e))
+
+        if not resolved:
+            return node, path
+
+        # Trust only the components that name the same node the walk
+        # would have found
+        i = 0
+        for cnode in GFSVertex.fromVs(resolved[0:len(path)]):
+            if not cnode or cnode.toid(True) != path[i]:
+                break
+            node = cnode
+            i += 1
+
+        return node, path[i:]
+
+    @classmethod
+    def walk(clazz, path, node = None):
+
+        if not path:
+            return node
+
+        elif path and len(path) == 1 and path[0] == "":
+            return node
+
         elem = path[0]
 
-        nodes = None
+        cnode = GremlinFSPath.child(node, elem)
+        if cnode:
+            return GremlinFSPath.walk(path[1:], cnode)
+
+        return None
+
+    @classmethod
+    def children(clazz, node = None):
+        return list(GremlinFSPath.iterChildren(node))
+
+    @classmethod
+    def iterChildren(clazz, node = None):
+
+        '''
+        The children of node, or the top level without one, a page at a
+        time as they come in. Read to the end, the listing is remembered
+        for lookups by name.
+        '''
+
+        api = GremlinFS.operations().api()
+        pagesize = GremlinFS.operations().config("api_page_size", 1000)
+        fields = GremlinFSPath.fields()
+
+        # Before the first page, a create from here on makes the
+        # listing too old to remember
+        dentries = GremlinFS.operations().dentries()
+        version = dentries.version(node.get("id") if node else None)
+
         if node:
-            nodes = GFSVertex.fromVs(
-                GremlinFS.operations().api().verticesWithEdge(
-                    "in", 
-                    node.get("id")
-                )
+            vertices = api.iterVertices(
+                api.verticesWithEdge,
+                "in",
+                node.get("id"),
+                pagesize = pagesize,
+                fields = fields
             )
 
         else:
-            nodes = GFSVertex.fromVs(
-                GremlinFS.operations().api().verticesWithoutEdge(
-                    "in"
-                )
+            vertices = api.iterVertices(
+                api.verticesWithoutEdge,
+                "in",
+                pagesize = pagesize,
+                fields = fields
             )
 
+        names = {}
+        for vertex in vertices:
+            cnode = GFSVertex.fromV(vertex)
+            if not cnode:
+                continue
+            name = cnode.toid(True)
+            if name:
+                names[name] = cnode.get("id")
+            yield cnode
+
+        # A full listing, remember it for lookups by name
+        dentries.complete(
+            node.get("id") if node else None,
+            names,
+            version
+        )
+
+    @classmethod
+    def child(clazz, node, elem, negative = True):
+
+        dentries = GremlinFS.operations().dentries()
+        folderid = node.get("id") if node else None
+
+        found, childid = dentries.lookup(folderid, elem)
+        if found and childid is None and negative:
+            return None
+
+        if found and childid is not None:
+            cnode = None
+            try:
+                cnode = GFSVertex.fromV(
+                    GremlinFS.operations().api().vertex(
+                        childid
+                    )
+                )
+            except Exception as e:
+                cnode = None
+
+            if cnode and cnode.toid(True) == elem:
+                return cnode
+
+            # Renamed or gone behind our back
+            dentries.forget(folderid)
+
+        nodes = GremlinFSPath.children(node)
         if nodes:
             for cnode in nodes:
                 if cnode.toid(True) == elem:
-                    return GremlinFSPath.atpath(path[1:], cnode)
+                    return cnode
 
         return None
 
@@ -156,17 +290,31 @@ class GremlinFSPath(GFSBase):
         node = None
 
         if parent and nodeid:
-            nodes = GFSVertex.fromVs(
-                GremlinFS.operations().api().verticesWithEdge(
-                    "in", 
-                    parent.get("id")
-                )
-            )
-            if nodes:
-                for cnode in nodes:
-                    if cnode and cnode.get("name") == nodeid:
-                        node = cnode
-                        break
+            # Short ids and names only agree for some labels, so only
+            # trust a positive answer from the dentry cache here
+            cnode = GremlinFSPath.child(parent, nodeid, False)
+            if cnode and cnode.get("name") == nodeid:
+                node = cnode
+
+            else:
+                nodes = GremlinFSPath.children(parent)
+                if nodes:
+                    for cnode in nodes:
+                        if cnode and cnode.get("name") == nodeid:
+                            node = cnode
+                            break
+
+            if node:
+                # Listings only fetch the listing fields, the vertex
+                # folders show and read any property of the node
+                try:
+                    node = GFSVertex.fromV(
+                        GremlinFS.operations().api().vertex(
+                            node.get("id")
+                        )
+                    )
+                except Exception as e:
+                    node = None
 
         elif nodeid:
             node = GFSVertex.load( nodeid )
@@ -179,13 +327,7 @@ class GremlinFSPath(GFSBase):
     @classmethod
     def pathparent(clazz, path = []):
 
-        root = None
-        if GremlinFS.operations().config("fs_root", None):
-            root = GFSVertex.load(
-                GremlinFS.operations().config("fs_root", None)
-            )
-
-        parent = root
+        parent = GremlinFS.operations().root()
 
         if not path:
             return parent
@@ -207,253 +349,64 @@ class GremlinFSPath(GFSBase):
     @classmethod
     def match(clazz, path):
 
-        match = {
-
-            "path": None,
-            "full": None,
-            "parent": None,
-            "node": None,
-            "name": None,
+        route = GremlinFS.operations().router().route(path)
 
-            "vertexlabel": "vertex",
-            "vertexid": None,
-            "vertexuuid": None,
-            "vertexname": None,
-            "vertexproperty": None,
-            "vertexedge": None
+        # Depths under a vertex folder the grammar has no path for
+        if not route.get("path"):
+            raise GFSNotExistsError()
 
-        }
-
-        match.update({
-            "full": GremlinFS.operations().utils().splitpath(path)
-        })
-        expanded = match.get("full", [])
-
-        if not expanded:
-            match.update({
-                "path": "root"
-            })
-
-        elif expanded and len(expanded) == 0:
-            match.update({
-                "path": "root"
-            })
-
-        elif expanded and GremlinFS.operations().config("vertex_folder", ".V") in expanded:
-
-            vindex = 0
-            for i, item in enumerate(expanded):
-                if item == GremlinFS.operations().config("vertex_folder", ".V"):
-                    vindex = i
-
-            if len(expanded) == vindex + 1:
-
-                parent = GremlinFSPath.pathparent(
-                     expanded
-                )
-
-                if parent:
-                    match.update({
-                        "parent": parent
-                    })
+        # Empty components, as in /.V/<id>/, name nothing
+        for key in ("vertexid", "vertexproperty", "vertexedge"):
+            if route.get(key) is not None:
+                GremlinFSUtils.found( route.get(key) )
 
-                match.update({
-                    "path": "vertexes",
-                })
+        match = GremlinFSPath(
 
-            elif len(expanded) == vindex + 2:
+            path = route.get("path"),
+            full = route.get("full"),
+            name = route.get("name"),
 
-                parent = GremlinFSPath.pathparent(
-                     expanded
-                )
+            vertexlabel = route.get("vertexlabel"),
+            vertexid = route.get("vertexid"),
+            vertexuuid = route.get("vertexuuid"),
+            vertexname = route.get("vertexname"),
+            vertexproperty = route.get("vertexproperty"),
+            vertexedge = route.get("vertexedge")
 
-                if parent:
-                    match.update({
-                        "parent": parent
-                    })
-
-                node = GremlinFSPath.pathnode(
-                    expanded[vindex + 1],
-                    match.get("parent", None),
-                    match.get("full", None),
-                )
+        )
 
-                if node:
-                    match.update({
-                        "node": node
-                    })
+        # Parent and node are looked up on first use only
+        match._route = route
 
-                match.update({
-                    "path": "vertex",
-                    "vertexid": GremlinFSUtils.found( expanded[vindex + 1] ),
+        if route.get("edgecheck"):
+            node = match.node()
+            if node and node.edge( route.get("vertexproperty"), False ):
+                match.setall({
+                    "path": "vertex_out_edge",
+                    "vertexproperty": None,
+                    "vertexedge": route.get("vertexproperty")
                 })
 
-            elif len(expanded) == vindex + 3:
-
-                parent = GremlinFSPath.pathparent(
-                     expanded
-                )
-
-                if parent:
-                    match.update({
-                        "parent": parent
-                    })
-
-                node = GremlinFSPath.pathnode(
-                    expanded[vindex + 1],
-                    match.get("parent", None),
-                    match.get("full", None),
-                )
-
-                if node:
-                    match.update({
-                        "node": node
-                    })
-
-                if expanded[vindex + 2] == GremlinFS.operations().config("in_edge_folder", "EI"):
-                    match.update({
-                        "path": "vertex_in_edges",
-                        "vertexid": GremlinFSUtils.found( expanded[vindex + 1] )
-                    })
-
-                elif expanded[vindex + 2] == GremlinFS.operations().config("out_edge_folder", "EO"):
-                    match.update({
-                        "path": "vertex_out_edges",
-                        "vertexid": GremlinFSUtils.found( expanded[vindex + 1] )
-                    })
-
-                elif node and node.edge( expanded[vindex + 2], False ):
-                    match.update({
-                        "path": "vertex_out_edge",
-                        "vertexid": GremlinFSUtils.found( expanded[vindex + 1] ),
-                        "vertexedge": GremlinFSUtils.found( expanded[vindex + 2] )
-                    })
-
-                # else:
-                #     # Note; Unless I throw this here, I am unable to
-                #     # touch files as attributes. I think the default
-                #     # here should be to throw FuseOSError(errno.ENOENT)
-                #     # unless file/node is actually found
-                #     raise FuseOSError(errno.ENOENT)
-                else:
-                    match.update({
-                        "path": "vertex_property",
-                        "vertexid": GremlinFSUtils.found( expanded[vindex + 1] ),
-                        "vertexproperty": GremlinFSUtils.found( expanded[vindex + 2] )
-                    })
-
-            elif len(expanded) == vindex + 4:
-
-                parent = GremlinFSPath.pathparent(
-                     expanded
-                )
-
-                if parent:
-                    match.update({
-                        "parent": parent
-                    })
-
-                node = GremlinFSPath.pathnode(
-                    expanded[vindex + 1],
-                    match.get("parent", None),
-                    match.get("full", None),
-                )
-
-                if node:
-                    match.update({
-                        "node": node
-                    })
-
-                if expanded[vindex + 2] == GremlinFS.operations().config("in_edge_folder", "EI"):
-                    match.update({
-                        "path": "vertex_in_edge",
-                        "vertexid": GremlinFSUtils.found( expanded[vindex + 1] ),
-                        "vertexedge": GremlinFSUtils.found( expanded[vindex + 3] )
-                    })
-
-                elif expanded[vindex + 2] == GremlinFS.operations().config("out_edge_folder", "EO"):
-                    match.update({
-                        "path": "vertex_out_edge",
-                        "vertexid": GremlinFSUtils.found( expanded[vindex + 1] ),
-                        "vertexedge": GremlinFSUtils.found( expanded[vindex + 3] )
-                    })
-
-        elif expanded and len(expanded) == 1:
-            match.update({
-                "path": "atpath",
-                "name": expanded[0],
-                "parent": None,
-                "node": GremlinFSPath.pathnode(
-                    match.get("vertexid", None),
-                    None,
-                    match.get("full", None),
-                )
-            })
-
-        elif expanded and len(expanded) == 2:
-            match.update({
-                "path": "atpath",
-                "name": expanded[1],
-                "parent": GremlinFSPath.pathparent([expanded[0]])
-            })
-            match.update({
-                "node": GremlinFSPath.pathnode(
-                    match.get("vertexid", None),
-                    match.get("parent", None),
-                    match.get("full", None),
-                )
-            })
-
-        elif expanded and len(expanded) > 2:
-            match.update({
-                "path": "atpath",
-                "name": expanded[-1],
-                "parent": GremlinFSPath.pathparent(expanded[0:-1])
-            })
-            match.update({
-                "node": GremlinFSPath.pathnode(
-                    match.get("vertexid", None),
-                    match.get("parent", None),
-                    match.get("full", None),
-                )
-            })
-
         # if match and match.get("path") in GremlinFSPath.paths():
         #     match.update(
         #         GremlinFSPath.paths()[clazz.paths()[match.get("path")]]
         #     )
 
-        match.update(
-            GremlinFSPath.path(match.get("path"))
-        )
+        path = GremlinFSPath.path(match.get("path")) or {}
 
         debug = False
-        if match and match.get("debug", False):
+        if path and path.get("debug", False):
             debug = True
 
+        match.setall({
+            "type": path.get("type"),
+            "debug": debug
+        })
+
         # if debug:
         #     clazz.logger.debug(' GremlinFSPath: MATCH: ' + match.get("path"))
-        #     clazz.logger.debug( match )
-
-        return GremlinFSPath(
-
-            type = match.get("type"),
-            debug = debug, # match.get("debug"),
 
-            path = match.get("path"),
-            full = match.get("full"),
-            parent = match.get("parent"),
-            node = match.get("node"),
-            name = match.get("name"),
-
-            vertexlabel = match.get("vertexlabel"),
-            vertexid = match.get("vertexid"),
-            vertexuuid = match.get("vertexuuid"),
-            vertexname = match.get("vertexname"),
-            vertexproperty = match.get("vertexproperty"),
-            vertexedge = match.get("vertexedge")
-
-        )
+        return match
 
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
@@ -486,21 +439,59 @@ class GremlinFSPath(GFSBase):
     # 
 
     def root(self):
-
-        root = None
-        if self.config("fs_root"):
-            root = GFSVertex.load(
-                self.config("fs_root")
-            )
-
-        return root
+        return GremlinFS.operations().root()
 
     def node(self):
+        if not self.has("node"):
+            self.set("node", self.resolveNode())
         return self._node
 
     def parent(self):
+        if not self.has("parent"):
+            self.set("parent", self.resolveParent())
         return self._parent
 
+    def resolveParent(self):
+
+        route = getattr(self, "_route", None)
+        if not route or route.get("parentpath") is None:
+            return None
+
+        if not route.get("parentpath"):
+            return self.root()
+
+        return GremlinFSPath.atpath(
+            route.get("parentpath")
+        )
+
+    def resolveNode(self):
+
+        route = getattr(self, "_route", None)
+        if not route:
+            return None
+
+        if route.get("nodeid"):
+            return GremlinFSPath.pathnode(
+                route.get("nodeid"),
+                self.parent(),
+                route.get("full")
+            )
+
+        if self._path == "atpath":
+            if route.get("parentpath"):
+                parent = self.parent()
+                if not parent:
+                    return None
+                return GremlinFSPath.child(
+                    parent,
+                    self._name
+                )
+            return GremlinFSPath.atpath(
+                route.get("full")
+            )
+
+        return None
+
     # 
 
     def isFolder(self):
@@ -796,16 +787,26 @@ class GremlinFSPath(GFSBase):
                 raise FuseOSError(errno.ENOENT)
 
             parent = self.parent()
+            now = int(time())
             newfolder = GFSVertex.make(
                 name = newname,
                 label = newlabel,
                 uuid = newuuid
-            ).createFolder()
+            ).createFolder({
+                "created": now,
+                "modified": now
+            })
 
             # TODO: assign/move to parent
             if parent:
                 newfolder.move(parent)
 
+            GremlinFS.operations().dentries().add(
+                parent.get("id") if parent else None,
+                newfolder.toid(True),
+                newfolder.get("id")
+            )
+
             return True
 
         # elif self._path == "vertex_labels":
@@ -833,13 +834,17 @@ class GremlinFSPath(GFSBase):
             if not newname:
                 raise FuseOSError(errno.ENOENT)
 
+            now = int(time())
             if GremlinFS.operations().isFolderLabel(newlabel):
                 # newfolder = 
                 GFSVertex.make(
                     name = newname,
                     label = newlabel,
                     uuid = newuuid
-                ).createFolder()
+                ).createFolder({
+                    "created": now,
+                    "modified": now
+                })
 
                 # TODO: assign/move to parent
                 if parent:
@@ -851,7 +856,11 @@ class GremlinFSPath(GFSBase):
                     name = newname,
                     label = newlabel,
                     uuid = newuuid
-                ).create()
+                ).create({
+                    "size": 0,
+                    "created": now,
+                    "modified": now
+                })
 
                 # TODO: assign/move to parent
                 if parent:
@@ -893,67 +902,43 @@ class GremlinFSPath(GFSBase):
 
     def readFolder(self):
 
+        '''
+        Yields the entries of the folder as they are listed, the big
+        listings a page of vertices at a time.
+        '''
+
         if not self.isFound():
             raise FuseOSError(errno.ENOENT)
 
-        entries = []
-
         if self._path == "root":
-            entries.extend([
-                self.config("vertex_folder")
-            ])
+            yield self.config("vertex_folder")
 
             root = self.root()
 
-            nodes = None
-            if root:
-                nodes = GFSVertex.fromVs(
-                    GremlinFS.operations().api().verticesWithEdge(
-                        "in", 
-                        root.get("id")
-                    )
-                )
-
-            else:
-                nodes = GFSVertex.fromVs(
-                    GremlinFS.operations().api().verticesWithoutEdge(
-                        "in"
-                    )
-                )
-
-            if nodes:
-                for node in nodes:
-                    nodeid = node.toid(True)
-                    if nodeid:
-                        entries.append(nodeid)
+            for node in GremlinFSPath.iterChildren(root):
+                nodeid = node.toid(True)
+                if nodeid:
+                    yield nodeid
 
-            return entries
+            return
 
         elif self._path == "atpath":
-            entries.extend([
-                self.config("vertex_folder")
-            ])
+            yield self.config("vertex_folder")
+
             parent = self.node()
-            nodes = GFSVertex.fromVs(
-                GremlinFS.operations().api().verticesWithEdge(
-                    "in", 
-                    parent.get("id")
-                )
-            )
-            if nodes:
-                for node in nodes:
-                    nodeid = node.toid(True)
-                    if nodeid:
-                        entries.append(nodeid)
+            for node in GremlinFSPath.iterChildren(parent):
+                nodeid = node.toid(True)
+                if nodeid:
+                    yield nodeid
 
-            return entries
+            return
 
         elif self._path == "vertex_labels":
             # ...
-            return entries
+            return
 
         # elif self._path == "vertex_label":
-        #     return entries
+        #     return
 
         elif self._path == "vertexes":
             label = self._vertexlabel
@@ -962,54 +947,63 @@ class GremlinFSPath(GFSBase):
 
             short = False
 
+            api = self.api()
+            pagesize = self.config("api_page_size", 1000)
+            fields = GremlinFSPath.fields()
+
             parent = self.parent()
-            nodes = None
+            vertices = None
 
             if parent:
                 short = True
                 if label == "vertex":
-                    nodes = GFSVertex.fromVs(
-                        self.api().inEdgesOutVertices(
-                            parent.get("id"), 
-                            self.config("in_label"), 
-                            {
-                                "name": self.config("in_name")
-                            }
-                        )
+                    vertices = api.iterVertices(
+                        api.inEdgesOutVertices,
+                        parent.get("id"), 
+                        self.config("in_label"), 
+                        {
+                            "name": self.config("in_name")
+                        },
+                        pagesize = pagesize,
+                        fields = fields
                     )
 
                 else:
-                    nodes = GFSVertex.fromVs(
-                        self.api().inEdgesOutVertices(
-                            parent.get("id"), 
-                            self.config("in_label"), 
-                            {
-                                "name": self.config("in_name")
-                            }, 
-                            label
-                        )
+                    vertices = api.iterVertices(
+                        api.inEdgesOutVertices,
+                        parent.get("id"), 
+                        self.config("in_label"), 
+                        {
+                            "name": self.config("in_name")
+                        }, 
+                        label,
+                        pagesize = pagesize,
+                        fields = fields
                     )
 
             else:
                 if label == "vertex":
-                    nodes = GFSVertex.fromVs(
-                        self.api().vertices()
+                    vertices = api.iterVertices(
+                        api.vertices,
+                        pagesize = pagesize,
+                        fields = fields
                     )
 
                 else:
-                    nodes = GFSVertex.fromVs(
-                        self.api().vertices(
-                            label
-                        )
+                    vertices = api.iterVertices(
+                        api.vertices,
+                        label,
+                        pagesize = pagesize,
+                        fields = fields
                     )
 
-            nodes = GremlinFSUtils.found( nodes )
-            for node in nodes:
-                nodeid = node.toid( short )
+            for vertex in vertices:
+                node = GFSVertex.fromV( vertex )
+                nodeid = node.toid( short ) if node else None
                 if nodeid:
-                    entries.append( nodeid )
+                    yield nodeid
 
-            return entries
+            return
 
         elif self._path == "vertex":
             label = self._vertexlabel
@@ -1017,11 +1011,10 @@ class GremlinFSPath(GFSBase):
                 label = "vertex"
 
             node = GremlinFSUtils.found( self.node() )
-            entries.extend(node.keys())
-            entries.extend([
-                GremlinFS.operations().config("in_edge_folder", "EI"), 
-                GremlinFS.operations().config("out_edge_folder", "EO"),
-            ])
+            for key in node.keys():
+                yield key
+            yield GremlinFS.operations().config("in_edge_folder", "EI")
+            yield GremlinFS.operations().config("out_edge_folder", "EO")
 
             edges = GFSEdge.fromEs(
                 self.api().outEdges(
@@ -1031,23 +1024,23 @@ class GremlinFSPath(GFSBase):
             if edges:
                 for cedge in edges:
                     if cedge.get("label") and cedge.get("name"):
-                        entries.append( "%s@%s" % (cedge.get("name"), cedge.get("label")) )
+                        yield "%s@%s" % (cedge.get("name"), cedge.get("label"))
                     elif cedge.get("label"):
-                        entries.append( "%s" % (cedge.get("label")) )
+                        yield "%s" % (cedge.get("label"))
 
-            return entries
+            return
 
         # elif self._path == "vertex_properties":
-        #     return entries
+        #     return
 
         # elif self._path == "vertex_folder_property":
-        #     return entries
+        #     return
 
         # elif self._path == "vertex_property":
-        #     return entries
+        #     return
 
         # elif self._path == "vertex_edges":
-        #     return entries
+        #     return
 
         elif self._path == "vertex_in_edges":
             label = self._vertexlabel
@@ -1063,11 +1056,11 @@ class GremlinFSPath(GFSBase):
             if edges:
                 for cedge in edges:
                     if cedge.get("label") and cedge.get("name"):
-                        entries.append( "%s@%s" % (cedge.get("name"), cedge.get("label")) )
+                        yield "%s@%s" % (cedge.get("name"), cedge.get("label"))
                     elif cedge.get("label"):
-                        entries.append( "%s" % (cedge.get("label")) )
+                        yield "%s" % (cedge.get("label"))
 
-            return entries
+            return
 
         elif self._path == "vertex_out_edges":
             label = self._vertexlabel
@@ -1083,25 +1076,25 @@ class GremlinFSPath(GFSBase):
             if edges:
                 for cedge in edges:
                     if cedge.get("label") and cedge.get("name"):
-                        entries.append( "%s@%s" % (cedge.get("name"), cedge.get("label")) )
-                    elif cnode.get("label"):
-                        entries.append( "%s" % (cedge.get("label")) )
+                        yield "%s@%s" % (cedge.get("name"), cedge.get("label"))
+                    elif cedge.get("label"):
+                        yield "%s" % (cedge.get("label"))
 
-            return entries
+            return
 
         # elif self._path == "vertex_edge":
-        #     return entries
+        #     return
 
         # elif self._path == "vertex_in_edge":
-        #     return entries
+        #     return
 
         # elif self._path == "vertex_out_edge":
-        #     return entries
+        #     return
 
         # elif self._path == "create_vertex":
-        #     return entries
+        #     return
 
-        return entries
+        return
 
     def renameFolder(self, newmatch):
 
@@ -1159,16 +1152,27 @@ class GremlinFSPath(GFSBase):
             if not newname:
                 raise FuseOSError(errno.ENOENT)
 
+            now = int(time())
             newfile = GFSVertex.make(
                 name = newname,
                 label = newlabel,
                 uuid = newuuid
-            ).create()
+            ).create({
+                "size": 0,
+                "created": now,
+                "modified": now
+            })
 
             # TODO: assign/move to parent
             if parent:
                 newfile.move(parent)
 
+            GremlinFS.operations().dentries().add(
+                parent.get("id") if parent else None,
+                newfile.toid(True),
+                newfile.get("id")
+            )
+
             return True
 
         # elif self._path == "vertex_labels":
@@ -1259,6 +1263,66 @@ class GremlinFSPath(GFSBase):
 
         return self.clearNode()
 
+    def readFileSize(self):
+
+        '''
+        Size of the file, from the size stored with the vertex where
+        there is one. Computed files are rendered, and their size kept in
+        the rendered size cache.
+        '''
+
+        if not self.isFound():
+            raise FuseOSError(errno.ENOENT)
+
+        if self._path != "atpath":
+            return self.readFileLength()
+
+        node = self.node()
+        if not node:
+            return 0
+
+        if not self.isComputed(node):
+            size = node.get("size", None)
+            if size is not None and size != "":
+                try:
+                    return int(size)
+                except Exception as e:
+                    pass
+
+        sizes = GremlinFS.operations().sizes()
+        size = sizes.lookup(node.get("id"), node.get("modified", None))
+        if size is None:
+            size = 0
+            try:
+                # Render returns 404 for empty files
+                size = self.readFileLength()
+            except Exception as e:
+                size = 0
+            sizes.store(node.get("id"), node.get("modified", None), size)
+
+        return size
+
+    def isComputed(self, node):
+        # Content rendered by the backend, its size is not the stored size
+        return node.get("label", None) in (
+            self.config("template_label"),
+            self.config("view_label")
+        ) or bool( node.get(self.config("template_property"), None) )
+
+    def readFileData(self):
+
+        if not self.isFound():
+            raise FuseOSError(errno.ENOENT)
+
+        return self.readNodeData()
+
+    def replaceFile(self, data):
+
+        if not self.isFound():
+            raise FuseOSError(errno.ENOENT)
+
+        return self.replaceNode(data)
+
     def renameFile(self, newmatch):
 
         if not self.isFound():
@@ -1792,13 +1856,7 @@ class GremlinFSPath(GFSBase):
 
             new = GremlinFSUtils.irepl(old, data, offset)
 
-            new = self.utils().tostring(new)
-
-            node.writeProperty(
-                self.config("data_property"),
-                new,
-                encoding = "base64"
-            )
+            self.writeNodeData(node, new)
 
             try:
 
@@ -1884,6 +1942,125 @@ class GremlinFSPath(GFSBase):
 
         return default
 
+    def readNodeData(self):
+
+        '''
+        Stored content of the node as bytes, as opposed to readNode() which
+        returns what the node renders to. Base for write back buffers.
+        '''
+
+        if not self.isFound():
+            raise FuseOSError(errno.ENOENT)
+
+        data = None
+
+        if self._path == "atpath":
+            node = self.node().file()
+
+            # Full fetch, listings need not carry the data property
+            node = GFSVertex.fromV(
+                self.api().vertex(
+                    node.get("id")
+                )
+            ) or node
+
+            data = node.readProperty(
+                self.config("data_property"),
+                None,
+                encoding = "base64"
+            )
+
+        elif self._path == "vertex_property":
+            node = GremlinFSUtils.found( self.node() )
+            data = node.readProperty(
+                self._vertexproperty,
+                None
+            )
+
+        if not data:
+            return b""
+
+        return self.utils().tobytes(data)
+
+    def writeNodeData(self, node, data):
+
+        '''
+        Store data as the node's content, together with its size and
+        modification time, in one round trip.
+        '''
+
+        if isinstance(data, (bytes, bytearray)):
+            size = len(data)
+        else:
+            size = len(self.utils().tobytes(data) or b"")
+
+        data = self.utils().tostring(bytes(data) if isinstance(data, bytearray) else data)
+
+        if data:
+            data = self.utils().encode(data, "base64")
+        else:
+            data = ""
+
+        return node.setProperties({
+            self.config("data_property"): data,
+            "size": size,
+            "modified": int(time())
+        })
+
+    def replaceNode(self, data):
+
+        '''
+        Replace the whole content of the node, in one write.
+        '''
+
+        if not self.isFound():
+            raise FuseOSError(errno.ENOENT)
+
+        default = data
+
+        if self._path == "atpath":
+            node = self.node().file()
+
+            label_config = node.labelConfig()
+
+            writefn = None
+
+            self.writeNodeData(node, data)
+
+            try:
+
+                if label_config and "writefn" in label_config:
+                    writefn = label_config["writefn"]
+
+            except Exception as e:
+                pass
+
+            try:
+
+                if writefn:
+
+                    writefn(
+                        node = node,
+                        data = data
+                    )
+
+            except Exception as e:
+                pass
+
+            return data
+
+        elif self._path == "vertex_property":
+            node = GremlinFSUtils.found( self.node() )
+
+            node.writeProperty(
+                self._vertexproperty,
+                self.utils().tostring(data)
+            )
+
+            return data
+
+        return default
+
     def clearNode(self):
 
         if not self.isFound():
@@ -1898,10 +2075,7 @@ class GremlinFSPath(GFSBase):
         if self._path == "atpath":
             node = self.node().file()
 
-            node.writeProperty(
-                self.config("data_property"),
-                ""
-            )
+            self.writeNodeData(node, b"")
 
             return None
 
@@ -1975,11 +2149,21 @@ class GremlinFSPath(GFSBase):
         if self._path == "atpath":
 
             node = GremlinFSUtils.found(self.node())
+            oldparent = self.parent()
+            oldname = node.toid(True)
             parent = newmatch.parent()
 
             node.rename(newmatch._name)
             node.move(parent)
 
+            GremlinFS.operations().dentries().move(
+                oldparent.get("id") if oldparent else None,
+                oldname,
+                parent.get("id") if parent else None,
+                node.toid(True),
+                node.get("id")
+            )
+
             return True
 
         # elif self._path == "vertex_labels":
@@ -2072,8 +2256,18 @@ class GremlinFSPath(GFSBase):
         if self._path == "atpath":
 
             node = GremlinFSUtils.found(self.node())
+            parent = self.parent()
             node.delete()
 
+            GremlinFS.operations().dentries().remove(
+                parent.get("id") if parent else None,
+                node.toid(True)
+            )
+            # A deleted folder takes its children with it
+            GremlinFS.operations().dentries().forget(
+                node.get("id")
+            )
+
             return True
 
         # elif self._path == "vertex_labels":
@@ -2141,6 +2335,39 @@ class GremlinFSPath(GFSBase):
 
         return True
 
+    def setProperties(self, properties):
+
+        if not self.isFound():
+            raise FuseOSError(errno.ENOENT)
+
+        if self._path == "atpath":
+            node = self.node()
+            if node:
+                node.setProperties(
+                    properties
+                )
+
+        return True
+
+    def inode(self):
+
+        '''
+        Stable inode number, from the vertex id for paths that are a vertex,
+        from the inode table for anything else.
+        '''
+
+        inodes = GremlinFS.operations().inodes()
+
+        if self._path == "root":
+            return inodes.ROOT
+
+        if self._path in ("atpath", "vertex"):
+            node = self.node()
+            if node:
+                return inodes.vertex(node.get("id"))
+
+        return inodes.key("p:/" + "/".join(self.get("full") or []))
+
     def getProperty(self, key, default = None):
 
         if not self.isFound():
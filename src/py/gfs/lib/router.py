@@ -0,0 +1,133 @@
+# 
+# Copyright (c) 2019, 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+from gfs.common.log import GFSLogger
+
+
+
+class GremlinFSRouter():
+
+    '''
+    Classifies a path into one of the GremlinFSPath.paths() types in one
+    pass over its components, without touching the graph.
+
+    The folder names the grammar depends on are read from the config once,
+    when the router is built. Besides the path type, a route says how to
+    find the parent and the node, which GremlinFSPath only does when they
+    are asked for:
+
+    - parentpath: None for no parent, [] for the root, else the path
+      components of the parent folder
+    - nodeid: the vertex id component of .V paths
+    - edgecheck: the path names either an out edge or a property of the
+      node, which only the node can tell
+    '''
+
+    logger = GFSLogger.getLogger("GremlinFSRouter")
+
+    def __init__(
+        self,
+
+        vertex_folder = ".V",
+        in_edge_folder = "EI",
+        out_edge_folder = "EO",
+
+        **kwargs):
+
+        self.vertex_folder = vertex_folder
+        self.in_edge_folder = in_edge_folder
+        self.out_edge_folder = out_edge_folder
+
+    def split(self, path):
+        if not path or path == "/":
+            return None
+        elems = path.split("/")
+        if elems[0] == "" and len(elems) > 1:
+            return elems[1:]
+        return elems
+
+    def route(self, path):
+
+        expanded = self.split(path)
+
+        route = {
+            "path": None,
+            "full": expanded,
+            "name": None,
+            "parentpath": None,
+            "nodeid": None,
+            "edgecheck": False,
+
+            "vertexlabel": "vertex",
+            "vertexid": None,
+            "vertexuuid": None,
+            "vertexname": None,
+            "vertexproperty": None,
+            "vertexedge": None
+        }
+
+        if not expanded:
+            route["path"] = "root"
+            return route
+
+        # Last vertex folder in the path, if any
+        vindex = -1
+        for i in range(len(expanded) - 1, -1, -1):
+            if expanded[i] == self.vertex_folder:
+                vindex = i
+                break
+
+        if vindex < 0:
+            route["path"] = "atpath"
+            route["name"] = expanded[-1]
+            # Top level names are in the root, the fs_root vertex if
+            # there is one
+            route["parentpath"] = expanded[0:-1]
+            return route
+
+        if vindex > 0:
+            route["parentpath"] = expanded[0:vindex]
+
+        rest = expanded[vindex + 1:]
+
+        if len(rest) == 0:
+            route["path"] = "vertexes"
+            return route
+
+        route["nodeid"] = rest[0]
+        route["vertexid"] = rest[0]
+
+        if len(rest) == 1:
+            route["path"] = "vertex"
+
+        elif len(rest) == 2:
+            if rest[1] == self.in_edge_folder:
+                route["path"] = "vertex_in_edges"
+            elif rest[1] == self.out_edge_folder:
+                route["path"] = "vertex_out_edges"
+            else:
+                # Out edge if the node has one by that name,
+                # property otherwise
+                route["path"] = "vertex_property"
+                route["vertexproperty"] = rest[1]
+                route["edgecheck"] = True
+
+        elif len(rest) == 3:
+            if rest[1] == self.in_edge_folder:
+                route["path"] = "vertex_in_edge"
+                route["vertexedge"] = rest[2]
+            elif rest[1] == self.out_edge_folder:
+                route["path"] = "vertex_out_edge"
+                route["vertexedge"] = rest[2]
+
+        return route
+
+
+
+__all__ = [
+    'GremlinFSRouter'
+]
+
+__default__ = 'GremlinFSRouter'
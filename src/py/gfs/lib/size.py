@@ -0,0 +1,73 @@
+# 
+# Copyright (c) 2019, 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import threading
+
+from collections import OrderedDict
+from time import monotonic
+
+from gfs.common.log import GFSLogger
+
+
+
+class GremlinFSSizeCache():
+
+    '''
+    Rendered sizes of files whose content is computed by the backend
+    (templates, views), or that were written before sizes were stored,
+    keyed by vertex id and modification time. Computed content can also
+    change with other vertices, so entries expire after expire seconds.
+    '''
+
+    logger = GFSLogger.getLogger("GremlinFSSizeCache")
+
+    def __init__(
+        self,
+
+        max_entries = 4096,
+        expire = 30,
+
+        **kwargs):
+
+        self.max_entries = max_entries
+        self.expire = expire
+
+        self.lock = threading.RLock()
+        self.entries = OrderedDict() # (id, modified) -> (created, size)
+
+    def lookup(self, nodeid, modified = None):
+
+        with self.lock:
+            key = (nodeid, modified)
+
+            entry = self.entries.get(key)
+            if not entry:
+                return None
+
+            created, size = entry
+            if self.expire and created + self.expire <= monotonic():
+                self.entries.pop(key, None)
+                return None
+
+            self.entries.move_to_end(key)
+            return size
+
+    def store(self, nodeid, modified, size):
+
+        with self.lock:
+            self.entries[(nodeid, modified)] = (monotonic(), size)
+            self.entries.move_to_end((nodeid, modified))
+            while self.max_entries and len(self.entries) > self.max_entries:
+                self.entries.popitem(last = False)
+
+            return size
+
+
+
+__all__ = [
+    'GremlinFSSizeCache'
+]
+
+__default__ = 'GremlinFSSizeCache'
@@ -25,7 +25,7 @@ class GremlinFSUtils(GFSBase):
     def value(clazz, value, default = None):
 
         # if value and "@value" in value:
-        if value and type(value) == dict and "@value" in value:
+        if value and isinstance(value, dict) and "@value" in value:
             return value["@value"]
 
         elif type(value) in (tuple, list):
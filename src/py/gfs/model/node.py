@@ -62,16 +62,24 @@ class GFSNode(GFSBase):
 
         return vals
 
+    @classmethod
+    def mapvals(clazz, map):
+        # Records from the API cache come with their vals unwrapped already
+        vals = getattr(map, "vals", None)
+        if vals is not None:
+            return vals
+        return clazz.vals(map.get("@value"))
+
     @classmethod
     def fromMap(clazz, map):
-        vals = clazz.vals(map.get("@value"))
+        vals = clazz.mapvals(map)
         return clazz(**vals)
 
     @classmethod
     def fromMaps(clazz, maps):
         nodes = []
         for map in maps:
-            vals = clazz.vals(map.get("@value"))
+            vals = clazz.mapvals(map)
             nodes.append(clazz(**vals))
         return nodes
 
@@ -260,12 +268,18 @@ class GFSNode(GFSBase):
 
         nodeid = node.get("id")
 
+        # One round trip for all properties, raises if any of them
+        # did not make it
         self.api().setVertexProperties(
             nodeid,
-            name,
-            prefix = prefix
+            properties
         )
 
+        for name, data in properties.items():
+            node.set(name, data, prefix = prefix)
+
+        return properties
+
     def getProperties(self, prefix = None):
 
         node = self
@@ -219,6 +219,11 @@ class GFSVertex(GFSNode):
 
     @classmethod
     def fromV(clazz, v, names = []):
+        # Queries come back as a list, take the first match
+        if isinstance(v, (list, tuple)):
+            if not v:
+                return None
+            v = v[0]
         if names:
             # return GFSVertex.fromVal(
             return GFSVertex.fromMap(
@@ -700,18 +705,22 @@ class GFSVertex(GFSNode):
             raise GFSNotExistsError(self)
         return node
 
-    def create(self):
+    def create(self, properties = None):
 
         node = self
 
         label = node.get('label', None)
         name = node.get('name', None)
 
+        newproperties = {
+            "name": name
+        }
+        newproperties.update(properties or {})
+
         newnode = GFSVertex.fromV(
             self.api().createVertex(
-                label, {
-                    "name": name
-                }
+                label, 
+                newproperties
             )
         )
 
@@ -730,18 +739,16 @@ class GFSVertex(GFSNode):
 
         node = self
 
-        self.api().deleteOutEdges(
+        # Raises if either half did not make it
+        edge = self.api().moveVertex(
             node.get("id"),
+            parent.get("id"),
             self.config("in_label")
         )
+        if not edge:
+            raise GFSError(node)
 
-        self.api().createEdge(
-            node.get("id"),
-            parent.get("id"),
-            self.config("in_label"), {
-                'name': self.config("in_label")
-            }
-        )
+        return edge
 
     def delete(self):
 
@@ -778,7 +785,7 @@ class GFSVertex(GFSNode):
             node.get("id")
         )
 
-    def createFolder(self):
+    def createFolder(self, properties = None):
 
         node = self
 
@@ -788,11 +795,15 @@ class GFSVertex(GFSNode):
         if not label:
             label = GremlinFS.operations().defaultFolderLabel()
 
+        newproperties = {
+            "name": name
+        }
+        newproperties.update(properties or {})
+
         newfolder = GFSVertex.fromV(
             self.api().createVertex(
-                label, {
-                    "name": name
-                }
+                label, 
+                newproperties
             )
         )
 
@@ -50,9 +50,14 @@ def main(
             gfs_port = gfs_port,
             gfs_username = gfs_username,
             gfs_password = gfs_password,
+
+            **kwargs
         )
         GremlinFS.instance(gfs)
 
+        # Pin the root vertex before the mount starts taking requests
+        gfs.root()
+
         operations = GremlinFSOperations()
         # operations = GremlinFSCachingOperations()
         operations.configure(
@@ -63,9 +68,16 @@ def main(
         FUSE(
             operations,
             mount_point,
-            nothreads = True,
+            nothreads = not gfs.config("fuse_threads"),
             foreground = True,
-            allow_other = True
+            allow_other = True,
+
+            attr_timeout = gfs.config("fuse_attr_timeout"),
+            entry_timeout = gfs.config("fuse_entry_timeout"),
+            negative_timeout = gfs.config("fuse_negative_timeout"),
+            use_ino = gfs.config("fuse_use_ino"),
+            kernel_cache = gfs.config("fuse_kernel_cache"),
+            auto_cache = gfs.config("fuse_auto_cache")
         )
 
     except Exception as e:
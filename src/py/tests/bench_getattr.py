@@ -0,0 +1,165 @@
+# 
+# Copyright (c) 2019, 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+'''
+getattr cost at depth 1 and depth 10, on the in process backend so no
+sidecar or graph is needed. fuse is stubbed when fusepy or libfuse is
+not there, nothing is mounted. Cold runs drop the path match and dentry
+caches before every call, warm runs keep them. Every run is made with
+the fs_root vertex pinned and again with it checked on every use, the
+difference is what pinning saves.
+
+    python tests/bench_getattr.py [iterations]
+'''
+
+import os
+import sys
+import types
+import uuid
+import errno
+
+from time import perf_counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import fuse
+except ( ImportError, EnvironmentError ):
+    # No libfuse, these are all the operations need
+    fuse = types.ModuleType("fuse")
+    class FuseOSError(OSError):
+        def __init__(self, errno):
+            super(FuseOSError, self).__init__(errno, os.strerror(errno))
+    fuse.FuseOSError = FuseOSError
+    fuse.Operations = object
+    fuse.FUSE = None
+    sys.modules["fuse"] = fuse
+
+from gfs.gfs import GremlinFS
+from gfs.gfso import GremlinFSOperations
+
+
+
+class CountingAPI():
+
+    '''
+    Counts the backend calls made through it.
+    '''
+
+    def __init__(self, api):
+        self.api = api
+        self.calls = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self.api, name)
+        if not callable(attr):
+            return attr
+        def counted(*args, **kwargs):
+            self.calls += 1
+            return attr(*args, **kwargs)
+        return counted
+
+
+
+def bench(gfs, operations, path, iterations, cold):
+    api = gfs.api()
+    calls = api.calls
+    start = perf_counter()
+    for i in range(iterations):
+        if cold:
+            operations.mutated()
+            gfs.dentries().clear()
+        operations("getattr", path)
+    elapsed = perf_counter() - start
+    return (
+        elapsed / iterations * 1e6,
+        ( api.calls - calls ) / iterations
+    )
+
+
+def mount(root_revalidate):
+
+    # Mounted under a real fs_root vertex, as main() does
+    fsroot = "root@group@" + str(uuid.uuid4())
+
+    gfs = GremlinFS()
+    gfs.configure(
+        gfs_host = None,
+        gfs_port = None,
+        gfs_username = None,
+        gfs_password = None,
+
+        api_backend = "memory",
+        folder_label = "group",
+        fs_root = fsroot,
+        root_revalidate = root_revalidate
+    )
+    GremlinFS.instance(gfs)
+    gfs._api = CountingAPI(gfs.api())
+
+    parts = fsroot.split("@")
+    gfs.api().createVertex(parts[1], {
+        "name": parts[0],
+        "uuid": parts[2]
+    })
+    if not gfs.root():
+        raise OSError(errno.ENOENT, fsroot)
+
+    operations = GremlinFSOperations()
+    operations.configure(
+        mount_point = "/mnt",
+        gfs = gfs
+    )
+
+    folder = ""
+    paths = {}
+    for depth in range(1, 11):
+        if depth in (1, 10):
+            path = folder + "/file" + str(depth)
+            fh = operations("create", path, 0o644)
+            operations("write", path, b"x" * 100, 0, fh)
+            operations("release", path, fh)
+            paths[depth] = path
+        folder = folder + "/d" + str(depth)
+        operations("mkdir", folder, 0o755)
+
+    for depth, path in paths.items():
+        if operations("getattr", path)["st_size"] != 100:
+            raise OSError(errno.EIO, path)
+
+    return gfs, operations, paths
+
+
+def main(iterations = 1000):
+
+    # Pinned checks the root vertex once a minute, unpinned on every
+    # use, each on a mount of its own
+    results = {}
+    for pinned, root_revalidate in (( True, 60 ), ( False, 0 )):
+        gfs, operations, paths = mount(root_revalidate)
+        for depth, path in sorted(paths.items()):
+            for cold in (True, False):
+                us, calls = bench(gfs, operations, path, iterations, cold)
+                results[( depth, cold, pinned )] = calls
+                print("depth %2d %-4s %-8s %8.1f us/getattr %6.1f backend calls/getattr" % (
+                    depth,
+                    "cold" if cold else "warm",
+                    "pinned" if pinned else "unpinned",
+                    us,
+                    calls
+                ))
+
+    for depth in (1, 10):
+        for cold in (True, False):
+            print("depth %2d %-4s pinning saves %6.1f backend calls/getattr" % (
+                depth,
+                "cold" if cold else "warm",
+                results[( depth, cold, False )] - results[( depth, cold, True )]
+            ))
+
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
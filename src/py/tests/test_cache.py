@@ -0,0 +1,156 @@
+# 
+# Copyright (c) 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import json
+
+from urllib.parse import parse_qsl
+
+import pytest
+
+from gfs.api.client.api import GFSCachingAPI
+from gfs.model.vertex import GFSVertex
+
+
+
+class StubResponse():
+
+    def __init__(self, status, data):
+        self.status_code = status
+        self.text = json.dumps(data) if data is not None else ""
+
+
+
+class StubPool():
+
+    '''
+    Stands in for the session pool and the sidecar behind it, answers the
+    vertex resources from a dict and keeps every request made. during is
+    run once while the next GET is in flight, after its response was
+    made, for writes that cross a read.
+    '''
+
+    def __init__(self):
+        self.vertices = {}
+        self.requests = []
+        self.during = None
+
+    def request(self, method, url, json = None, **kwargs):
+        resource, sep, query = url.split("/gfs1/", 1)[1].partition("?")
+        self.requests.append(( method, resource ))
+        status, data = self.handle(method, resource.split("/"), dict(parse_qsl(query)), json)
+        if method == "GET" and self.during:
+            during, self.during = self.during, None
+            during()
+        return StubResponse(status, data)
+
+    def gets(self, resource):
+        return self.requests.count(( "GET", resource ))
+
+    def vjson(self, vertex):
+        return {
+            "@type": "g:Vertex",
+            "@value": {
+                "id": vertex["id"],
+                "label": vertex["label"],
+                "properties": dict(vertex["properties"])
+            }
+        }
+
+    def handle(self, method, parts, query, body):
+        if parts == ["vertex"] and method == "GET":
+            label = query.pop("label", None)
+            found = [
+                self.vjson(vertex) for vertex in self.vertices.values() if ( not label or vertex["label"] == label ) and all(
+                    str(vertex["properties"].get(name)) == value for name, value in query.items()
+                )
+            ]
+            return ( 200, found ) if found else ( 404, None )
+        if parts == ["vertex"] and method == "POST":
+            vertex = {
+                "id": len(self.vertices) + 1,
+                "label": body["@value"].get("label", "vertex"),
+                "properties": dict(body["@value"]["properties"])
+            }
+            self.vertices[vertex["id"]] = vertex
+            return 200, self.vjson(vertex)
+        vertex = self.vertices.get(int(parts[1]))
+        if not vertex:
+            return 404, None
+        if len(parts) == 2 and method == "GET":
+            return 200, self.vjson(vertex)
+        if len(parts) == 4 and parts[2] == "property" and method == "PUT":
+            vertex["properties"][parts[3]] = body["@value"]["value"]
+            return 200, body
+        return 404, None
+
+
+
+@pytest.fixture
+def sidecar():
+    pool = StubPool()
+    pool.handle("POST", ["vertex"], {}, {"@value": {"label": "file", "properties": {"name": "a"}}})
+    return pool
+
+
+@pytest.fixture
+def api(sidecar):
+    api = GFSCachingAPI("localhost", "8000", None, None)
+    api.pool = sidecar
+    return api
+
+
+def test_reads_cached(sidecar, api):
+    for i in range(3):
+        assert GFSVertex.fromV(api.vertex(1)).get("name") == "a"
+        assert len(api.vertices("file")) == 1
+    assert sidecar.gets("vertex/1") == 1
+    assert sidecar.gets("vertex") == 1
+
+
+def test_negative_entry_dropped_by_create(sidecar, api):
+    assert api.vertices(None, {"name": "b"}) == []
+    assert api.vertices(None, {"name": "b"}) == []
+    assert sidecar.gets("vertex") == 1
+    api.createVertex("file", {"name": "b"})
+    assert [GFSVertex.fromV(v).get("name") for v in api.vertices(None, {"name": "b"})] == ["b"]
+    assert sidecar.gets("vertex") == 2
+
+
+def test_property_write_patches_cached_records(sidecar, api):
+    api.vertex(1)
+    api.vertices("file")
+    generation = api.generation
+    api.setVertexProperty(1, "name", "b")
+    assert api.generation > generation
+    # Patched in place, the listing holds the same record
+    assert GFSVertex.fromV(api.vertex(1)).get("name") == "b"
+    assert GFSVertex.fromV(api.vertices("file")[0]).get("name") == "b"
+    assert sidecar.gets("vertex/1") == 1
+    assert sidecar.gets("vertex") == 1
+
+
+def test_query_on_written_property_refetched(sidecar, api):
+    assert len(api.vertices(None, {"name": "a"})) == 1
+    api.setVertexProperty(1, "name", "b")
+    assert api.vertices(None, {"name": "a"}) == []
+    assert sidecar.gets("vertex") == 2
+
+
+def test_response_crossing_write_not_kept(sidecar, api):
+    sidecar.during = lambda: api.setVertexProperty(1, "name", "b")
+    # Handed back as it came, but neither cached nor merged
+    assert GFSVertex.fromV(api.vertex(1)).get("name") == "a"
+    assert GFSVertex.fromV(api.vertex(1)).get("name") == "b"
+    assert sidecar.gets("vertex/1") == 2
+
+
+def test_clear_cache(sidecar, api):
+    api.vertex(1)
+    generation = api.generation
+    api.clearCache()
+    assert api.generation == generation + 1
+    api.identity.forget("1")
+    api.vertex(1)
+    assert sidecar.gets("vertex/1") == 2
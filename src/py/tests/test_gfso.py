@@ -0,0 +1,116 @@
+# 
+# Copyright (c) 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import os
+import sys
+import types
+
+import pytest
+
+try:
+    import fuse
+except ( ImportError, EnvironmentError ):
+    # No libfuse, these are all the operations need
+    fuse = types.ModuleType("fuse")
+    class FuseOSError(OSError):
+        def __init__(self, errno):
+            super(FuseOSError, self).__init__(errno, os.strerror(errno))
+    fuse.FuseOSError = FuseOSError
+    fuse.Operations = object
+    fuse.FUSE = None
+    sys.modules["fuse"] = fuse
+
+from gfs.gfs import GremlinFS
+from gfs.gfso import GremlinFSOperations
+from gfs.model.vertex import GFSVertex
+
+
+
+def mount(**kwargs):
+    gfs = GremlinFS()
+    gfs.configure(
+        gfs_host = None,
+        gfs_port = None,
+        gfs_username = None,
+        gfs_password = None,
+
+        api_backend = "memory",
+        folder_label = "group",
+        **kwargs
+    )
+    GremlinFS.instance(gfs)
+    operations = GremlinFSOperations()
+    operations.configure(
+        mount_point = "/mnt",
+        gfs = gfs
+    )
+    return operations
+
+
+@pytest.fixture
+def operations():
+    return mount()
+
+
+def stored(operations, name):
+    # What the backend holds, not what the handles have
+    vertices = operations._gfs.api().vertices(None, {"name": name})
+    return GFSVertex.fromV(vertices[0]).get("data")
+
+
+def read(operations, path):
+    fh = operations("open", path, os.O_RDONLY)
+    try:
+        return operations("read", path, 1024, 0, fh)
+    finally:
+        operations("release", path, fh)
+
+
+def test_writes_buffered_until_release(operations):
+    fh = operations("create", "/f", 0o644)
+    assert operations("write", "/f", b"hello ", 0, fh) == 6
+    assert operations("write", "/f", b"world", 6, fh) == 5
+    assert not stored(operations, "f")
+    # Sized from the buffer before the upload
+    assert operations("getattr", "/f")["st_size"] == 11
+    operations("release", "/f", fh)
+    assert stored(operations, "f")
+    assert read(operations, "/f") == b"hello world"
+    assert operations("getattr", "/f")["st_size"] == 11
+
+
+def test_flush_uploads_and_keeps_handle(operations):
+    fh = operations("create", "/f", 0o644)
+    operations("write", "/f", b"one", 0, fh)
+    operations("flush", "/f", fh)
+    assert read(operations, "/f") == b"one"
+    operations("write", "/f", b"two", 3, fh)
+    assert read(operations, "/f") == b"one"
+    operations("fsync", "/f", 0, fh)
+    assert read(operations, "/f") == b"onetwo"
+    operations("release", "/f", fh)
+
+
+def test_dirty_limit_uploads_early():
+    operations = mount(write_dirty_limit = 4)
+    fh = operations("create", "/f", 0o644)
+    operations("write", "/f", b"ab", 0, fh)
+    assert not stored(operations, "f")
+    operations("write", "/f", b"cd", 2, fh)
+    assert read(operations, "/f") == b"abcd"
+    operations("release", "/f", fh)
+
+
+def test_other_handles_see_upload(operations):
+    fh = operations("create", "/f", 0o644)
+    operations("write", "/f", b"old", 0, fh)
+    operations("release", "/f", fh)
+    reader = operations("open", "/f", os.O_RDONLY)
+    assert operations("read", "/f", 1024, 0, reader) == b"old"
+    writer = operations("open", "/f", os.O_WRONLY)
+    operations("write", "/f", b"new", 0, writer)
+    operations("release", "/f", writer)
+    assert operations("read", "/f", 1024, 0, reader) == b"new"
+    operations("release", "/f", reader)
@@ -0,0 +1,362 @@
+# 
+# Copyright (c) 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import itertools
+
+import pytest
+
+from gremlin_python.structure.graph import Graph
+from gremlin_python.structure.graph import Path
+from gremlin_python.process.traversal import T
+from gremlin_python.process.traversal import P
+from gremlin_python.process.traversal import Binding
+from gremlin_python.process.traversal import Bytecode
+from gremlin_python.process.traversal import Traverser
+from gremlin_python.driver.remote_connection import RemoteConnection
+from gremlin_python.driver.remote_connection import RemoteTraversal
+
+from gfs.api.client.backend import GFSAPIError
+from gfs.api.client.gremlin import GFSGremlinAPI
+from gfs.model.vertex import GFSVertex
+
+
+
+class StubConnection(RemoteConnection):
+
+    '''
+    Stands in for Gremlin Server, runs the submitted bytecode over an in
+    memory graph and hands back what the GraphSON reader would, valueMap
+    keys as T, vertex properties as lists, paths as Path.
+    '''
+
+    # Steps that take their modulators along
+    modulators = ("by", "to")
+
+    def __init__(self):
+        super(StubConnection, self).__init__("stub", "g")
+        self.ids = itertools.count(1)
+        self.vertices = {}
+        self.edges = {}
+        self.submitted = []
+
+    def addV(self, label, **properties):
+        vid = next(self.ids)
+        self.vertices[vid] = {
+            "id": vid,
+            "label": label,
+            "properties": dict(properties)
+        }
+        return vid
+
+    def addE(self, label, outv, inv):
+        eid = next(self.ids)
+        self.edges[eid] = {
+            "id": eid,
+            "label": label,
+            "outV": outv,
+            "inV": inv,
+            "properties": {}
+        }
+        return eid
+
+    def submit(self, bytecode):
+        self.submitted.append(bytecode)
+        objects = [obj for obj, path in self.run(bytecode, [])]
+        return RemoteTraversal(
+            iter([Traverser(obj) for obj in objects]),
+            None
+        )
+
+    #
+    # Interpreter
+    #
+
+    def arg(self, arg):
+        if isinstance(arg, Binding):
+            return arg.value
+        return arg
+
+    def element(self, obj):
+        if obj in self.vertices.values():
+            return "vertex"
+        if obj in self.edges.values():
+            return "edge"
+        return None
+
+    def instructions(self, bytecode):
+        steps = []
+        for instruction in bytecode.step_instructions:
+            name, args = instruction[0], [self.arg(arg) for arg in instruction[1:]]
+            if name in self.modulators:
+                steps[-1][2].append(( name, args ))
+            else:
+                steps.append(( name, args, [] ))
+        return steps
+
+    def run(self, bytecode, traversers):
+        for name, args, modulators in self.instructions(bytecode):
+            traversers = getattr(self, "step_" + name)(traversers, args, modulators)
+        return traversers
+
+    def first(self, bytecode, obj):
+        results = self.run(bytecode, [( obj, [obj] )])
+        if not results:
+            return None
+        return results[0][0]
+
+    def modulate(self, modulator, obj):
+        if modulator == T.id:
+            return obj["id"]
+        if modulator == T.label:
+            return obj["label"]
+        if isinstance(modulator, Bytecode):
+            return self.first(modulator, obj)
+        return obj
+
+    def walk(self, traversers, edges):
+        return [
+            ( nxt, path + [nxt] ) for obj, path in traversers for nxt in edges(obj)
+        ]
+
+    def adjacent(self, vertex, end, labels):
+        # Newest first, servers do not promise any order
+        return [
+            edge for edge in reversed(list(self.edges.values())) if edge[end] == vertex["id"] and (
+                not labels or edge["label"] in labels
+            )
+        ]
+
+    def step_V(self, traversers, args, modulators):
+        vertices = [self.vertices[vid] for vid in args if vid in self.vertices] if args else list(self.vertices.values())
+        return [( vertex, [vertex] ) for vertex in vertices]
+
+    def step_E(self, traversers, args, modulators):
+        edges = [self.edges[eid] for eid in args if eid in self.edges] if args else list(self.edges.values())
+        return [( edge, [edge] ) for edge in edges]
+
+    def step_addV(self, traversers, args, modulators):
+        vertex = self.vertices[self.addV(args[0])]
+        return [( vertex, [vertex] )]
+
+    def step_addE(self, traversers, args, modulators):
+        added = []
+        for obj, path in traversers:
+            for name, margs in modulators:
+                inv = self.first(margs[0], obj)
+                edge = self.edges[self.addE(args[0], obj["id"], inv["id"])]
+                added.append(( edge, path + [edge] ))
+        return added
+
+    def step_has(self, traversers, args, modulators):
+        key, value = args
+        def matches(obj):
+            found = obj["properties"].get(key)
+            if isinstance(value, P):
+                assert value.operator == "within"
+                return found in value.value
+            return found == value
+        return [( obj, path ) for obj, path in traversers if matches(obj)]
+
+    def step_hasLabel(self, traversers, args, modulators):
+        return [( obj, path ) for obj, path in traversers if obj["label"] in args]
+
+    def step_not(self, traversers, args, modulators):
+        return [( obj, path ) for obj, path in traversers if not self.run(args[0], [( obj, path )])]
+
+    def step_sideEffect(self, traversers, args, modulators):
+        for obj, path in traversers:
+            self.run(args[0], [( obj, path )])
+        return traversers
+
+    def step_in(self, traversers, args, modulators):
+        return self.walk(traversers, lambda obj: [
+            self.vertices[edge["outV"]] for edge in self.adjacent(obj, "inV", args)
+        ])
+
+    def step_out(self, traversers, args, modulators):
+        return self.walk(traversers, lambda obj: [
+            self.vertices[edge["inV"]] for edge in self.adjacent(obj, "outV", args)
+        ])
+
+    def step_inE(self, traversers, args, modulators):
+        return self.walk(traversers, lambda obj: self.adjacent(obj, "inV", args))
+
+    def step_outE(self, traversers, args, modulators):
+        return self.walk(traversers, lambda obj: self.adjacent(obj, "outV", args))
+
+    def step_bothE(self, traversers, args, modulators):
+        return self.walk(traversers, lambda obj: self.adjacent(obj, "inV", args) + self.adjacent(obj, "outV", args))
+
+    def step_inV(self, traversers, args, modulators):
+        return self.walk(traversers, lambda obj: [self.vertices[obj["inV"]]])
+
+    def step_outV(self, traversers, args, modulators):
+        return self.walk(traversers, lambda obj: [self.vertices[obj["outV"]]])
+
+    def step_drop(self, traversers, args, modulators):
+        for obj, path in traversers:
+            if isinstance(obj, tuple):
+                obj[0]["properties"].pop(obj[1], None)
+            elif self.element(obj) == "edge":
+                self.edges.pop(obj["id"], None)
+            else:
+                self.vertices.pop(obj["id"], None)
+                for edge in self.adjacent(obj, "inV", []) + self.adjacent(obj, "outV", []):
+                    self.edges.pop(edge["id"], None)
+        return []
+
+    def step_none(self, traversers, args, modulators):
+        return []
+
+    def step_property(self, traversers, args, modulators):
+        key, value = args[-2:]
+        for obj, path in traversers:
+            obj["properties"][key] = value
+        return traversers
+
+    def step_properties(self, traversers, args, modulators):
+        return [
+            ( ( obj, key ), path ) for obj, path in traversers for key in list(obj["properties"]) if not args or key in args
+        ]
+
+    def step_valueMap(self, traversers, args, modulators):
+        tokens = args[:1] == [True]
+        keys = args[1:] if tokens else args
+        maps = []
+        for obj, path in traversers:
+            valuemap = {}
+            if tokens:
+                valuemap[T.id] = obj["id"]
+                valuemap[T.label] = obj["label"]
+            for key, value in obj["properties"].items():
+                if keys and key not in keys:
+                    continue
+                valuemap[key] = [value] if self.element(obj) == "vertex" else value
+            maps.append(( valuemap, path + [valuemap] ))
+        return maps
+
+    def step_path(self, traversers, args, modulators):
+        paths = []
+        for obj, path in traversers:
+            objects = list(path)
+            for name, margs in modulators:
+                objects = [self.modulate(margs[0], elem) for elem in objects]
+            paths.append(( Path([[] for elem in objects], objects), path ))
+        return paths
+
+    def step_project(self, traversers, args, modulators):
+        return [
+            ( dict([
+                ( key, self.modulate(margs[0], obj) ) for key, ( name, margs ) in zip(args, modulators)
+            ]), path ) for obj, path in traversers
+        ]
+
+    def step_id(self, traversers, args, modulators):
+        return [( obj["id"], path ) for obj, path in traversers]
+
+    def step_order(self, traversers, args, modulators):
+        for name, margs in reversed(modulators):
+            traversers = sorted(traversers, key = lambda traverser: self.modulate(margs[0], traverser[0]))
+        return traversers
+
+    def step_limit(self, traversers, args, modulators):
+        return traversers[:args[0]]
+
+    def step_range(self, traversers, args, modulators):
+        return traversers[args[0]:args[1]]
+
+
+
+@pytest.fixture
+def graph():
+    connection = StubConnection()
+    root = connection.addV("group", name = "root")
+    docs = connection.addV("group", name = "docs")
+    readme = connection.addV("file", name = "readme", data = "hello")
+    connection.addE("in", docs, root)
+    connection.addE("in", readme, docs)
+    for i in range(5):
+        connection.addE("in", connection.addV("file", name = "f" + str(i)), root)
+    connection.root = root
+    connection.docs = docs
+    connection.readme = readme
+    return connection
+
+
+@pytest.fixture
+def api(graph):
+    return GFSGremlinAPI(g = Graph().traversal().withRemote(graph))
+
+
+def test_resolve_path(graph, api):
+    chain = api.resolvePath(["root", "docs", "readme.file"])
+    nodes = GFSVertex.fromVs(chain)
+    assert [node.get("id") for node in nodes] == [graph.root, graph.docs, graph.readme]
+    assert nodes[2].get("label") == "file"
+    assert nodes[2].get("name") == "readme"
+    assert nodes[2].get("data") == "hello"
+
+
+def test_resolve_path_from_root(graph, api):
+    chain = api.resolvePath(["docs", "readme"], root = str(graph.root), fields = ["name"])
+    assert [GFSVertex.fromV(v).get("id") for v in chain] == [graph.docs, graph.readme]
+    # Only the fields asked for, id and label come along anyway
+    readme = GFSVertex.fromV(chain[-1])
+    assert readme.get("label") == "file"
+    assert readme.get("name") == "readme"
+    assert readme.get("data") is None
+
+
+def test_resolve_path_miss(graph, api):
+    assert api.resolvePath(["root", "nothere"]) == []
+    assert api.resolvePath(["docs"], root = graph.readme) == []
+
+
+def test_vertices_with_edge(graph, api):
+    names = [node.get("name") for node in GFSVertex.fromVs(api.verticesWithEdge("in", graph.root))]
+    assert sorted(names) == ["docs", "f0", "f1", "f2", "f3", "f4"]
+    page = GFSVertex.fromVs(api.verticesWithEdge("in", graph.root, limit = 2, offset = 4, fields = ["name"]))
+    assert [node.get("name") for node in page] == ["f3", "f4"]
+    assert all(node.get("id") and node.get("label") == "file" for node in page)
+
+
+def test_vertices_with_edge_pages(graph, api):
+    pages = [
+        [node.get("name") for node in GFSVertex.fromVs(api.verticesWithEdge("in", graph.root, limit = 2, offset = offset))] for offset in (0, 2, 4)
+    ]
+    assert pages == [["docs", "f0"], ["f1", "f2"], ["f3", "f4"]]
+    steps = [instruction[0] for instruction in graph.submitted[-1].step_instructions]
+    assert steps.index("order") < steps.index("range")
+
+
+def test_resolve_path_name_property(graph):
+    api = GFSGremlinAPI(g = Graph().traversal().withRemote(graph), name_property = "title")
+    graph.vertices[graph.docs]["properties"]["title"] = "papers"
+    chain = api.resolvePath(["papers"], root = str(graph.root))
+    assert [GFSVertex.fromV(v).get("id") for v in chain] == [graph.docs]
+    assert api.resolvePath(["docs"], root = str(graph.root)) == []
+
+
+def test_move_vertex(graph, api):
+    edge = api.moveVertex(str(graph.readme), str(graph.root))
+    assert edge["@value"]["label"] == "in"
+    assert edge["@value"]["outV"] == graph.readme
+    assert edge["@value"]["inV"] == graph.root
+    assert api.verticesWithEdge("in", graph.docs) == []
+    moved = [node for node in GFSVertex.fromVs(api.verticesWithEdge("in", graph.root)) if node.get("name") == "readme"]
+    assert moved and moved[0].get("id") == graph.readme
+
+
+def test_move_vertex_missing(graph, api):
+    with pytest.raises(GFSAPIError) as raised:
+        api.moveVertex("999", str(graph.root))
+    assert raised.value.status == 404
+
+
+def test_ids_sent_as_bindings(graph, api):
+    api.vertex(str(graph.readme))
+    instruction = graph.submitted[-1].step_instructions[0]
+    assert instruction[0] == "V"
+    assert instruction[1] == Binding("vid", graph.readme)
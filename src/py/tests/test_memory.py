@@ -0,0 +1,100 @@
+# 
+# Copyright (c) 2020, 2021, John Grundback
+# All rights reserved.
+# 
+
+import pytest
+
+from gfs.api.client.backend import GFSAPIError
+from gfs.api.client.memory import GFSMemoryAPI
+from gfs.model.vertex import GFSVertex
+
+
+
+@pytest.fixture
+def api():
+    return GFSMemoryAPI()
+
+
+@pytest.fixture
+def tree(api):
+    # root <-in- docs <-in- readme, root <-in- f0 .. f4
+    root = GFSVertex.fromV(api.createVertex("group", {"name": "root"}))
+    docs = GFSVertex.fromV(api.createVertex("group", {"name": "docs", "uuid": "u-docs"}))
+    readme = GFSVertex.fromV(api.createVertex("file", {"name": "readme", "data": "hello"}))
+    api.createEdge(docs.get("id"), root.get("id"), "in")
+    api.createEdge(readme.get("id"), docs.get("id"), "in")
+    for i in range(5):
+        node = GFSVertex.fromV(api.createVertex("file", {"name": "f" + str(i)}))
+        api.createEdge(node.get("id"), root.get("id"), "in")
+    return {
+        "root": root.get("id"),
+        "docs": docs.get("id"),
+        "readme": readme.get("id")
+    }
+
+
+def names(vertices):
+    return [node.get("name") for node in GFSVertex.fromVs(vertices)]
+
+
+def test_vertex_crud(api):
+    vid = GFSVertex.fromV(api.createVertex("file", {"name": "a", "uuid": "u-a"})).get("id")
+    api.setVertexProperty(str(vid), "mode", 0o644)
+    api.updateVertex(vid, {"name": "b"})
+    node = GFSVertex.fromV(api.vertex(str(vid)))
+    assert node.get("label") == "file"
+    assert node.get("name") == "b"
+    assert node.get("mode") == 0o644
+    api.unsetVertexProperty(vid, "mode")
+    assert GFSVertex.fromV(api.vertex(vid)).get("mode") is None
+    api.deleteVertex(vid)
+    with pytest.raises(GFSAPIError) as raised:
+        api.vertex(vid)
+    assert raised.value.status == 404
+    assert api.vertices(None, {"uuid": "u-a"}) == []
+
+
+def test_indexes(api, tree):
+    assert names(api.vertices(None, {"uuid": "u-docs"})) == ["docs"]
+    assert names(api.vertices("group")) == ["root", "docs"]
+    assert names(api.vertices("file", {"name": "f3"})) == ["f3"]
+    assert names(api.verticesWithoutEdge("in")) == ["root"]
+
+
+def test_listing_fields(api, tree):
+    readme = GFSVertex.fromV(api.verticesWithEdge("in", tree["docs"], fields = ["name"])[0])
+    assert readme.get("id") == tree["readme"]
+    assert readme.get("label") == "file"
+    assert readme.get("name") == "readme"
+    assert readme.get("data") is None
+
+
+def test_pages_in_id_order(api, tree):
+    pages = [
+        names(api.verticesWithEdge("in", tree["root"], limit = 2, offset = offset)) for offset in (0, 2, 4, 6)
+    ]
+    assert pages == [["docs", "f0"], ["f1", "f2"], ["f3", "f4"], []]
+    assert names(api.iterVertices(api.verticesWithEdge, "in", tree["root"], pagesize = 4)) == \
+        ["docs", "f0", "f1", "f2", "f3", "f4"]
+
+
+def test_move_vertex(api, tree):
+    edge = api.moveVertex(str(tree["readme"]), str(tree["root"]))
+    assert edge["@value"]["outV"] == tree["readme"]
+    assert edge["@value"]["inV"] == tree["root"]
+    assert api.verticesWithEdge("in", tree["docs"]) == []
+    assert names(api.verticesWithEdge("in", tree["root"]))[-1] == "readme"
+
+
+def test_delete_vertex_drops_edges(api, tree):
+    api.deleteVertex(tree["readme"])
+    assert api.verticesWithEdge("in", tree["docs"]) == []
+    assert api.inEdges(tree["docs"], "in") == []
+
+
+def test_stored_data(api, tree):
+    assert api.render(tree["readme"]) == "hello"
+    with pytest.raises(GFSAPIError) as raised:
+        api.render(tree["docs"])
+    assert raised.value.status == 404